@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Game actions players take, shared by the HTTP handlers and the websocket,
+over which clients may send several at once:
+
+    {"batch": [{"id": 1, "action": "join", "player_name": "spam"},
+               {"id": 2, "action": "start"}]}
+
+Actions of a batch are run in order, each of them whether the previous ones
+failed or not, and acknowledged all at once, in the same order:
+
+    [{"id": 1, "result": {"joined": true}}, {"id": 2, "error": "..."}]
+"""
+from pylinq.game import GameException
+from pylinq.player import PlayerException
+
+
+class ActionException(Exception):
+    pass
+
+
+def _require_player(game, player_name):
+    if player_name not in game.players:
+        raise ActionException('Unknown player "{}"'.format(player_name))
+
+
+def join_game(game, player_name, action=None):
+    game.add_player(player_name)
+    return {'joined': True}
+
+
+def quit_game(game, player_name, action=None):
+    _require_player(game, player_name)
+    game.remove_player(player_name)
+    return {'quit': True}
+
+
+def start_game(game, player_name, action=None):
+    game.start(player_name)
+    return {'started': True}
+
+
+def pick_word(game, player_name, action=None):
+    word = (action or {}).get('word', None)
+    if not word:
+        raise ActionException('Missing word')
+    if not isinstance(word, str):
+        raise ActionException('Words must be strings')
+
+    _require_player(game, player_name)
+    game.player_picks_word(player_name, word)
+    return {'picked': True}
+
+
+ACTIONS = {
+    'join': join_game,
+    'quit': quit_game,
+    'start': start_game,
+    'pick_word': pick_word,
+}
+
+
+def run_action(game, action, player_name=None):
+    """
+    Run an action, on behalf of `player_name` unless the action names its
+    player. Returns the action's acknowledgement.
+    """
+    if not isinstance(action, dict):
+        return {'id': None, 'error': 'Actions must be objects'}
+
+    ack = {'id': action.get('id', None)}
+    try:
+        handler = ACTIONS.get(action.get('action', None), None)
+        if handler is None:
+            raise ActionException(
+                'Unknown action "{}"'.format(action.get('action', None)))
+
+        player_name = action.get('player_name', player_name)
+        if not player_name:
+            raise ActionException('Missing player name')
+        if not isinstance(player_name, str):
+            raise ActionException('Player names must be strings')
+
+        ack['result'] = handler(game, player_name, action)
+    except (ActionException, GameException, PlayerException) as e:
+        ack['error'] = str(e)
+
+    return ack
+
+
+def check_batch(actions, max_actions=None):
+    """
+    Check a batch of actions can be run. Returns the acknowledgement
+    rejecting the whole batch, or None.
+    """
+    if not isinstance(actions, list):
+        return {'id': None, 'error': 'Batches must be lists'}
+    if max_actions is not None and len(actions) > max_actions:
+        return {'id': None,
+                'error': 'Max batch size is {}'.format(max_actions)}
+
+    return None
+
+
+def run_batch(game, actions, player_name=None, max_actions=None):
+    """
+    Run a batch of actions in order. Returns their acknowledgements.
+    """
+    rejected = check_batch(actions, max_actions)
+    if rejected is not None:
+        return [rejected]
+
+    return [run_action(game, action, player_name) for action in actions]
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Static assets served from memory in production.
+
+Every file of the static directory is read once at startup, fingerprinted
+with a hash of its contents and compressed ahead of time, so that serving
+it takes neither disk access nor compression. Each asset has two URLs:
+
+    /static/js/pylinq.js              revalidated with its ETag
+    /static/js/pylinq.3f9a1c07be.js   cached for good by browsers
+
+HTML pages have their references to other assets rewritten to the
+fingerprinted URLs, so that loading a page after the first time only
+revalidates the page itself.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Hex digits of the content hash put in fingerprinted file names
+HASH_LENGTH = 10
+# Assets smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 256
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json',
+                      'image/svg+xml')
+# Suffixes of the ETags of compressed variants, which are different bytes
+ETAG_SUFFIXES = {'gzip': 'gz', 'br': 'br'}
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class AssetException(Exception):
+    pass
+
+
+def compress(data, content_type):
+    """
+    Compress the data of an asset with every encoding available, keeping
+    only the encodings that make it smaller. Returns a dict of encoding to
+    compressed bytes, best first.
+    """
+    if len(data) < MIN_COMPRESS_SIZE \
+            or not content_type.startswith(COMPRESSIBLE_TYPES):
+        return {}
+
+    encodings = {}
+    if brotli is not None:
+        encodings['br'] = brotli.compress(data, quality=11)
+    encodings['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+
+    return {encoding: compressed for encoding, compressed in encodings.items()
+            if len(compressed) < len(data)}
+
+
+def accepted_encodings(header):
+    """
+    Parse an Accept-Encoding header into the set of encodings accepted.
+    """
+    accepted = set()
+    for item in header.split(','):
+        encoding, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if encoding and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(encoding.lower())
+
+    return accepted
+
+
+class Asset(object):
+    """
+    A static file, with its fingerprinted path and compressed variants.
+    """
+    __slots__ = ('path', 'fingerprinted', 'content_type', 'data', 'etag',
+                 'encodings')
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self.content_type = mimetypes.guess_type(path)[0] \
+            or 'application/octet-stream'
+
+        digest = hashlib.sha256(data).hexdigest()
+        root, extension = os.path.splitext(path)
+        self.fingerprinted = '{0}.{1}{2}'.format(
+            root, digest[:HASH_LENGTH], extension)
+        self.etag = '"{}"'.format(digest[:32])
+        self.encodings = compress(data, self.content_type)
+
+    def etag_of(self, encoding=None):
+        """
+        Get the ETag of a variant of the asset, given its encoding.
+        """
+        if encoding is None:
+            return self.etag
+
+        return '"{0}-{1}"'.format(self.etag[1:-1],
+                                  ETAG_SUFFIXES.get(encoding, encoding))
+
+    def body(self, accept_encoding=''):
+        """
+        Get the encoding and bytes to answer a request with, given its
+        Accept-Encoding header. The encoding is None for the plain bytes.
+        """
+        if self.encodings:
+            accepted = accepted_encodings(accept_encoding)
+            for encoding, data in self.encodings.items():
+                if encoding in accepted:
+                    return encoding, data
+
+        return None, self.data
+
+
+class AssetBundle(object):
+    """
+    Every asset of a static directory, by plain and fingerprinted path.
+    """
+
+    def __init__(self, root, prefix='/static/'):
+        self.root = root
+        self.prefix = prefix
+        self.assets = {}
+
+    def __len__(self):
+        return len(set(self.assets.values()))
+
+    def get(self, path):
+        return self.assets.get(path, None)
+
+    def is_fingerprinted(self, path):
+        asset = self.assets.get(path, None)
+        return asset is not None and asset.fingerprinted == path
+
+    def url(self, path):
+        """
+        Get the fingerprinted URL of an asset.
+        """
+        asset = self.assets.get(path, None)
+        if asset is None:
+            raise AssetException('Unknown asset "{}"'.format(path))
+
+        return self.prefix + asset.fingerprinted
+
+    def load(self):
+        """
+        Read, fingerprint and compress every file of the static directory.
+        Pages are loaded last, for their references to the other assets to
+        be rewritten.
+        """
+        if not os.path.isdir(self.root):
+            raise AssetException(
+                'No static directory "{}"'.format(self.root))
+
+        pages = []
+        for directory, _, names in os.walk(self.root):
+            for name in sorted(names):
+                full_path = os.path.join(directory, name)
+                path = os.path.relpath(full_path, self.root).replace(
+                    os.sep, '/')
+
+                with open(full_path, 'rb') as f:
+                    data = f.read()
+
+                if name.endswith('.html'):
+                    pages.append((path, data))
+                else:
+                    self.add(Asset(path, data))
+
+        for path, data in pages:
+            self.add(Asset(path, self.rewrite(data)))
+
+        assets = set(self.assets.values())
+        logger.info('Loaded {0} static assets, {1} bytes'.format(
+            len(assets), sum(len(asset.data) for asset in assets)))
+
+        return self
+
+    def add(self, asset):
+        self.assets[asset.path] = asset
+        self.assets[asset.fingerprinted] = asset
+
+    def rewrite(self, page):
+        """
+        Point the references of a page to other assets at their
+        fingerprinted URLs.
+        """
+        pattern = re.compile(
+            br'(["\'])' + re.escape(self.prefix.encode('utf-8')) +
+            br'([^"\'?#]+)\1')
+
+        def replace(match):
+            path = match.group(2).decode('utf-8')
+            if path not in self.assets:
+                return match.group(0)
+
+            quote = match.group(1)
+            return quote + self.url(path).encode('utf-8') + quote
+
+        return pattern.sub(replace, page)
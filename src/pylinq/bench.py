@@ -0,0 +1,466 @@
+# -*- coding: utf-8 -*-
+"""
+Load generator and benchmarks for the join, start, players and websocket
+event paths.
+
+Run from the repository root, e.g.:
+
+    PYTHONPATH=src python -m pylinq.bench --rooms 50 --sockets 10
+
+Unless given --url, a server is started in a child process for the run.
+With --memory, the memory held by each room of started games is measured
+in process instead. Results are appended as JSON lines to the results file,
+and compared with the previous run using the same parameters.
+"""
+from __future__ import print_function
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.parse
+
+import tornado.httpclient
+import tornado.websocket
+
+import settings
+from pylinq.cards import get_deck
+from pylinq.event import Events
+from pylinq.frame import EVENT_CODES, BINARY_SUBPROTOCOL
+from pylinq.room import RoomRegistry
+from pylinq.utils.packing import unpack
+
+RESULTS_FILE = 'bench_results.jsonl'
+# Relative change of a metric reported as a regression
+REGRESSION_THRESHOLD = 0.1
+
+
+def percentile(values, fraction):
+    """
+    Get the nearest-rank percentile of a list of values.
+    """
+    if not values:
+        return None
+
+    values = sorted(values)
+    rank = int(math.ceil(fraction * len(values)))
+    return values[max(0, min(len(values), rank) - 1)]
+
+
+def summarize(latencies):
+    """
+    Sum a list of latencies up in milliseconds.
+    """
+    return {
+        'count': len(latencies),
+        'p50': _ms(percentile(latencies, 0.5)),
+        'p99': _ms(percentile(latencies, 0.99)),
+        'max': _ms(max(latencies) if latencies else None),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class Stats(object):
+    def __init__(self):
+        self.latencies = {}
+        self.event_lags = []
+        self.socket_bytes = 0
+        self.errors = 0
+
+    def record(self, route, latency):
+        self.latencies.setdefault(route, []).append(latency)
+
+    def request_count(self):
+        return sum(len(latencies) for latencies in self.latencies.values())
+
+
+class RoomLoad(object):
+    """
+    Plays one room: opens its websockets, has its players join, fetches the
+    standings and starts the game, timing everything.
+
+    Websockets ask for binary frames if `binary` is set, and for
+    compression if `compress` is set.
+    """
+
+    def __init__(self, base_url, room_id, players, sockets, stats,
+                 binary=False, compress=False):
+        self.base_url = base_url
+        self.room_id = room_id
+        self.player_names = ['p%d' % i for i in range(0, players)]
+        self.socket_count = sockets
+        self.stats = stats
+        self.binary = binary
+        self.compress = compress
+        self.http = tornado.httpclient.AsyncHTTPClient()
+
+        self.join_sent = {}
+        self.pending_events = 0
+        self.all_received = asyncio.Event()
+
+    def url(self, path, **args):
+        args['room'] = self.room_id
+        return '{0}{1}?{2}'.format(self.base_url, path,
+                                   urllib.parse.urlencode(args))
+
+    async def request(self, route, method='GET', **args):
+        body = urllib.parse.urlencode(args) if method == 'POST' else None
+        start = time.perf_counter()
+        response = await self.http.fetch(self.url(route), method=method,
+                                         body=body, raise_error=False)
+        self.stats.record(route, time.perf_counter() - start)
+
+        if response.code >= 400:
+            self.stats.errors += 1
+        return response
+
+    async def listen(self, ws):
+        while True:
+            message = await ws.read_message()
+            if message is None:
+                return
+
+            self.stats.socket_bytes += len(message)
+            frame = decode_frame(message)
+            if frame.get('event') == Events.NEW_PLAYER:
+                sent = self.join_sent.get(frame['player']['name'], None)
+                if sent is not None:
+                    self.stats.event_lags.append(time.perf_counter() - sent)
+                    self.pending_events -= 1
+                    if self.pending_events == 0:
+                        self.all_received.set()
+
+    async def run(self, event_timeout):
+        ws_url = self.url('/socket').replace('http', 'ws', 1)
+        sockets = [await tornado.websocket.websocket_connect(
+            ws_url,
+            subprotocols=[BINARY_SUBPROTOCOL] if self.binary else None,
+            compression_options={} if self.compress else None)
+            for i in range(0, self.socket_count)]
+        listeners = [asyncio.ensure_future(self.listen(ws)) for ws in sockets]
+        self.pending_events = len(sockets) * len(self.player_names)
+
+        for name in self.player_names:
+            self.join_sent[name] = time.perf_counter()
+            await self.request('/join', 'POST', player_name=name)
+            await self.request('/players')
+
+        await self.request('/start', 'POST',
+                           player_name=self.player_names[0])
+
+        if sockets:
+            try:
+                await asyncio.wait_for(self.all_received.wait(),
+                                       event_timeout)
+            except asyncio.TimeoutError:
+                self.stats.errors += self.pending_events
+
+        for ws in sockets:
+            ws.close()
+        for listener in listeners:
+            listener.cancel()
+
+
+_EVENTS_BY_CODE = dict((code, event) for event, code in EVENT_CODES.items())
+
+
+def decode_frame(message):
+    """
+    Decode a JSON or binary frame to a dict. Only the fields of the events
+    the benchmark looks at are decoded from binary frames.
+    """
+    if isinstance(message, str):
+        return json.loads(message)
+
+    values = unpack(message)
+    frame = {'event': _EVENTS_BY_CODE[values[0]], 'seq': values[1]}
+    if frame['event'] == Events.NEW_PLAYER:
+        frame['player'] = values[2]
+    return frame
+
+
+async def run_load(base_url, rooms, players, sockets, concurrency,
+                   event_timeout=10, binary=False, compress=False):
+    """
+    Drive `rooms` rooms against a server, `concurrency` of them at a time.
+    Returns the collected stats and the duration of the run.
+    """
+    tornado.httpclient.AsyncHTTPClient.configure(
+        None, max_clients=max(10, concurrency * 2))
+
+    stats = Stats()
+    semaphore = asyncio.Semaphore(concurrency)
+    prefix = 'bench-%d-' % os.getpid()
+
+    async def run_room(index):
+        async with semaphore:
+            await RoomLoad(base_url, '%s%d' % (prefix, index), players,
+                           sockets, stats, binary,
+                           compress).run(event_timeout)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[run_room(i) for i in range(0, rooms)])
+    return stats, time.perf_counter() - start
+
+
+def report(stats, duration):
+    return {
+        'duration': round(duration, 3),
+        'requests': stats.request_count(),
+        'requests_per_sec': round(stats.request_count() / duration, 1),
+        'errors': stats.errors,
+        'routes': dict((route, summarize(latencies))
+                       for route, latencies in stats.latencies.items()),
+        'event_lag': summarize(stats.event_lags),
+        'socket_bytes': stats.socket_bytes,
+    }
+
+
+def measure_memory(rooms, players):
+    """
+    Measure the memory held by `rooms` rooms, each with a started game of
+    `players` players and its event hub.
+    """
+    player_names = ['p%d' % i for i in range(0, players)]
+    # The deck is shared by every room, it is not part of their cost
+    get_deck()
+
+    logging.disable(logging.INFO)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+
+        registry = RoomRegistry()
+        for index in range(0, rooms):
+            game = registry.get('room-%d' % index).game
+            for name in player_names:
+                game.add_player(name)
+            game.start(player_names[0])
+
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+        logging.disable(logging.NOTSET)
+
+    return {
+        'bytes': used,
+        'bytes_per_room': round(used / float(rooms)),
+        'bytes_per_player': round(used / float(rooms * players)),
+    }
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _serve(port, workers, compress):
+    import pylinq.http
+
+    settings.PORT = port
+    settings.WORKERS['count'] = workers
+    if compress:
+        settings.SOCKET['compression'] = {'compression_level': 6,
+                                          'mem_level': 5}
+    # Benchmark rooms and points are thrown away with the server
+    settings.SNAPSHOT['path'] = None
+    settings.LEADERBOARD['path'] = None
+    settings.JOURNAL['path'] = None
+    pylinq.http.main()
+
+
+def start_server(port, workers, compress=False):
+    """
+    Start a server in a child process and wait until it accepts connections,
+    compressing the frames of players if `compress` is set.
+    """
+    process = multiprocessing.Process(target=_serve,
+                                      args=(port, workers, compress))
+    process.start()
+
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.1).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+
+    process.terminate()
+    raise RuntimeError('Benchmark server did not start')
+
+
+def stop_server(process):
+    os.kill(process.pid, signal.SIGTERM)
+    process.join(15)
+    if process.is_alive():
+        process.kill()
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_result(path, result):
+    with open(path, 'a') as f:
+        f.write(json.dumps(result, sort_keys=True) + '\n')
+
+
+def compare(previous, current):
+    """
+    List the latency, throughput or memory metrics which got worse by more
+    than REGRESSION_THRESHOLD since a previous result.
+    """
+    regressions = []
+
+    def check(name, before, after, higher_is_better=False):
+        if not before or after is None:
+            return
+        change = (after - before) / float(before)
+        if higher_is_better:
+            change = -change
+        if change > REGRESSION_THRESHOLD:
+            regressions.append('{0}: {1} -> {2} ({3:+.0%})'.format(
+                name, before, after, change))
+
+    if current.get('benchmark') == 'memory':
+        check('bytes_per_room', previous['metrics']['bytes_per_room'],
+              current['metrics']['bytes_per_room'])
+        return regressions
+
+    check('requests_per_sec', previous['metrics']['requests_per_sec'],
+          current['metrics']['requests_per_sec'], higher_is_better=True)
+
+    for route, summary in current['metrics']['routes'].items():
+        before = previous['metrics']['routes'].get(route, {})
+        for key in ('p50', 'p99'):
+            check('{0} {1}'.format(route, key), before.get(key),
+                  summary[key])
+
+    for key in ('p50', 'p99'):
+        check('event_lag ' + key, previous['metrics']['event_lag'][key],
+              current['metrics']['event_lag'][key])
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', help='Server to load, e.g. '
+                        'http://127.0.0.1:8888. Started locally if omitted.')
+    parser.add_argument('--memory', action='store_true',
+                        help='Measure the memory used per room rather than '
+                        'loading a server')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes of the local server')
+    parser.add_argument('--rooms', type=int, default=20)
+    parser.add_argument('--players', type=int, default=4,
+                        help='Players joining each room')
+    parser.add_argument('--sockets', type=int, default=4,
+                        help='Websocket clients watching each room')
+    parser.add_argument('--concurrency', type=int, default=10,
+                        help='Rooms played at the same time')
+    parser.add_argument('--binary', action='store_true',
+                        help='Have websockets ask for binary frames')
+    parser.add_argument('--compress', action='store_true',
+                        help='Have websockets ask for compressed frames')
+    parser.add_argument('--results', default=RESULTS_FILE)
+    parser.add_argument('--label', default=None,
+                        help='Free form description stored with the result')
+    args = parser.parse_args(argv)
+
+    if args.memory:
+        benchmark = 'memory'
+        params = {'rooms': args.rooms, 'players': args.players}
+        metrics = measure_memory(args.rooms, args.players)
+    else:
+        benchmark = 'load'
+        params, metrics = run_load_benchmark(args)
+
+    result = {
+        'benchmark': benchmark,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'label': args.label,
+        'params': params,
+        'metrics': metrics,
+    }
+
+    previous = [r for r in load_results(args.results)
+                if r.get('benchmark') == benchmark and r['params'] == params]
+    save_result(args.results, result)
+
+    print(json.dumps(result['metrics'], indent=2, sort_keys=True))
+    if previous:
+        regressions = compare(previous[-1], result)
+        print('Compared with {0} ({1}): {2}'.format(
+            previous[-1]['revision'], previous[-1]['time'],
+            'no regression' if not regressions else ''))
+        for regression in regressions:
+            print('  REGRESSION ' + regression)
+        if regressions:
+            return 1
+
+    return 0
+
+
+def run_load_benchmark(args):
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        server = start_server(port, args.workers, args.compress)
+        base_url = 'http://127.0.0.1:%d' % port
+
+    try:
+        stats, duration = asyncio.run(run_load(
+            base_url, args.rooms, args.players, args.sockets,
+            args.concurrency, binary=args.binary, compress=args.compress))
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    params = {
+        'rooms': args.rooms,
+        'players': args.players,
+        'sockets': args.sockets,
+        'concurrency': args.concurrency,
+        'workers': args.workers if args.url is None else None,
+        'binary': args.binary,
+        'compress': args.compress,
+    }
+    return params, report(stats, duration)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
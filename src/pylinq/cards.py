@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Word cards, loaded once per process and shared by every game.
+
+Decks are read from the JSON card files, or from a precompiled binary file
+which is memory-mapped so that processes using the same deck share it
+rather than each holding its own copy. Compile a deck with:
+
+    python -m pylinq.cards resources/cards.json resources/cards.bin
+"""
+import json
+import mmap
+import os
+import pathlib
+import random
+import struct
+import sys
+
+PATH_TO_WORD_CARDS = pathlib.Path(os.getcwd()) / 'resources' / 'cards.json'
+
+BINARY_MAGIC = b'PLCD'
+BINARY_VERSION = 1
+# magic, format version, card count, word count
+BINARY_HEADER = struct.Struct('<4sHxxII')
+OFFSET = struct.Struct('<I')
+
+_decks = {}
+
+
+class CardException(Exception):
+    pass
+
+
+class CardDeck(object):
+    """
+    Immutable deck of word cards. Each card is a tuple of words.
+    """
+
+    def __init__(self, cards):
+        self.cards = tuple(
+            tuple(sys.intern(word) for word in card) for card in cards)
+
+        if not self.cards or not all(self.cards):
+            raise CardException('Decks and cards cannot be empty')
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __getitem__(self, index):
+        return self.cards[index]
+
+    def __iter__(self):
+        for index in range(0, len(self)):
+            yield self[index]
+
+    def pick_word(self, rng=random):
+        """
+        Pick a random word from a random card.
+        """
+        return rng.choice(self.cards[rng.randrange(len(self.cards))])
+
+    @classmethod
+    def from_json(cls, path):
+        with pathlib.Path(path).open('r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+
+class MappedCardDeck(CardDeck):
+    """
+    Deck read from a memory-mapped binary file. Words are only decoded when
+    they are accessed.
+
+    The file is made of a header, a table giving the index of the first word
+    of each card, a table giving the offset of each word in the data, and
+    the UTF-8 encoded words.
+    """
+
+    def __init__(self, path):
+        with open(str(path), 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.card_count, self.word_count = \
+            BINARY_HEADER.unpack_from(self.data, 0)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise CardException(
+                'Not a version {0} card deck: "{1}"'.format(
+                    BINARY_VERSION, path))
+        if self.card_count == 0:
+            raise CardException('Decks and cards cannot be empty')
+
+        self.cards_table = BINARY_HEADER.size
+        self.words_table = self.cards_table + \
+            (self.card_count + 1) * OFFSET.size
+        self.words_data = self.words_table + \
+            (self.word_count + 1) * OFFSET.size
+
+    def __len__(self):
+        return self.card_count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.card_count
+        if not 0 <= index < self.card_count:
+            raise IndexError('Card index out of range')
+
+        first, last = self._card_bounds(index)
+        return tuple(self._word(i) for i in range(first, last))
+
+    def pick_word(self, rng=random):
+        first, last = self._card_bounds(rng.randrange(self.card_count))
+        return self._word(first + rng.randrange(last - first))
+
+    def _card_bounds(self, index):
+        position = self.cards_table + index * OFFSET.size
+        return (OFFSET.unpack_from(self.data, position)[0],
+                OFFSET.unpack_from(self.data, position + OFFSET.size)[0])
+
+    def _word(self, index):
+        position = self.words_table + index * OFFSET.size
+        start = OFFSET.unpack_from(self.data, position)[0]
+        end = OFFSET.unpack_from(self.data, position + OFFSET.size)[0]
+        return sys.intern(
+            self.data[self.words_data + start:self.words_data + end].decode(
+                'utf-8'))
+
+
+def compile_deck(source, destination):
+    """
+    Compile a JSON card file to the binary format.
+    """
+    deck = CardDeck.from_json(source)
+    words = [word.encode('utf-8') for card in deck for word in card]
+
+    card_offsets = [0]
+    for card in deck:
+        card_offsets.append(card_offsets[-1] + len(card))
+
+    word_offsets = [0]
+    for word in words:
+        word_offsets.append(word_offsets[-1] + len(word))
+
+    with open(str(destination), 'wb') as f:
+        f.write(BINARY_HEADER.pack(
+            BINARY_MAGIC, BINARY_VERSION, len(deck), len(words)))
+        f.write(struct.pack('<%dI' % len(card_offsets), *card_offsets))
+        f.write(struct.pack('<%dI' % len(word_offsets), *word_offsets))
+        f.write(b''.join(words))
+
+
+def load_deck(path):
+    """
+    Load a deck from disk, in whichever format it is.
+    """
+    with open(str(path), 'rb') as f:
+        magic = f.read(len(BINARY_MAGIC))
+
+    if magic == BINARY_MAGIC:
+        return MappedCardDeck(path)
+    return CardDeck.from_json(path)
+
+
+def get_deck(path=None):
+    """
+    Get the deck stored at `path`, the default word cards if not given. Each
+    deck is only loaded once per process.
+    """
+    path = str(path or PATH_TO_WORD_CARDS)
+
+    deck = _decks.get(path, None)
+    if deck is None:
+        deck = _decks[path] = load_deck(path)
+
+    return deck
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('Usage: python -m pylinq.cards <cards.json> <cards.bin>')
+    compile_deck(sys.argv[1], sys.argv[2])
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+
+class ConnectionRegistry(object):
+    """
+    Keeps track of open client connections, indexed by room and by the name
+    of the player they play as. Adding, removing and looking connections up
+    are all O(1).
+    """
+
+    def __init__(self):
+        # connection -> [room id, player name]
+        self.connections = {}
+        # room id -> set of connections
+        self.by_room = {}
+        # (room id, player name) -> set of connections
+        self.by_player = {}
+
+    def __len__(self):
+        return len(self.connections)
+
+    def __contains__(self, connection):
+        return connection in self.connections
+
+    def __iter__(self):
+        return iter(list(self.connections))
+
+    def add(self, connection, room_id):
+        """
+        Register a connection open on a room.
+        """
+        if connection in self.connections:
+            self.remove(connection)
+
+        self.connections[connection] = [room_id, None]
+        self.by_room.setdefault(room_id, set()).add(connection)
+
+    def remove(self, connection):
+        """
+        Forget about a connection. Does nothing if it is not registered.
+        """
+        entry = self.connections.pop(connection, None)
+        if entry is None:
+            return
+
+        room_id, player_name = entry
+        _discard(self.by_room, room_id, connection)
+        if player_name is not None:
+            _discard(self.by_player, (room_id, player_name), connection)
+
+    def set_player(self, connection, player_name):
+        """
+        Record the name of the player a connection plays as.
+        """
+        entry = self.connections[connection]
+        room_id, previous_name = entry
+
+        if previous_name is not None:
+            _discard(self.by_player, (room_id, previous_name), connection)
+
+        entry[1] = player_name
+        if player_name is not None:
+            self.by_player.setdefault(
+                (room_id, player_name), set()).add(connection)
+
+    def count(self, room_id=None):
+        """
+        Get the number of open connections, overall or in a room.
+        """
+        if room_id is None:
+            return len(self.connections)
+        return len(self.by_room.get(room_id, ()))
+
+    def room_count(self):
+        """
+        Get the number of rooms having at least one open connection.
+        """
+        return len(self.by_room)
+
+    def in_room(self, room_id):
+        """
+        Get the connections open on a room.
+        """
+        return frozenset(self.by_room.get(room_id, ()))
+
+    def for_player(self, room_id, player_name):
+        """
+        Get the connections of a player.
+        """
+        return frozenset(self.by_player.get((room_id, player_name), ()))
+
+
+def _discard(index, key, connection):
+    connections = index.get(key, None)
+    if connections is not None:
+        connections.discard(connection)
+        if not connections:
+            del index[key]
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+import tornado.ioloop
+
+# Websocket close code telling clients the server is restarting, and that
+# they should come back in a moment
+SERVICE_RESTART = 1012
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class Drain(object):
+    """
+    Drains the websockets of a server before it stops.
+
+    Draining first waits until `ready()` is true, e.g. until the games being
+    played are over, for `wait` seconds at most. Sockets are then closed
+    `batch_size` at a time every `interval` seconds, so that clients do not
+    all reconnect to the next server at once, and `on_drained` is called as
+    soon as the last one is gone, or after `timeout` seconds whatever is
+    left.
+
+    `sockets()` gets the open sockets, which have a `close(code, reason)`
+    method, and `count()` how many are open. Sockets tell the drain when
+    they close by calling check().
+    """
+
+    def __init__(self, sockets, count, on_drained, ready=None, wait=0,
+                 batch_size=100, interval=0.1, timeout=10,
+                 reason='Server restarting', schedule=None,
+                 clock=time.monotonic):
+        self.sockets = sockets
+        self.count = count
+        self.on_drained = on_drained
+        self.ready = ready
+        self.wait = wait
+        self.batch_size = batch_size
+        self.interval = interval
+        self.timeout = timeout
+        self.reason = reason
+        self.schedule = schedule
+        self.clock = clock
+
+        self.started = None
+        self.queue = None
+        self.position = 0
+        self.done = False
+
+    def _call_later(self, delay, callback):
+        if self.schedule is None:
+            tornado.ioloop.IOLoop.current().call_later(delay, callback)
+        else:
+            self.schedule(delay, callback)
+
+    def start(self):
+        self.started = self.clock()
+        self._call_later(self.wait + self.timeout, self.give_up)
+        self.wait_until_ready()
+
+    def wait_until_ready(self):
+        if self.done:
+            return
+
+        if self.ready is not None and not self.ready() \
+                and self.clock() - self.started < self.wait:
+            self._call_later(self.interval, self.wait_until_ready)
+            return
+
+        # Sockets opened from now on are refused
+        self.queue = list(self.sockets())
+        logger.info('Closing {} sockets'.format(len(self.queue)))
+        self.close_batch()
+
+    def close_batch(self):
+        """
+        Close the next batch of sockets, and schedule the one after.
+        """
+        if self.done:
+            return
+
+        end = self.position + self.batch_size
+        for socket in self.queue[self.position:end]:
+            try:
+                socket.close(SERVICE_RESTART, self.reason)
+            except Exception:
+                # Sockets may be gone already
+                logger.exception('Could not close {}'.format(socket))
+        self.position = end
+
+        if self.position < len(self.queue):
+            self._call_later(self.interval, self.close_batch)
+        self.check()
+
+    def check(self):
+        """
+        Finish draining if no socket is left open.
+        """
+        if not self.done and self.queue is not None and not self.count():
+            self.finish()
+
+    def give_up(self):
+        if not self.done:
+            logger.warning('Giving up on {} sockets'.format(self.count()))
+            self.finish()
+
+    def finish(self):
+        self.done = True
+        self.queue = None
+        self.on_drained()
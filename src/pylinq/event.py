@@ -6,7 +6,12 @@ class Events:
     GAME_ABORTED = 'game_aborted'
     GAME_FINISHED = 'game_finished'
     LOST_CONNECTION = 'lost_connection'
+    CONNECTED = 'connected'
+    RESYNC = 'resync'
+    ACK = 'ack'
     NEW_ROUND = 'new_round'
     PLAYER_PICKED_WORD = 'player_picked_word'
     PLAYER_ROLE_ASSIGNED = 'player_role_assigned'
+    PLAYER_SCORED = 'player_scored'
     ROUND_RESOLVED = 'round_resolved'
+    SEAT_ASSIGNED = 'seat_assigned'
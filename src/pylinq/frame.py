@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+import json
+
+from pylinq.event import Events
+from pylinq.utils.packing import pack
+
+# Wire formats of the frames
+JSON = 'json'
+BINARY = 'binary'
+
+# Websocket subprotocol clients ask for to be sent binary frames
+BINARY_SUBPROTOCOL = 'pylinq.binary'
+
+# Binary frames identify events by these codes, which must never change
+EVENT_CODES = {
+    Events.NEW_PLAYER: 1,
+    Events.NEW_MASTER: 2,
+    Events.PLAYER_QUIT: 3,
+    Events.GAME_STARTED: 4,
+    Events.GAME_ABORTED: 5,
+    Events.GAME_FINISHED: 6,
+    Events.LOST_CONNECTION: 7,
+    Events.NEW_ROUND: 8,
+    Events.PLAYER_PICKED_WORD: 9,
+    Events.PLAYER_ROLE_ASSIGNED: 10,
+    Events.ROUND_RESOLVED: 11,
+    Events.PLAYER_SCORED: 12,
+    Events.CONNECTED: 13,
+    Events.RESYNC: 14,
+    Events.ACK: 15,
+    Events.SEAT_ASSIGNED: 16,
+}
+
+# Fields of each event, in the order binary frames hold their values
+SCHEMAS = {
+    Events.NEW_PLAYER: ('player',),
+    Events.NEW_MASTER: ('player_name',),
+    Events.PLAYER_QUIT: ('player_name',),
+    Events.LOST_CONNECTION: ('player_name',),
+    Events.PLAYER_ROLE_ASSIGNED: ('role', 'secret_word'),
+    Events.NEW_ROUND: ('round',),
+    Events.PLAYER_PICKED_WORD: ('player_name', 'word'),
+    Events.ROUND_RESOLVED: ('round', 'scores'),
+    Events.CONNECTED: ('epoch', 'last_seq', 'player_timeout'),
+    Events.ACK: ('acks',),
+    Events.SEAT_ASSIGNED: ('room', 'player_name'),
+}
+
+
+def _player(player):
+    return {'player': {'name': player.name, 'score': player.score}}
+
+
+def _player_name(player):
+    return {'player_name': player.name}
+
+
+def _nothing():
+    return {}
+
+
+def _role(player):
+    return {'role': player.role, 'secret_word': player.secret_word}
+
+
+def _round(round_number):
+    return {'round': round_number}
+
+
+def _picked_word(player, word):
+    return {'player_name': player.name, 'word': word}
+
+
+def _round_resolved(round_number, winners):
+    # Only the scores the round changed, as [name, score] pairs
+    return {'round': round_number,
+            'scores': [[p.name, p.score] for p in winners]}
+
+
+# Builds the fields sent to clients for each broadcast event, from the
+# arguments the game state triggered the event with.
+PAYLOADS = {
+    Events.NEW_PLAYER: _player,
+    Events.NEW_MASTER: _player_name,
+    Events.PLAYER_QUIT: _player_name,
+    Events.GAME_STARTED: _nothing,
+    Events.GAME_ABORTED: _nothing,
+    Events.GAME_FINISHED: _nothing,
+    Events.NEW_ROUND: _round,
+    Events.PLAYER_PICKED_WORD: _picked_word,
+    Events.ROUND_RESOLVED: _round_resolved,
+}
+
+# Same as above for events only sent to the player they are about, which is
+# always their first argument.
+PRIVATE_PAYLOADS = {
+    Events.PLAYER_ROLE_ASSIGNED: _role,
+}
+
+
+def encode_event(event, **fields):
+    """
+    Encode an event frame to the JSON bytes written on the wire.
+    """
+    frame = {'event': event}
+    frame.update(fields)
+    return json.dumps(frame, separators=(',', ':')).encode('utf-8')
+
+
+def encode_binary(event, **fields):
+    """
+    Encode an event frame to binary: a MessagePack array of the event code,
+    the frame number or nil, then the values of the event's fields in schema
+    order. Fields outside the schema come last, as a map, if there are any.
+    """
+    seq = fields.pop('seq', None)
+    schema = SCHEMAS.get(event, ())
+
+    values = [EVENT_CODES[event], seq]
+    values.extend(fields.pop(name, None) for name in schema)
+    if fields:
+        values.append(fields)
+
+    return pack(values)
+
+
+class Frame(object):
+    """
+    Event frame to send to clients. It is encoded to each wire format only
+    once, when first sent in that format.
+    """
+    __slots__ = ('event', 'fields', 'json', 'binary')
+
+    def __init__(self, event, fields):
+        self.event = event
+        self.fields = fields
+        self.json = None
+        self.binary = None
+
+    def __repr__(self):
+        return 'Frame "{0}"'.format(self.event)
+
+    def encode(self, wire_format=JSON):
+        if wire_format == BINARY:
+            if self.binary is None:
+                self.binary = encode_binary(self.event, **self.fields)
+            return self.binary
+
+        if self.json is None:
+            self.json = encode_event(self.event, **self.fields)
+        return self.json
+
+
+def make_frame(event, **fields):
+    return Frame(event, fields)
+
+
+def event_frame(event, *args, seq=None):
+    """
+    Build the frame of an event triggered by the game state, numbered `seq`
+    if given.
+    """
+    if event in PRIVATE_PAYLOADS:
+        fields = PRIVATE_PAYLOADS[event](*args)
+    else:
+        fields = PAYLOADS[event](*args)
+
+    if seq is not None:
+        fields['seq'] = seq
+    return Frame(event, fields)
@@ -1,22 +1,28 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
-from random import shuffle
+from collections import deque, namedtuple
 import random
 import settings
 import logging
-import pathlib
 import json
-import os
+import time
+import uuid
 
 from pylinq.utils.observable import Observable
-from pylinq.player import Player
+from pylinq.cards import get_deck
+from pylinq.player import Player, IS_SPY, IS_COUNTER_SPY
 from pylinq.event import Events
+from pylinq import metrics
 
 MIN_PLAYER_COUNT = settings.get_game_setting('min_player_count')
 MAX_PLAYER_COUNT = 8
 SPIES_COUNT = 2
-
-PATH_TO_WORD_CARDS = pathlib.Path(os.getcwd()) / 'resources' / 'cards.json'
+# Rounds in a game, each player picking one word per round
+ROUNDS_COUNT = 2
+# Points scored by the winners of a round
+ROUND_POINTS = 1
+# Number of standings changes kept to answer "changes since" queries
+STANDINGS_HISTORY = 64
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -26,6 +32,22 @@ class GameException(Exception):
     pass
 
 
+Standings = namedtuple('Standings', ['version', 'players', 'body'])
+
+
+class Round(object):
+    """
+    A round being played: the players who have yet to pick their word, and
+    the counter spies who picked the secret word so far.
+    """
+    __slots__ = ('number', 'pending', 'finders')
+
+    def __init__(self, number, pending, finders=None):
+        self.number = number
+        self.pending = pending
+        self.finders = finders or []
+
+
 class GameState(Observable):
     """
     Stores and handles pretty much of the game state.
@@ -33,12 +55,25 @@ class GameState(Observable):
     an event accordingly.
     """
 
-    def __init__(self):
+    def __init__(self, deck=None, rng=None):
         self.players = {}
         self._master_player = None
         self.started = False
+        self.finished = False
         self.round_played = 0
-        self.cards = []
+        self.round = None
+        self.spies = []
+        self.cards = deck
+        # Games draw roles and words from the random module unless given
+        # their own generator, e.g. a seeded one to replay them
+        self.rng = rng or random
+
+        # Standings are versioned so that clients can cheaply check whether
+        # they changed. The epoch tells apart versions of different games.
+        self.standings_epoch = uuid.uuid4().hex[:8]
+        self.standings_version = 0
+        self.standings_changes = deque(maxlen=STANDINGS_HISTORY)
+        self._standings = None
 
         super(GameState, self).__init__()
         self.add_events(Events.GAME_STARTED,
@@ -50,10 +85,12 @@ class GameState(Observable):
                         Events.NEW_ROUND,
                         Events.PLAYER_PICKED_WORD,
                         Events.PLAYER_ROLE_ASSIGNED,
+                        Events.PLAYER_SCORED,
                         Events.ROUND_RESOLVED,
                         )
 
-        self.load_cards()
+        if self.cards is None:
+            self.load_cards()
 
     @property
     def master_player(self):
@@ -71,12 +108,21 @@ class GameState(Observable):
         if player is not None:
             self.trigger(Events.NEW_MASTER, player)
 
+    def trigger(self, event_name, *args):
+        if not metrics.enabled:
+            return super(GameState, self).trigger(event_name, *args)
+
+        start = time.perf_counter()
+        super(GameState, self).trigger(event_name, *args)
+        metrics.trigger_latency.observe(time.perf_counter() - start,
+                                        event_name)
+
     def load_cards(self):
         """
-        Load word cards from disk
+        Load word cards from disk, or from the deck already loaded by the
+        process.
         """
-        with PATH_TO_WORD_CARDS.open('r') as f:
-            self.cards = json.load(f)
+        self.cards = get_deck()
 
     def add_player(self, player_name):
         """
@@ -94,6 +140,7 @@ class GameState(Observable):
 
         new_player = Player(player_name)
         self.players[player_name] = new_player
+        self._standings_changed('join', new_player)
         if self.master_player is None:
             self.master_player = new_player
 
@@ -114,6 +161,7 @@ class GameState(Observable):
         else:
             quitter = self.players[player_name]
             del self.players[player_name]
+            self._standings_changed('quit', quitter)
             self.trigger(Events.PLAYER_QUIT, quitter)
 
             if len(self.players) > 0:
@@ -145,20 +193,83 @@ class GameState(Observable):
                     self.master_player.name))
 
         self.started = True
+        self.finished = False
+        self.round_played = 0
+        # Players stay seated from one game to the next
+        for player in self.players.values():
+            player.words = ()
 
         self.trigger(Events.GAME_STARTED)
         logger.info(u'Game started by player "{}"'.format(player_name))
 
         self.assign_player_roles()
+        self.new_round()
+
+    def new_round(self):
+        """
+        Start the next round, every player having to pick a word.
+        """
+        self.round = Round(self.round_played + 1, set(self.players))
+        self.trigger(Events.NEW_ROUND, self.round.number)
 
     def player_picks_word(self, player_name, word):
         """
-        Set the word the player picked for the round.
+        Set the word the player picked for the round. The round is resolved
+        as soon as the last player picked theirs.
         """
+        if self.round is None:
+            raise GameException('No round is being played')
+
         player = self.players[player_name]
+        if player_name not in self.round.pending:
+            raise GameException(
+                'Player "{}" already picked their word for this round'
+                .format(player_name))
+
         player.add_word(word)
+        self.round.pending.discard(player_name)
+        if player.role == IS_COUNTER_SPY \
+                and word == self.spies[0].secret_word:
+            self.round.finders.append(player)
+
         self.trigger(Events.PLAYER_PICKED_WORD, player, word)
 
+        if not self.round.pending:
+            self.resolve_round()
+
+    def resolve_round(self):
+        """
+        Score the round: counter spies who picked the secret word win it,
+        otherwise the spies do, for keeping it. Only the scores changed are
+        sent, in a single event.
+        """
+        finished_round = self.round
+        self.round = None
+        self.round_played = finished_round.number
+
+        winners = finished_round.finders or self.spies
+        for player in winners:
+            self.set_player_score(player.name, player.score + ROUND_POINTS)
+
+        self.trigger(Events.ROUND_RESOLVED, finished_round.number, winners)
+        logger.info('Round {} resolved'.format(finished_round.number))
+
+        if self.round_played < ROUNDS_COUNT:
+            self.new_round()
+        else:
+            self.finish()
+
+    def finish(self):
+        """
+        End the game after its last round. Players keep their seats and
+        scores for the next one.
+        """
+        self.started = False
+        self.finished = True
+
+        self.trigger(Events.GAME_FINISHED)
+        logger.info('Game finished')
+
     def abort(self):
         """
         Abort the game.
@@ -174,23 +285,28 @@ class GameState(Observable):
         """
         self.players = {}
         self.started = False
+        self.finished = False
         self.master_player = None
         self.round_played = 0
+        self.round = None
+        self.spies = []
+        self._standings_changed('reset')
 
     def assign_player_roles(self):
         """
         Randomly assign roles to the players in the game.
         """
         roles = list('?' * (len(self.players) - SPIES_COUNT) + 'SS')
-        shuffle(roles)
+        self.rng.shuffle(roles)
 
-        card = random.choice(self.cards)
-        secret_word = random.choice(card)
+        secret_word = self.cards.pick_word(self.rng)
 
+        self.spies = []
         for index, player_name in enumerate(self.players):
             player = self.players[player_name]
-            if roles[index] is 'S':
+            if roles[index] == 'S':
                 player.make_spy(secret_word)
+                self.spies.append(player)
             else:
                 player.make_counter_spy()
 
@@ -199,6 +315,17 @@ class GameState(Observable):
                 player
             )
 
+    def set_player_score(self, player_name, score):
+        """
+        Set the score of a player. Scores must be changed through here rather
+        than on the player for the standings snapshot to be updated.
+        """
+        player = self.players[player_name]
+        player.score = score
+        self._standings_changed('score', player)
+
+        self.trigger(Events.PLAYER_SCORED, player)
+
     def get_player_standings(self):
         """
         Get player standings (score) in the game
@@ -206,3 +333,109 @@ class GameState(Observable):
         return [
             {'name': p.name, 'score': p.score} for p in self.players.values()
         ]
+
+    def get_standings_snapshot(self):
+        """
+        Get the current standings along with their version and JSON encoding.
+        The snapshot is only rebuilt after the standings changed.
+        """
+        if self._standings is None:
+            players = self.get_player_standings()
+            self._standings = Standings(
+                self.standings_version,
+                players,
+                json.dumps(players).encode('utf-8'))
+
+        return self._standings
+
+    def get_standings_changes(self, since):
+        """
+        Get the standings changes made after version `since`, oldest first.
+        Returns None when they are not known anymore, or never were.
+        """
+        if since > self.standings_version or since < 0:
+            return None
+        if since == self.standings_version:
+            return []
+
+        missed = self.standings_version - since
+        if missed > len(self.standings_changes):
+            return None
+
+        changes = list(self.standings_changes)
+        return changes[len(changes) - missed:]
+
+    def dump_state(self):
+        """
+        Get the whole state of the game as plain data which can be encoded
+        to JSON, and fed back to load_state().
+        """
+        return {
+            'started': self.started,
+            'finished': self.finished,
+            'round_played': self.round_played,
+            'master': self.master_player and self.master_player.name,
+            # Players in the order they joined, which decides who the next
+            # master is
+            'players': [
+                [p.name, p.score, p.role, p.secret_word, list(p.words)]
+                for p in self.players.values()
+            ],
+            'standings': [self.standings_epoch, self.standings_version],
+        }
+
+    def load_state(self, state):
+        """
+        Replace the state of the game with one from dump_state(). No event
+        is triggered.
+        """
+        self.players = {}
+        for name, score, role, secret_word, words in state['players']:
+            player = Player(name)
+            player.score = score
+            player.role = role
+            player.secret_word = secret_word
+            player.words = tuple(words)
+            self.players[player.name] = player
+
+        self.started = state['started']
+        self.finished = state.get('finished', False)
+        self.round_played = state['round_played']
+        self._master_player = self.players.get(state['master'], None)
+        self._restore_round()
+
+        # Clients may keep polling the standings with the ETags they have,
+        # but the changes leading to this version are gone
+        self.standings_epoch, self.standings_version = state['standings']
+        self.standings_changes.clear()
+        self._standings = None
+
+    def _standings_changed(self, op, player=None):
+        self.standings_version += 1
+        self._standings = None
+
+        change = {'version': self.standings_version, 'op': op}
+        if player is not None:
+            change['name'] = player.name
+            change['score'] = player.score
+        self.standings_changes.append(change)
+
+    def _restore_round(self):
+        """
+        Rebuild the round being played from the players, after their state
+        was loaded rather than played.
+        """
+        self.spies = [p for p in self.players.values() if p.role == IS_SPY]
+        if not self.started:
+            self.round = None
+            return
+
+        number = self.round_played + 1
+        secret_word = self.spies[0].secret_word if self.spies else None
+        self.round = Round(
+            number,
+            set(p.name for p in self.players.values()
+                if len(p.words) < number),
+            [p for p in self.players.values()
+             if p.role == IS_COUNTER_SPY and len(p.words) >= number
+             and p.words[number - 1] == secret_word])
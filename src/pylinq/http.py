@@ -3,15 +3,38 @@ import tornado.ioloop
 import tornado.web
 import tornado.websocket
 import tornado.httpserver
+import tornado.httpclient
+import tornado.httputil
 
 import logging
 import json
 import functools
 import signal
 import time
+import os
 
 from pylinq.game import *
+from pylinq.player import PlayerException
+from pylinq.actions import *
 from pylinq.event import Events
+from pylinq.frame import make_frame, event_frame, JSON, BINARY, \
+    BINARY_SUBPROTOCOL
+from pylinq.connections import ConnectionRegistry
+from pylinq.hub import EventHub
+from pylinq.room import RoomRegistry, RoomReaper, RoomException, \
+    DEFAULT_ROOM
+from pylinq.utils.delivery import DeliveryQueue
+from pylinq.utils.timerwheel import TimerWheel
+from pylinq.workers import Worker, ConnectionReceiver, run_workers
+from pylinq.snapshot import Snapshotter
+from pylinq.journal import Journal
+from pylinq.assets import AssetBundle
+from pylinq.spectators import SpectatorStream
+from pylinq.drain import Drain, SERVICE_RESTART
+from pylinq.matchmaking import Matchmaker
+from pylinq.leaderboard import Leaderboard, LeaderboardException
+from pylinq.utils.packing import unpack, PackingException
+from pylinq import metrics
 import settings
 
 logger = logging.getLogger(__name__)
@@ -19,6 +42,18 @@ logger.setLevel(logging.DEBUG)
 
 server_stopping = False
 
+# Told to clients turned away while the server drains
+DRAINING_MESSAGE = 'Server restarting'
+# Close code of websockets for rooms that cannot be opened (policy
+# violation), and the most bytes a close reason may take
+ROOM_REFUSED = 1008
+MAX_CLOSE_REASON = 123
+
+# Marks requests forwarded from one worker to another
+FORWARDED_HEADER = 'X-Pylinq-Forwarded'
+FORWARDED_RESPONSE_HEADERS = ('Content-Type', 'Etag', 'Cache-Control',
+                              'Location')
+
 
 # Decorator for handlers requiring a player name argument
 def requires_player(fn):
@@ -31,19 +66,79 @@ def requires_player(fn):
 
 
 class BaseHandler(object):
+    _room = None
+
+    @property
+    def room_id(self):
+        return self.get_argument('room', DEFAULT_ROOM)
+
+    @property
+    def room(self):
+        if self._room is None:
+            self._room = self.application.rooms.get(self.room_id)
+        return self._room
+
     @property
     def game(self):
-        return self.application.game
+        return self.room.game
 
 
 class BaseRequestHandler(BaseHandler, tornado.web.RequestHandler):
+    async def prepare(self):
+        worker = self.application.worker
+        if worker is None or worker.owns(self.room_id) \
+                or FORWARDED_HEADER in self.request.headers:
+            return
+
+        # With several workers, requests for a room another worker owns end
+        # up here when a connection is reused for another room. Hand them
+        # over to the owner.
+        await self.forward(worker.owner_port(self.room_id))
+
+    def on_finish(self):
+        if metrics.enabled:
+            metrics.request_latency.observe(self.request.request_time(),
+                                            self.request.path,
+                                            self.request.method)
+
+    async def forward(self, port):
+        """
+        Forward the request to another local worker and relay its response.
+        """
+        headers = tornado.httputil.HTTPHeaders(self.request.headers)
+        headers[FORWARDED_HEADER] = '1'
+        for name in ('Host', 'Connection', 'Content-Length'):
+            headers.pop(name, None)
+
+        response = await tornado.httpclient.AsyncHTTPClient().fetch(
+            'http://127.0.0.1:{0}{1}'.format(port, self.request.uri),
+            method=self.request.method,
+            headers=headers,
+            body=self.request.body if self.request.method == 'POST' else None,
+            follow_redirects=False,
+            raise_error=False)
+
+        if response.code == 599:
+            raise tornado.web.HTTPError(502)
+
+        self.set_status(response.code, response.reason)
+        for name in FORWARDED_RESPONSE_HEADERS:
+            if name in response.headers:
+                self.set_header(name, response.headers[name])
+        if response.body and response.code != 304:
+            self.write(response.body)
+        self.finish()
+
     def write_error(self, status_code, **kwargs):
         if 'exc_info' in kwargs:
             exc_type, exc, _ = kwargs['exc_info']
 
-            if exc_type is GameException:
+            if exc_type in (GameException, RoomException, PlayerException,
+                            ActionException):
                 self.set_status(400)
                 self.write({'error': str(exc)})
+            elif status_code == 503:
+                self.write({'error': DRAINING_MESSAGE})
 
         self.finish()
 
@@ -51,120 +146,611 @@ class BaseRequestHandler(BaseHandler, tornado.web.RequestHandler):
 class PlayerJoinHandler(BaseRequestHandler):
     @requires_player
     def post(self):
-        self.game.add_player(self.player_name)
-        self.write({'joined': True})
+        if self.application.drain is not None:
+            raise tornado.web.HTTPError(503)
+
+        self.write(join_game(self.game, self.player_name))
+        watch_player(self.application, self.room, self.player_name)
 
 
 class PlayerQuitHandler(BaseRequestHandler):
     @requires_player
     def post(self):
-        response = {}
-
-        self.game.remove_player(self.player_name)
-        response['quit'] = True
-        self.write(response)
+        self.write(quit_game(self.game, self.player_name))
 
 
 class PlayerListHandler(BaseRequestHandler):
     def get(self):
-        self.write(json.dumps(self.game.get_player_standings()))
+        since = self.get_argument('since', None)
+        if since is not None:
+            return self.get_changes(since)
+
+        standings = self.game.get_standings_snapshot()
+        self.set_header('Etag', '"{0}-{1}"'.format(
+            self.game.standings_epoch, standings.version))
+        self.set_header('Cache-Control', 'no-cache')
+
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.write(standings.body)
+
+    def get_changes(self, since):
+        """
+        Answer with the standings changes since the given version, or with
+        the full standings if those are not available anymore.
+        """
+        try:
+            since = int(since)
+        except ValueError:
+            raise tornado.web.HTTPError(400)
+
+        changes = self.game.get_standings_changes(since)
+        if changes is not None:
+            self.write({
+                'version': self.game.standings_version,
+                'changes': changes
+            })
+        else:
+            standings = self.game.get_standings_snapshot()
+            self.write({
+                'version': standings.version,
+                'players': standings.players
+            })
 
 
 class GameStartHandler(BaseRequestHandler):
     @requires_player
     def post(self):
-        self.game.start(self.player_name)
-        self.write({'started': True})
+        self.write(start_game(self.game, self.player_name))
 
 
-class EventSocketHandler(BaseHandler, tornado.websocket.WebSocketHandler):
+class BaseSocketHandler(BaseHandler, tornado.websocket.WebSocketHandler):
 
-    # Keeps track of open websocket client connections
-    openEventSocketClients = []
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wire_format = JSON
+        self.last_seen = None
+        self.heartbeat = None
+
+    def start_heartbeat(self):
+        """
+        Ping the client every now and then, and close the connection if it
+        stays silent for too long, e.g. its network went away.
+        """
+        self.last_seen = time.time()
+        self.heartbeat = self.application.timers.schedule(
+            settings.SOCKET['ping_interval'], self.check_heartbeat)
+
+    def check_heartbeat(self):
+        if time.time() - self.last_seen > settings.SOCKET['ping_timeout']:
+            logger.info('Websocket timed out: {}'.format(self))
+            self.heartbeat = None
+            self.close(1001, 'Timed out')
+            return
+
+        try:
+            self.ping()
+        except tornado.websocket.WebSocketClosedError:
+            self.heartbeat = None
+            return
+
+        self.heartbeat = self.application.timers.schedule(
+            settings.SOCKET['ping_interval'], self.check_heartbeat)
+
+    def stop_heartbeat(self):
+        if self.heartbeat is not None:
+            self.heartbeat.cancel()
+            self.heartbeat = None
+
+    def on_pong(self, data):
+        self.last_seen = time.time()
+
+    def read_message(self, message):
+        """
+        Decode a message of the client, in either wire format. Returns None
+        unless it is an object.
+        """
+        self.last_seen = time.time()
+        try:
+            if isinstance(message, bytes):
+                message = unpack(message)
+            else:
+                message = json.loads(message)
+        except (ValueError, PackingException):
+            logger.warning('Bad message from {}'.format(self))
+            return None
+
+        return message if isinstance(message, dict) else None
+
+    def acquire_room(self):
+        """
+        Hold the room of the socket until it is closed. Returns False, and
+        closes the socket, if the room cannot be opened.
+        """
+        try:
+            # Websockets cannot be forwarded like requests, and a room is
+            # only ever opened by its owner
+            worker = self.application.worker
+            if worker is not None and not worker.owns(self.room_id):
+                raise RoomException('Room "{0}" is not served by {1}'.format(
+                    self.room_id, worker))
+
+            self._room = self.application.rooms.acquire(self.room_id)
+        except RoomException as e:
+            logger.info('Websocket refused: {}'.format(e))
+            reason = str(e).encode('utf-8')[:MAX_CLOSE_REASON]
+            self.close(ROOM_REFUSED, reason.decode('utf-8', 'ignore'))
+            return False
+
+        return True
+
+    def write_frame(self, frame):
+        try:
+            return self.write_message(frame.encode(self.wire_format),
+                                      binary=self.wire_format == BINARY)
+        except tornado.websocket.WebSocketClosedError:
+            return None
+
+    def select_subprotocol(self, subprotocols):
+        # Clients asking for nothing in particular get JSON
+        if BINARY_SUBPROTOCOL in subprotocols:
+            self.wire_format = BINARY
+            return BINARY_SUBPROTOCOL
+        return None
+
+    def get_compression_options(self):
+        # Frames are small, and most of them are shared by many sockets
+        return None
+
+
+class EventSocketHandler(BaseSocketHandler):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.player = None
 
+        # Frames waiting to be written to the client
+        self.outbox = DeliveryQueue(
+            max_size=settings.SOCKET['max_queued_frames'],
+            window=settings.SOCKET['max_in_flight_frames'],
+            policy=settings.SOCKET['overflow_policy'],
+            on_overflow=self.on_outbox_overflow)
+
     def open(self):
         logger.debug('New websocket opened: {}'.format(self))
-        self.game.bind(Events.NEW_PLAYER,
-                       self.on_new_player)
-        self.game.bind(Events.NEW_MASTER,
-                       self.on_new_master)
-        self.game.bind(Events.PLAYER_QUIT,
-                       self.on_player_quit)
-        self.game.bind(Events.GAME_STARTED,
-                       self.on_game_started)
-        self.game.bind(Events.GAME_ABORTED,
-                       self.on_game_aborted)
-        self.game.bind(Events.PLAYER_ROLE_ASSIGNED,
-                       self.on_player_role_assigned)
-
-        EventSocketHandler.openEventSocketClients.append(self)
+        if self.application.drain is not None:
+            self.close(SERVICE_RESTART, DRAINING_MESSAGE)
+            return
+
+        if not self.acquire_room():
+            return
+        self.application.connections.add(self, self.room.room_id)
+
+        # Clients coming back after losing their connection tell who they
+        # play as and the last frame they got, and only get what they missed
+        player_name = self.get_argument('player_name', None)
+        if player_name is not None:
+            self.set_player(player_name, resend_role=False)
+
+        self.resume(self.get_argument('epoch', None),
+                    self.get_argument('since', None))
+
+        # Nothing can be broadcast in between: frames keep their order
+        self.room.hub.subscribe(self)
+        self.start_heartbeat()
+
+    def resume(self, epoch, since):
+        """
+        Send a client the frames it missed since frame number `since` of hub
+        `epoch`, or tell it to reload the state of the room if they are not
+        known anymore.
+        """
+        hub = self.room.hub
+        self.send(make_frame(Events.CONNECTED, epoch=hub.epoch,
+                             last_seq=hub.sequence,
+                             player_timeout=settings.SOCKET['player_timeout']))
+        if since is None:
+            # Players may join a game started without them, e.g. seated by
+            # the lobby at a table which started as it filled up
+            self.send_game()
+            return
+
+        try:
+            frames = hub.missed(epoch, int(since), self.player)
+        except ValueError:
+            frames = None
+
+        if frames is None:
+            self.send(make_frame(Events.RESYNC, seq=hub.sequence))
+            self.send_role()
+            return
+
+        for frame in frames:
+            self.send(frame)
 
     def on_message(self, message):
-        message = json.loads(message, encoding='utf-8')
-        if 'playerName' in message \
-                and message['playerName'] in self.game.players:
-            self.player = self.game.players[message['playerName']]
-
-    def on_new_player(self, new_player):
-        self.write_message({
-            'event': Events.NEW_PLAYER,
-            'player': {
-                'name': new_player.name,
-                'score': new_player.score
-            }
-        })
-
-    def on_new_master(self, new_master):
-        self.write_message({
-            'event': Events.NEW_MASTER,
-            'player_name': new_master.name
-        })
-
-    def on_player_quit(self, quitter):
-        self.write_message({
-            'event': Events.PLAYER_QUIT,
-            'player_name': quitter.name
-        })
-
-    def on_game_started(self):
-        self.write_message({'event': Events.GAME_STARTED})
-
-    def on_game_aborted(self):
-        self.write_message({'event': Events.GAME_ABORTED})
+        message = self.read_message(message)
+        if message is None:
+            return
+
+        if 'playerName' in message:
+            self.set_player(message['playerName'])
+
+        if 'batch' in message:
+            self.run_actions(message['batch'])
+        elif 'action' in message:
+            self.run_actions([message])
+
+    def run_actions(self, actions):
+        """
+        Run a batch of actions sent by the client, and acknowledge them all
+        in a single frame.
+        """
+        rejected = check_batch(actions, settings.SOCKET['max_batch_actions'])
+        if rejected is not None:
+            self.send(make_frame(Events.ACK, acks=[rejected]))
+            return
+
+        acks = []
+        for action in actions:
+            # Later actions of the batch play as whoever joined in it
+            player_name = self.player.name if self.player is not None \
+                else None
+            if self.application.drain is not None \
+                    and isinstance(action, dict) \
+                    and action.get('action') == 'join':
+                acks.append({'id': action.get('id', None),
+                             'error': DRAINING_MESSAGE})
+                continue
+
+            ack = run_action(self.game, action, player_name)
+            if 'result' in ack:
+                self.on_action_done(action['action'],
+                                    action.get('player_name', player_name))
+            acks.append(ack)
+
+        self.send(make_frame(Events.ACK, acks=acks))
+
+    def on_action_done(self, action, player_name):
+        if action == 'join':
+            watch_player(self.application, self.room, player_name)
+            if self.player is None:
+                self.set_player(player_name, resend_role=False)
+        elif action == 'quit' and self.player is not None \
+                and self.player.name == player_name:
+            self.room.hub.set_player(self, None)
+            self.application.connections.set_player(self, None)
+
+    def set_player(self, player_name, resend_role=True):
+        if not isinstance(player_name, str) \
+                or player_name not in self.game.players:
+            return
+
+        self.room.hub.set_player(self, self.game.players[player_name])
+        self.application.connections.set_player(self, self.player.name)
+        unwatch_player(self.application, self.room, player_name)
+
+        if resend_role:
+            self.send_role()
+
+    def send_game(self):
+        """
+        Tell a player where the game they play in stands, if it started.
+        """
+        if self.player is None or not self.game.started:
+            return
+
+        self.send(event_frame(Events.GAME_STARTED))
+        self.send_role()
+        if self.game.round is not None:
+            self.send(event_frame(Events.NEW_ROUND, self.game.round.number))
+
+    def send_role(self):
+        # Players coming back to a started game, e.g. after a restart, need
+        # to be told their role again
+        if self.player is not None and self.game.started:
+            self.send(event_frame(Events.PLAYER_ROLE_ASSIGNED, self.player))
+
+    def send(self, frame):
+        self.outbox.put(self.write_frame, (frame,))
+
+    def get_compression_options(self):
+        # Only used with clients offering permessage-deflate
+        return settings.SOCKET['compression']
+
+    def on_outbox_overflow(self, outbox):
+        logger.warning('Websocket too slow to keep up: {}'.format(self))
+        self.close(1008, 'Too slow')
 
     def on_close(self):
         logger.debug('Websocket closed: {}'.format(self))
-        self.game.unbind(Events.NEW_PLAYER,      self.on_new_player)
-        self.game.unbind(Events.NEW_MASTER,      self.on_new_master)
-        self.game.unbind(Events.PLAYER_QUIT,     self.on_player_quit)
-        self.game.unbind(Events.GAME_STARTED,    self.on_game_started)
-        self.game.unbind(Events.GAME_ABORTED,    self.on_game_aborted)
-
-        if self in EventSocketHandler.openEventSocketClients:
-            EventSocketHandler.openEventSocketClients.remove(self)
-
-        if self.game.started:
-            map(lambda s: s.write_message({'event': Events.LOST_CONNECTION}),
-                EventSocketHandler.openEventSocketClients)
-
-    def on_player_role_assigned(self, player):
-        if player is self.player:
-            self.write_message({
-                'event': Events.PLAYER_ROLE_ASSIGNED,
-                'role': player.role,
-                'secret_word': player.secret_word
-            })
+        self.outbox.close()
+        self.stop_heartbeat()
+        if self._room is None:
+            return
+
+        hub = self.room.hub
+        hub.unsubscribe(self)
+
+        self.application.connections.remove(self)
+
+        # Give players a chance to come back before telling the others
+        if self.player is not None:
+            if self.game.started:
+                self.application.timers.schedule(
+                    settings.SOCKET['lost_connection_grace'],
+                    check_lost_connection, self.application, self.room,
+                    self.player)
+            watch_player(self.application, self.room, self.player.name)
+
+        self.application.rooms.release(self.room)
+        if self.application.drain is not None:
+            self.application.drain.check()
+
+
+class SpectatorSocketHandler(BaseSocketHandler):
+    """
+    Read-only websocket of a room's spectators. They get the public events
+    of the room through its spectator stream, and whatever they send is
+    ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Write of the last frame, until it is flushed
+        self.pending = None
+
+    @property
+    def busy(self):
+        return self.pending is not None and not self.pending.done()
+
+    def open(self):
+        logger.debug('New spectator: {}'.format(self))
+        if self.application.drain is not None:
+            self.close(SERVICE_RESTART, DRAINING_MESSAGE)
+            return
+
+        if not self.acquire_room():
+            return
+
+        hub = self.room.hub
+        self.write_frame(make_frame(Events.CONNECTED, epoch=hub.epoch,
+                                    last_seq=hub.sequence))
+        get_spectator_stream(self.application, self.room).add(self)
+        self.start_heartbeat()
+
+    def on_message(self, message):
+        self.last_seen = time.time()
+
+    def write_frame(self, frame):
+        try:
+            self.pending = self.write_message(
+                frame.encode(self.wire_format),
+                binary=self.wire_format == BINARY)
+        except tornado.websocket.WebSocketClosedError:
+            pass
+
+    def on_close(self):
+        logger.debug('Spectator left: {}'.format(self))
+        self.stop_heartbeat()
+        if self._room is None:
+            return
+
+        streams = self.application.spectators
+        stream = streams.get(self.room.room_id, None)
+        if stream is not None:
+            stream.remove(self)
+            if not stream:
+                del streams[self.room.room_id]
+
+        self.application.rooms.release(self.room)
+        if self.application.drain is not None:
+            self.application.drain.check()
+
+
+class LobbySocketHandler(BaseSocketHandler):
+    """
+    Websocket of players asking for a seat at whatever table. They send
+    their name, are seated at a table by the matchmaker and told which over
+    the socket, then play at that table over its own socket.
+    """
+
+    def open(self):
+        logger.debug('New player in the lobby: {}'.format(self))
+        if self.application.drain is not None:
+            self.close(SERVICE_RESTART, DRAINING_MESSAGE)
+            return
+
+        self.application.lobby.add(self)
+        self.start_heartbeat()
+
+    def on_message(self, message):
+        message = self.read_message(message)
+        if message is None or 'playerName' not in message:
+            return
+
+        player_name = message['playerName']
+        ack = {'id': message.get('id', None)}
+        if self.application.drain is not None:
+            ack['error'] = DRAINING_MESSAGE
+        elif not player_name:
+            ack['error'] = 'Missing player name'
+        elif not isinstance(player_name, str):
+            ack['error'] = 'Player names must be strings'
+        else:
+            try:
+                room = self.application.matchmaker.seat(player_name)
+            except (GameException, PlayerException, RoomException) as e:
+                ack['error'] = str(e)
+            else:
+                watch_player(self.application, room, player_name)
+                self.write_frame(make_frame(Events.SEAT_ASSIGNED,
+                                            room=room.room_id,
+                                            player_name=player_name))
+                return
+
+        self.write_frame(make_frame(Events.ACK, acks=[ack]))
+
+    def on_close(self):
+        self.stop_heartbeat()
+        if self in self.application.lobby:
+            self.application.lobby.discard(self)
+            if self.application.drain is not None:
+                self.application.drain.check()
+
+
+def get_spectator_stream(app, room):
+    """
+    Get the spectator stream of a room, starting it if needed.
+    """
+    stream = app.spectators.get(room.room_id, None)
+    if stream is None:
+        stream = app.spectators[room.room_id] = SpectatorStream(
+            room.hub,
+            interval=settings.SPECTATORS['interval'],
+            coalesce=settings.SPECTATORS['coalesce'],
+            batch_size=settings.SPECTATORS['batch_size'])
+
+    return stream
+
+
+def check_lost_connection(app, room, player):
+    """
+    Tell a room a player lost their connection, unless they came back or
+    the game is over.
+    """
+    game = room.game
+    if not game.started or game.players.get(player.name) is not player:
+        return
+    if app.connections.for_player(room.room_id, player.name):
+        return
+
+    room.hub.broadcast(make_frame(Events.LOST_CONNECTION,
+                                  player_name=player.name))
+
+
+def watch_player(app, room, player_name):
+    """
+    Expire a player if nobody plays as them for a while. Players have a
+    single expiry timer, armed again for the whole timeout whenever they
+    are left without a connection, and cancelled when they are back.
+    """
+    unwatch_player(app, room, player_name)
+
+    player = room.game.players.get(player_name, None)
+    if player is not None:
+        app.expiries[(room.room_id, player_name)] = app.timers.schedule(
+            settings.SOCKET['player_timeout'], expire_player, app, room,
+            player)
+
+
+def unwatch_player(app, room, player_name):
+    timer = app.expiries.pop((room.room_id, player_name), None)
+    if timer is not None:
+        timer.cancel()
+
+
+def expire_player(app, room, player):
+    """
+    Remove a player from their game, unless somebody plays as them again or
+    they left already.
+    """
+    app.expiries.pop((room.room_id, player.name), None)
+
+    game = room.game
+    if game.players.get(player.name) is not player:
+        return
+    if app.connections.for_player(room.room_id, player.name):
+        return
+
+    logger.info('Player "{0}" expired in {1}'.format(player.name, room))
+    game.remove_player(player.name)
+
+    # The room may be left empty
+    app.reaper.watch(room)
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4')
+        self.write(metrics.registry.render())
+
+
+class LeaderboardHandler(tornado.web.RequestHandler):
+    """
+    Serves the top players of the leaderboard, or the rank of one player
+    given their name.
+    """
+
+    def get(self):
+        leaderboard = self.application.ranking
+
+        player_name = self.get_argument('player_name', None)
+        if player_name is not None:
+            rank = leaderboard.rank(player_name)
+            if rank is None:
+                raise tornado.web.HTTPError(404)
+
+            self.write({'name': player_name, 'rank': rank,
+                        'points': leaderboard.points[player_name]})
+            return
+
+        page = leaderboard.get_page()
+        self.set_header('Etag', '"{0}-{1}"'.format(leaderboard.epoch,
+                                                   page.version))
+        self.set_header('Cache-Control', 'no-cache')
+
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.write(page.body)
 
 
 class StaticFileHandler(tornado.web.StaticFileHandler):
-    def get(self, *args, **kwargs):
-        super().get(*args, **kwargs)
+    def set_extra_headers(self, path):
         self.set_header('Cache-Control', 'no-cache')
 
+
+class AssetHandler(tornado.web.RequestHandler):
+    """
+    Serves static assets from memory, in production. Fingerprinted URLs
+    never change content, so browsers may cache them for good.
+    """
+    def initialize(self, assets):
+        self.assets = assets
+
+    def get(self, path):
+        asset = self.assets.get(path)
+        if asset is None:
+            raise tornado.web.HTTPError(404)
+
+        encoding, body = asset.body(
+            self.request.headers.get('Accept-Encoding', ''))
+
+        self.set_header('Content-Type', asset.content_type)
+        self.set_header('ETag', asset.etag_of(encoding))
+        self.set_header('Vary', 'Accept-Encoding')
+        if self.assets.is_fingerprinted(path):
+            self.set_header('Cache-Control',
+                            'public, max-age=31536000, immutable')
+        else:
+            self.set_header('Cache-Control', 'no-cache')
+
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+
+        if encoding is not None:
+            self.set_header('Content-Encoding', encoding)
+        self.write(body)
+
+STATIC_ROUTE = r'/static/(.*)'
+
 routes = [
     (r'/',                       tornado.web.RedirectHandler,
         {"url": '/static/index.html'}),
@@ -173,22 +759,258 @@ routes = [
     (r'/players',                PlayerListHandler),
     (r'/start',                  GameStartHandler),
     (r'/socket',                 EventSocketHandler),
-    (r'/static/(.*)',            StaticFileHandler, {
+    (r'/spectate',               SpectatorSocketHandler),
+    (r'/lobby',                  LobbySocketHandler),
+    (r'/leaderboard',            LeaderboardHandler),
+    (STATIC_ROUTE,               StaticFileHandler, {
         'path': settings.TORNADO_SETTINGS['static_path']
     })
 ]
 
 
-def main():
-    app = tornado.web.Application(routes, settings.TORNADO_SETTINGS)
-    game = GameState()
-    app.game = game
+def make_hub(game):
+    """
+    Build the event hub of a new room.
+    """
+    queue = None
+    if settings.SOCKET['async_delivery']:
+        queue = DeliveryQueue(coalesce=settings.SOCKET['coalesce'])
 
-    http_server = tornado.httpserver.HTTPServer(app)
-    http_server.listen(settings.PORT)
+    return EventHub(game, queue, settings.SOCKET['resume_history'])
+
+
+def make_application(worker=None):
+    """
+    Build the Tornado application along with its rooms and connections
+    registries. `worker` is the identity of the current worker process, if
+    serving with several.
+    """
+    handlers = routes
+    if settings.STATIC['production']:
+        assets = AssetBundle(settings.TORNADO_SETTINGS['static_path']).load()
+        handlers = [route for route in routes if route[0] != STATIC_ROUTE]
+        handlers.append((STATIC_ROUTE, AssetHandler, {'assets': assets}))
+
+    app = tornado.web.Application(handlers, settings.TORNADO_SETTINGS)
+
+    app.journal = None
+    if settings.JOURNAL['path']:
+        app.journal = Journal(settings.JOURNAL['path'],
+                              settings.JOURNAL['fsync'])
+
+    # Heartbeats, timeouts and idle rooms
+    app.timers = TimerWheel(settings.TIMERS['tick'], settings.TIMERS['slots'])
+    # (room id, player name) -> expiry timer of players without a connection
+    app.expiries = {}
+    app.leaderboard = Leaderboard(settings.LEADERBOARD['page_size'])
+    # Leaderboard served, that of every worker once they share their points
+    app.ranking = app.leaderboard
+
+    def on_created(room):
+        if app.journal is not None:
+            app.journal.attach(room)
+        app.reaper.watch(room)
+        room.game.bind(Events.ROUND_RESOLVED,
+                       app.leaderboard.on_round_resolved)
+
+    def on_removed(room):
+        app.reaper.forget(room)
+        app.matchmaker.forget(room)
+        if app.journal is not None:
+            app.journal.detach(room)
+
+    app.rooms = RoomRegistry(
+        max_rooms=settings.ROOMS['max_rooms'],
+        hub_factory=make_hub,
+        on_created=on_created,
+        on_removed=on_removed,
+        on_released=lambda room: app.reaper.watch(room))
+    app.reaper = RoomReaper(app.rooms, app.timers,
+                            settings.ROOMS['idle_timeout'])
+    app.matchmaker = Matchmaker(
+        app.rooms,
+        prefix=settings.MATCHMAKING['room_prefix'],
+        owns=worker.owns if worker is not None else None)
+    app.connections = ConnectionRegistry()
+    # Sockets of the players waiting in the lobby
+    app.lobby = set()
+    # Room id -> spectator stream, for rooms with spectators only
+    app.spectators = {}
+    # Set once the server shuts down
+    app.drain = None
+    app.worker = worker
+
+    return app
+
+
+def register_metrics(app):
+    """
+    Register the gauges describing the state of an application. They are
+    only computed when metrics are collected.
+    """
+    connections = app.connections
+    rooms = app.rooms
+    spectators = app.spectators
+
+    def outboxes():
+        return [connection.outbox for connection in connections]
+
+    gauges = [
+        ('pylinq_open_sockets', 'Open websockets',
+         lambda: len(connections)),
+        ('pylinq_active_rooms', 'Rooms in memory',
+         lambda: len(rooms)),
+        ('pylinq_watched_rooms', 'Rooms with at least one open websocket',
+         connections.room_count),
+        ('pylinq_socket_queued_frames',
+         'Frames waiting to be written to websockets',
+         lambda: sum(len(outbox) for outbox in outboxes())),
+        ('pylinq_socket_queue_depth_max',
+         'Frames waiting to be written to the most backed up websocket',
+         lambda: max([len(outbox) for outbox in outboxes()] or [0])),
+        ('pylinq_socket_in_flight_frames',
+         'Frames written to websockets but not flushed yet',
+         lambda: sum(outbox.in_flight for outbox in outboxes())),
+        ('pylinq_socket_dropped_frames',
+         'Frames dropped for open websockets too slow to keep up',
+         lambda: sum(outbox.dropped for outbox in outboxes())),
+        ('pylinq_spectators', 'Open spectator websockets',
+         lambda: sum(len(stream) for stream in spectators.values())),
+        ('pylinq_spectator_skipped_frames',
+         'Frame batches skipped for spectators too slow to keep up',
+         lambda: sum(stream.skipped for stream in spectators.values())),
+        ('pylinq_lobby_sockets', 'Players waiting in the lobby',
+         lambda: len(app.lobby)),
+        ('pylinq_open_tables', 'Tables of the matchmaker with seats free',
+         lambda: len(app.matchmaker)),
+        ('pylinq_leaderboard_players', 'Players on the leaderboard',
+         lambda: len(app.leaderboard)),
+        ('pylinq_hub_queued_events',
+         'Game events waiting to be fanned out to websockets',
+         lambda: sum(len(room.hub.queue) for room in rooms
+                     if room.hub.queue is not None)),
+    ]
+
+    for name, description, callback in gauges:
+        metrics.registry.unregister(name)
+        metrics.registry.gauge(name, description, callback)
+
+
+def make_snapshotter(app):
+    """
+    Get the snapshotter saving the rooms of an application, or None if
+    snapshots are disabled.
+    """
+    path = settings.SNAPSHOT['path']
+    if not path:
+        return None
+    if app.worker is None:
+        return Snapshotter(app.rooms, path)
+
+    return Snapshotter(app.rooms, '{0}.{1}'.format(path, app.worker.index),
+                       app.worker.owns)
+
+
+def leaderboard_path(app):
+    """
+    Get the path of an application's leaderboard snapshot, or None if it is
+    not saved.
+    """
+    path = settings.LEADERBOARD['path']
+    if not path or app.worker is None:
+        return path
+
+    return '{0}.{1}'.format(path, app.worker.index)
+
+
+def rank_workers(app, path):
+    """
+    Rank the players of every worker, from the points of this worker and
+    the last snapshots of the others' leaderboards, saved to `path`.N.
+    """
+    snapshots = [app.leaderboard.encode()]
+    for index in range(0, app.worker.count):
+        other_path = '{0}.{1}'.format(path, index)
+        if index != app.worker.index and os.path.exists(other_path):
+            with open(other_path, 'rb') as f:
+                snapshots.append(f.read())
+
+    try:
+        app.ranking.load(*snapshots)
+    except LeaderboardException as e:
+        logger.error('Could not rank the players of every worker: {}'.format(
+            e))
+
+
+def serve(app, http_server):
+    """
+    Run the IO loop for an application until the server is shut down.
+    """
+    rooms = app.rooms
+    connections = app.connections
+
+    if settings.METRICS['enabled']:
+        metrics.enable()
+        register_metrics(app)
+
+        # Each worker exposes its own metrics, on consecutive ports
+        metrics_port = settings.METRICS['port']
+        if app.worker is not None:
+            metrics_port += app.worker.index
+
+        metrics_app = tornado.web.Application([(r'/metrics', MetricsHandler)])
+        metrics_app.listen(metrics_port, settings.METRICS['address'])
 
     io_loop = tornado.ioloop.IOLoop.instance()
 
+    # Pick up the games left by the previous run
+    snapshotter = make_snapshotter(app)
+    if snapshotter is not None:
+        snapshotter.restore()
+
+        # Players who never come back expire like the others, and tables
+        # with seats free keep taking players
+        prefix = settings.MATCHMAKING['room_prefix']
+        for room in rooms:
+            for player_name in room.game.players:
+                watch_player(app, room, player_name)
+            if room.room_id.startswith(prefix):
+                app.matchmaker.watch(room)
+
+        if settings.SNAPSHOT['interval']:
+            saver = tornado.ioloop.PeriodicCallback(
+                snapshotter.save_in_background,
+                settings.SNAPSHOT['interval'] * 1000)
+            saver.start()
+
+    # Points players won in previous runs
+    ranked_path = leaderboard_path(app)
+    if ranked_path:
+        app.leaderboard.restore(ranked_path)
+
+        def rank():
+            app.leaderboard.save_in_background(ranked_path)
+            if app.ranking is not app.leaderboard:
+                rank_workers(app, settings.LEADERBOARD['path'])
+
+        # Workers only rank their own players, and share them through
+        # their snapshots
+        if app.worker is not None:
+            app.ranking = Leaderboard(settings.LEADERBOARD['page_size'])
+            rank_workers(app, settings.LEADERBOARD['path'])
+
+        ranker = tornado.ioloop.PeriodicCallback(
+            rank, settings.LEADERBOARD['interval'] * 1000)
+        ranker.start()
+
+    # Write journaled events out in batches
+    if app.journal is not None:
+        journal_writer = tornado.ioloop.PeriodicCallback(
+            app.journal.flush, settings.JOURNAL['flush_interval'])
+        journal_writer.start()
+
+    app.timers.start()
+
     # Handle graceful shutdown
     def sig_handler(sig, *args):
         global server_stopping
@@ -200,35 +1022,52 @@ def main():
 
     def shutdown():
         logger.info('Shutting down...')
-        game.abort()
+        app.timers.stop()
         http_server.stop()
+        if snapshotter is not None and settings.SNAPSHOT['interval']:
+            saver.stop()
+        if ranked_path:
+            ranker.stop()
 
-        def poll_stop():
-            remaining = len(io_loop._handlers)
+        # Without snapshots, games being played are let finish for a while
+        ready = None
+        if snapshotter is None:
+            ready = lambda: not any(room.game.started for room in rooms)
 
-            # Wait until we only have only one IO handler remaining.  That
-            # final handler will be our PeriodicCallback polling task.
-            if remaining is 1:
-                io_loop.stop()
-            else:
-                logger.info('[%d] Waiting on IO handlers (%d remaining)',
-                            tornado.process.task_id() or 0, remaining)
+        app.drain = Drain(
+            lambda: list(connections) + spectators() + list(app.lobby),
+            lambda: len(connections) + len(app.lobby) + sum(
+                len(stream) for stream in app.spectators.values()),
+            stop,
+            ready=ready,
+            wait=settings.SHUTDOWN['finish_timeout'],
+            batch_size=settings.SHUTDOWN['batch_size'],
+            interval=settings.SHUTDOWN['batch_interval'],
+            timeout=settings.SHUTDOWN['timeout'],
+            reason=DRAINING_MESSAGE)
+        app.drain.start()
 
-        # Cleanly close websocket client connections
-        for client in EventSocketHandler.openEventSocketClients:
-            try:
-                client.close()
-            except:
-                # Websocket could or could not be there
-                pass
+    def spectators():
+        return [spectator for stream in app.spectators.values()
+                for spectator in stream.spectators]
+
+    def stop():
+        # Saved once no client can change them anymore
+        if snapshotter is not None:
+            # Games go on once the server is back
+            snapshotter.save()
+        else:
+            for room in rooms:
+                room.game.abort()
 
-        # Poll the IO loop's handlers until they all shut down.
-        poller = tornado.ioloop.PeriodicCallback(poll_stop, 250,
-                                                 io_loop=io_loop)
-        poller.start()
+        if app.journal is not None:
+            journal_writer.stop()
+            app.journal.flush()
 
-        # Give up after 10 seconds of waiting.
-        io_loop.add_timeout(time.time() + 10, io_loop.stop)
+        if ranked_path:
+            app.leaderboard.save(ranked_path)
+
+        io_loop.stop()
 
     signal.signal(signal.SIGINT,  sig_handler)
     signal.signal(signal.SIGTERM, sig_handler)
@@ -236,5 +1075,39 @@ def main():
     io_loop.start()
     logger.info('Exit')
 
+
+def serve_worker(index, count, channel):
+    """
+    Entry point of a worker process, serving the connections the dispatcher
+    hands over through `channel` as well as the ones other workers forward
+    on its private port.
+    """
+    worker = Worker(index, count, settings.WORKERS['private_port'])
+    app = make_application(worker)
+
+    http_server = tornado.httpserver.HTTPServer(app)
+    http_server.listen(worker.port_of(index), '127.0.0.1')
+
+    # Without a dispatcher there is nothing left to serve
+    receiver = ConnectionReceiver(
+        channel, http_server,
+        on_lost=lambda: os.kill(os.getpid(), signal.SIGTERM))
+    receiver.start()
+
+    serve(app, http_server)
+
+
+def main():
+    if settings.WORKERS['count'] != 1:
+        run_workers(settings.PORT, settings.WORKERS['count'], serve_worker)
+        return
+
+    app = make_application()
+
+    http_server = tornado.httpserver.HTTPServer(app)
+    http_server.listen(settings.PORT)
+
+    serve(app, http_server)
+
 if __name__ == '__main__':
     main()
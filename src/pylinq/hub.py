@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+from collections import deque
+import logging
+import time
+import uuid
+
+from pylinq.frame import PAYLOADS, PRIVATE_PAYLOADS, event_frame
+from pylinq import metrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class EventHandler(object):
+    """
+    Handler bound to one game event, passing the event's name on to a hub
+    method. Hubs live as long as their room, so this is kept smaller than
+    the equivalent functools.partial.
+    """
+    __slots__ = ('method', 'event')
+
+    def __init__(self, method, event):
+        self.method = method
+        self.event = event
+
+    def __call__(self, *args):
+        return self.method(self.event, *args)
+
+
+class EventHub(object):
+    """
+    Fans the events of a room's game out to the room's subscribers.
+
+    The hub binds exactly one handler per event on the game, however many
+    subscribers there are, and builds a single frame per event, encoded
+    once per wire format. Subscribers are objects with a `send(frame)`
+    method and a `player` attribute, the player they play as or None, which
+    is only ever changed through set_player() once subscribed: subscribers
+    are indexed by player so that private events go straight to theirs.
+
+    Given a DeliveryQueue, the hub receives the game's events on the IO loop
+    rather than synchronously within trigger().
+
+    Event frames are numbered, and the last `history` of them are kept so
+    that clients coming back after losing their connection can be sent the
+    ones they missed. Numbers start over in every process: the hub's epoch
+    tells apart numbers given by different hubs.
+    """
+
+    def __init__(self, game, queue=None, history=64):
+        self.game = game
+        self.queue = queue
+        self.subscribers = set()
+        # player name -> subscribers playing as them
+        self.by_player = {}
+
+        self.epoch = uuid.uuid4().hex[:8]
+        self.sequence = 0
+        # (sequence number, frame, player it is for or None)
+        self.history = deque(maxlen=history)
+        on_event, on_private_event = self.on_event, self.on_private_event
+        self.handlers = tuple(
+            [EventHandler(on_event, event) for event in PAYLOADS] +
+            [EventHandler(on_private_event, event)
+             for event in PRIVATE_PAYLOADS])
+
+        for handler in self.handlers:
+            self.game.bind(handler.event, handler, queue=queue)
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def subscribe(self, subscriber):
+        self.subscribers.add(subscriber)
+        self._index(subscriber)
+
+    def unsubscribe(self, subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.discard(subscriber)
+            self._unindex(subscriber)
+
+    def set_player(self, subscriber, player):
+        """
+        Make a subscriber, or soon to be one, play as `player`, or as nobody.
+        """
+        subscribed = subscriber in self.subscribers
+        if subscribed:
+            self._unindex(subscriber)
+
+        subscriber.player = player
+        if subscribed:
+            self._index(subscriber)
+
+    def _index(self, subscriber):
+        if subscriber.player is not None:
+            self.by_player.setdefault(
+                subscriber.player.name, set()).add(subscriber)
+
+    def _unindex(self, subscriber):
+        if subscriber.player is None:
+            return
+
+        subscribers = self.by_player.get(subscriber.player.name, None)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.by_player[subscriber.player.name]
+
+    def on_event(self, event, *args):
+        if metrics.enabled:
+            start = time.perf_counter()
+
+        self.sequence += 1
+        frame = event_frame(event, *args, seq=self.sequence)
+        self.history.append((self.sequence, frame, None))
+
+        self.broadcast(frame)
+
+        if metrics.enabled:
+            metrics.fanout_latency.observe(time.perf_counter() - start, event)
+
+    def on_private_event(self, event, player, *args):
+        if metrics.enabled:
+            start = time.perf_counter()
+
+        self.send_private(event, player, *args)
+
+        if metrics.enabled:
+            metrics.fanout_latency.observe(time.perf_counter() - start, event)
+
+    def send_private(self, event, player, *args):
+        self.sequence += 1
+        frame = event_frame(event, player, *args, seq=self.sequence)
+        self.history.append((self.sequence, frame, player))
+
+        self.send_to(player, frame)
+
+    def send_to(self, player, frame):
+        """
+        Send a frame to the subscribers playing as `player` only.
+        """
+        subscribers = self.by_player.get(player.name, None)
+        if not subscribers:
+            return
+
+        # Sending may close a subscriber, which then unsubscribes
+        for subscriber in tuple(subscribers):
+            # Not to whoever played as a player of the same name before
+            if subscriber.player is player:
+                subscriber.send(frame)
+
+    def missed(self, epoch, since, player=None):
+        """
+        Get the frames sent after frame number `since` of hub `epoch`, the
+        private ones only for `player`. Returns None if they are not all
+        known anymore, or never were.
+        """
+        if epoch != self.epoch or not 0 <= since <= self.sequence:
+            return None
+
+        oldest = self.history[0][0] if self.history else self.sequence + 1
+        if since < oldest - 1:
+            return None
+
+        return [frame for sequence, frame, target in self.history
+                if sequence > since and (target is None or target is player)]
+
+    def broadcast(self, frame):
+        """
+        Send a frame to every subscriber.
+        """
+        # Sending may close a subscriber, which then unsubscribes
+        for subscriber in list(self.subscribers):
+            subscriber.send(frame)
+
+    def close(self):
+        """
+        Unbind the hub from the game and drop every subscriber.
+        """
+        for handler in self.handlers:
+            self.game.unbind(handler.event, handler)
+
+        self.handlers = ()
+        self.subscribers.clear()
+        self.by_player.clear()
+
+        if self.queue is not None:
+            self.queue.close()
@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""
+Append-only journal of the events triggered by the game of each room.
+
+Each room is journaled to its own file of JSON lines, one record per event:
+
+    [sequence number, time, event, arguments]
+
+Recording an event only buffers it in memory: buffers are written out by
+flush(), which the server calls periodically, so journaling costs no
+system call per event. Replaying a room's records rebuilds its game state.
+
+The journal is write-only as far as clients go: they catch up through the
+event history of their room's hub, while journal files are kept, rooms gone
+included, to look into what happened to a game and rebuild it offline.
+"""
+import json
+import logging
+import os
+import time
+import urllib.parse
+
+from pylinq.event import Events
+from pylinq.game import GameState
+from pylinq.hub import EventHandler
+from pylinq.player import Player
+
+# Bytes read from the end of a journal to find its last sequence number
+TAIL_SIZE = 4096
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class JournalException(Exception):
+    pass
+
+
+def _name(player):
+    return [player.name]
+
+
+def _nothing():
+    return []
+
+
+def _role(player):
+    return [player.name, player.role, player.secret_word]
+
+
+def _picked_word(player, word):
+    return [player.name, word]
+
+
+def _score(player):
+    return [player.name, player.score]
+
+
+def _resolved_record(round_number, winners):
+    return [round_number, [[p.name, p.score] for p in winners]]
+
+
+# Turns the arguments an event is triggered with into the arguments
+# journaled, which must be plain JSON data.
+RECORDS = {
+    Events.NEW_PLAYER: _name,
+    Events.NEW_MASTER: _name,
+    Events.PLAYER_QUIT: _name,
+    Events.GAME_STARTED: _nothing,
+    Events.GAME_ABORTED: _nothing,
+    Events.GAME_FINISHED: _nothing,
+    Events.PLAYER_ROLE_ASSIGNED: _role,
+    Events.PLAYER_PICKED_WORD: _picked_word,
+    Events.PLAYER_SCORED: _score,
+    Events.ROUND_RESOLVED: _resolved_record,
+}
+
+
+def _plain(*args):
+    # Events without a record of their own: players are journaled by name
+    return [arg.name if isinstance(arg, Player) else arg for arg in args]
+
+
+def _new_player(game, name):
+    if name in game.players:
+        return
+
+    player = Player(name)
+    game.players[player.name] = player
+    game._standings_changed('join', player)
+
+
+def _new_master(game, name):
+    # The first player to join is elected master before the game announces
+    # them as a new player
+    _new_player(game, name)
+    game._master_player = game.players[name]
+
+
+def _player_quit(game, name):
+    quitter = game.players.pop(name)
+    game._standings_changed('quit', quitter)
+    # The next master, if anybody is left, is journaled right after
+    if game._master_player is quitter:
+        game._master_player = None
+
+
+def _game_started(game):
+    game.started = True
+    game.finished = False
+    game.round_played = 0
+    for player in game.players.values():
+        player.words = ()
+
+
+def _game_finished(game):
+    game.started = False
+    game.finished = True
+
+
+def _game_aborted(game):
+    game.players = {}
+    game.started = False
+    game.finished = False
+    game._master_player = None
+    game.round_played = 0
+    game._standings_changed('reset')
+
+
+def _role_assigned(game, name, role, secret_word):
+    player = game.players[name]
+    player.role = role
+    player.secret_word = secret_word
+
+
+def _picked(game, name, word):
+    game.players[name].words += (word,)
+
+
+def _scored(game, name, score):
+    player = game.players[name]
+    player.score = score
+    game._standings_changed('score', player)
+
+
+def _round_resolved(game, round_number, scores):
+    # Scores were journaled on their own as the round was resolved
+    game.round_played = round_number
+
+
+# Applies a journaled event to a game state, without triggering anything.
+# Events missing here don't change the game state.
+REPLAYS = {
+    Events.NEW_PLAYER: _new_player,
+    Events.NEW_MASTER: _new_master,
+    Events.PLAYER_QUIT: _player_quit,
+    Events.GAME_STARTED: _game_started,
+    Events.GAME_ABORTED: _game_aborted,
+    Events.GAME_FINISHED: _game_finished,
+    Events.PLAYER_ROLE_ASSIGNED: _role_assigned,
+    Events.PLAYER_PICKED_WORD: _picked,
+    Events.PLAYER_SCORED: _scored,
+    Events.ROUND_RESOLVED: _round_resolved,
+}
+
+
+def replay(records, game=None):
+    """
+    Rebuild a game state from journal records, applied in order to `game`
+    or to a new game state. Returns the game state.
+    """
+    if game is None:
+        game = GameState()
+
+    for _, _, event, args in records:
+        apply = REPLAYS.get(event, None)
+        if apply is not None:
+            apply(game, *args)
+
+    game._restore_round()
+    return game
+
+
+def read_journal(path, since=0):
+    """
+    Iterate over the records of a journal file with a sequence number
+    greater than `since`.
+    """
+    if not os.path.exists(path):
+        return
+
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                record = json.loads(line.decode('utf-8'))
+            except ValueError:
+                # Torn write at the end of the file, e.g. after a crash
+                logger.warning('Skipping bad journal line in "{}"'.format(
+                    path))
+                continue
+
+            if record[0] > since:
+                yield record
+
+
+def last_sequence(path):
+    """
+    Get the sequence number of the last record of a journal file, 0 if it is
+    empty or missing.
+    """
+    if not os.path.exists(path):
+        return 0
+
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - TAIL_SIZE))
+        lines = f.read().split(b'\n')
+
+    for line in reversed(lines):
+        try:
+            return json.loads(line.decode('utf-8'))[0]
+        except (ValueError, IndexError, TypeError):
+            continue
+
+    return 0
+
+
+class RoomJournal(object):
+    """
+    Records the events of one room's game, and buffers them until they are
+    flushed to the room's journal file. Room journals with buffered records
+    add themselves to the `dirty` set.
+    """
+
+    def __init__(self, room, path, dirty):
+        self.room = room
+        self.path = path
+        self.dirty = dirty
+        self.sequence = last_sequence(path)
+        self.buffer = []
+
+        self.handlers = tuple(EventHandler(self.record, event)
+                              for event in room.game.get_events())
+        for handler in self.handlers:
+            room.game.bind(handler.event, handler)
+
+    def record(self, event, *args):
+        self.sequence += 1
+        if not self.buffer:
+            self.dirty.add(self)
+
+        encode = RECORDS.get(event, _plain)
+        self.buffer.append(
+            (self.sequence, time.time(), event, encode(*args)))
+
+    def close(self):
+        for handler in self.handlers:
+            self.room.game.unbind(handler.event, handler)
+        self.handlers = ()
+
+        self.buffer = []
+        self.dirty.discard(self)
+
+    def flush(self, fsync=False):
+        """
+        Append the buffered records to the journal file. Returns the number
+        of records written.
+        """
+        if not self.buffer:
+            return 0
+
+        data = b''.join(
+            json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+            for record in self.buffer)
+
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+        count = len(self.buffer)
+        self.buffer = []
+        self.dirty.discard(self)
+        return count
+
+
+class Journal(object):
+    """
+    Journals the rooms of a process, each to its own file in `directory`.
+    Journal files are opened for each flush only, so that there is no limit
+    on the number of rooms journaled.
+    """
+
+    def __init__(self, directory, fsync=False):
+        self.directory = directory
+        self.fsync = fsync
+        self.rooms = {}
+        self.dirty = set()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path_of(self, room_id):
+        return os.path.join(
+            self.directory,
+            urllib.parse.quote(room_id, safe='') + '.jsonl')
+
+    def attach(self, room):
+        """
+        Start journaling a room, following up on its existing journal.
+        """
+        if room.room_id in self.rooms:
+            raise JournalException(
+                'Room "{}" is already journaled'.format(room.room_id))
+
+        self.rooms[room.room_id] = RoomJournal(
+            room, self.path_of(room.room_id), self.dirty)
+
+    def detach(self, room):
+        """
+        Stop journaling a room which is going away. Its buffered records are
+        written out, and its journal kept.
+        """
+        room_journal = self.rooms.pop(room.room_id, None)
+        if room_journal is None:
+            return
+
+        try:
+            room_journal.flush(self.fsync)
+        except OSError as e:
+            logger.error('Could not write journal of {0}: {1}'.format(
+                room, e))
+        room_journal.close()
+
+    def sequence(self, room_id):
+        """
+        Get the sequence number of the last event of a room.
+        """
+        return self.rooms[room_id].sequence
+
+    def flush(self):
+        """
+        Write out the records buffered for every room. Returns the number of
+        records written.
+        """
+        written = 0
+        for room_journal in list(self.dirty):
+            try:
+                written += room_journal.flush(self.fsync)
+            except OSError as e:
+                logger.error('Could not write journal of {0}: {1}'.format(
+                    room_journal.room, e))
+
+        return written
+
+    def read(self, room_id, since=0):
+        """
+        Get the records of a room with a sequence number greater than
+        `since`, oldest first.
+        """
+        room_journal = self.rooms.get(room_id, None)
+        if room_journal is None:
+            return list(read_journal(self.path_of(room_id), since))
+
+        room_journal.flush(self.fsync)
+        return list(read_journal(room_journal.path, since))
+
+    def replay(self, room_id, since=0, game=None):
+        """
+        Rebuild the game state of a room from its journal.
+        """
+        return replay(self.read(room_id, since), game)
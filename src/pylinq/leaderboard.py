@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Leaderboard of the points players won over every game of the process.
+
+Points are added as rounds are resolved, and players are ranked by points,
+then by name. The leaderboard is saved to a compact snapshot file: a header
+line, then a single line of [name, points] pairs in rank order. Loading the
+snapshots of several workers at once ranks the players of every worker.
+"""
+from collections import namedtuple
+import json
+import logging
+import os
+import time
+import uuid
+
+from pylinq.game import ROUND_POINTS
+from pylinq.snapshot import SnapshotWriter
+from pylinq.utils.skiplist import SkipList
+
+LEADERBOARD_FORMAT = 'pylinq-leaderboard'
+LEADERBOARD_VERSION = 1
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class LeaderboardException(Exception):
+    pass
+
+
+Page = namedtuple('Page', ['version', 'players', 'body'])
+
+
+def decode_leaderboard(data):
+    """
+    Decode the bytes of a leaderboard snapshot to its [name, points] pairs.
+    """
+    lines = data.split(b'\n')
+    try:
+        header = json.loads(lines[0].decode('utf-8'))
+        players = json.loads(lines[1].decode('utf-8'))
+    except (ValueError, IndexError):
+        header = None
+
+    if not isinstance(header, dict) \
+            or header.get('format') != LEADERBOARD_FORMAT:
+        raise LeaderboardException('Not a leaderboard snapshot')
+    if header.get('version') != LEADERBOARD_VERSION:
+        raise LeaderboardException(
+            'Unsupported leaderboard version {}'.format(
+                header.get('version')))
+
+    return players
+
+
+class Leaderboard(object):
+    """
+    Points of every player by name, along with their ranking, ordered so
+    that updating a player's points and finding their rank take O(log n),
+    and the top K players O(log n + K).
+
+    The top `page_size` players are kept as an encoded page until the
+    points change, so that serving it takes neither sorting nor encoding.
+    """
+
+    def __init__(self, page_size=100):
+        self.page_size = page_size
+        # Player name -> points
+        self.points = {}
+        # (-points, name) of every player, best first
+        self.ranking = SkipList()
+        # The epoch tells apart versions of different runs
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._page = None
+
+        self.writer = SnapshotWriter()
+
+    def __len__(self):
+        return len(self.points)
+
+    def add(self, name, points):
+        """
+        Add points to a player, who is ranked from then on.
+        """
+        previous = self.points.get(name, None)
+        if previous is not None:
+            self.ranking.remove((-previous, name))
+        else:
+            previous = 0
+
+        self.points[name] = previous + points
+        self.ranking.insert((-self.points[name], name))
+
+        self.version += 1
+        self._page = None
+
+    def on_round_resolved(self, round_number, winners):
+        for player in winners:
+            self.add(player.name, ROUND_POINTS)
+
+    def top(self, count, start=0):
+        """
+        Get the [name, points] of the players ranked `start` to
+        `start + count`, best first.
+        """
+        return [[name, -points] for points, name
+                in self.ranking.items(start, start + count)]
+
+    def rank(self, name):
+        """
+        Get the rank of a player, 1 for the best one, or None if they are
+        not ranked.
+        """
+        points = self.points.get(name, None)
+        if points is None:
+            return None
+
+        return self.ranking.index((-points, name)) + 1
+
+    def get_page(self):
+        """
+        Get the top players along with the version of the leaderboard and
+        their JSON encoding. The page is only rebuilt after points changed.
+        """
+        if self._page is None:
+            players = [{'name': name, 'points': points}
+                       for name, points in self.top(self.page_size)]
+            self._page = Page(self.version, players,
+                              json.dumps(players).encode('utf-8'))
+
+        return self._page
+
+    def encode(self):
+        """
+        Encode the leaderboard to the bytes of its snapshot.
+        """
+        header = {
+            'format': LEADERBOARD_FORMAT,
+            'version': LEADERBOARD_VERSION,
+            'time': time.time(),
+            'players': len(self.points),
+        }
+
+        return b''.join(
+            json.dumps(data, separators=(',', ':')).encode('utf-8') + b'\n'
+            for data in (header, self.top(len(self.points))))
+
+    def load(self, *snapshots):
+        """
+        Replace the points of every player with those of one or more
+        snapshots, adding up the points of players found in several.
+        """
+        points = {}
+        for data in snapshots:
+            for name, player_points in decode_leaderboard(data):
+                points[name] = points.get(name, 0) + player_points
+
+        self.points = points
+        self.ranking = SkipList()
+        for name, player_points in points.items():
+            self.ranking.insert((-player_points, name))
+
+        self.version += 1
+        self._page = None
+
+    def save(self, path):
+        self.writer.write(path, self.encode())
+        logger.info('Saved {} players of the leaderboard'.format(len(self)))
+
+    def save_in_background(self, path):
+        """
+        Encode a snapshot and write it from another thread, unless the last
+        one is still being written.
+        """
+        if self.writer.busy:
+            logger.warning('Previous leaderboard still being written')
+            return
+
+        self.writer.write_in_background(path, self.encode())
+
+    def restore(self, path):
+        """
+        Load the snapshot at `path`, if it exists. Returns the number of
+        players restored.
+        """
+        if not os.path.exists(path):
+            return 0
+
+        with open(path, 'rb') as f:
+            self.load(f.read())
+        logger.info('Restored {} players of the leaderboard'.format(
+            len(self)))
+
+        return len(self)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+import logging
+
+from pylinq.event import Events
+from pylinq.game import MIN_PLAYER_COUNT, MAX_PLAYER_COUNT
+
+# Game events changing whether and how many seats a table has free
+SEAT_EVENTS = (
+    Events.NEW_PLAYER,
+    Events.PLAYER_QUIT,
+    Events.GAME_STARTED,
+    Events.GAME_ABORTED,
+    Events.GAME_FINISHED,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class TableHandler(object):
+    """
+    Handler bound to the seat events of a table's game, whatever their
+    arguments, telling the matchmaker to look at the table again.
+    """
+    __slots__ = ('matchmaker', 'room')
+
+    def __init__(self, matchmaker, room):
+        self.matchmaker = matchmaker
+        self.room = room
+
+    def __call__(self, *args):
+        self.matchmaker.update(self.room)
+
+
+class Matchmaker(object):
+    """
+    Seats players at tables, rooms of a registry it opens for them, rather
+    than having them pick a room.
+
+    Players are seated at the fullest table with a seat free, so that tables
+    fill up and start quickly, and a new table is opened only when every
+    table is full or playing. A table's game starts as soon as it seats
+    `min_players`.
+
+    Open tables are kept in buckets by number of free seats, and move from
+    one bucket to another as their games tell players join and quit: finding
+    the fullest table only looks at the first bucket that is not empty,
+    never at every table.
+
+    `owns(room_id)` tells whether a room id may be used for a new table, so
+    that workers only open tables they own.
+    """
+
+    def __init__(self, rooms, min_players=MIN_PLAYER_COUNT,
+                 max_players=MAX_PLAYER_COUNT, prefix='table-', owns=None):
+        self.rooms = rooms
+        self.min_players = min_players
+        self.max_players = max_players
+        self.prefix = prefix
+        self.owns = owns
+
+        # Free seats -> room id -> open table with that many seats free,
+        # oldest first
+        self.buckets = [OrderedDict() for i in range(0, max_players + 1)]
+        # Room id -> free seats of the open tables
+        self.free_seats = {}
+        # Room id -> handler bound to the table's game
+        self.handlers = {}
+        self.opened = 0
+
+    def __len__(self):
+        return len(self.free_seats)
+
+    def seat(self, player_name):
+        """
+        Seat a player at the fullest table with a seat free, opening one if
+        needed, and start its game if the table has enough players. Returns
+        the table's room.
+        """
+        room = self.find_table(player_name)
+        if room is None:
+            room = self.open_table()
+
+        game = room.game
+        game.add_player(player_name)
+        logger.info('Player "{0}" seated at {1}'.format(player_name, room))
+
+        if game.get_player_count() >= self.min_players:
+            game.start(game.master_player.name)
+
+        return room
+
+    def find_table(self, player_name):
+        """
+        Get the fullest open table at which a player can sit, None if there
+        is none.
+        """
+        for bucket in self.buckets[1:]:
+            for room in bucket.values():
+                # Names are only unique at a table
+                if player_name not in room.game.players:
+                    return room
+
+        return None
+
+    def open_table(self):
+        while True:
+            self.opened += 1
+            room_id = '{0}{1}'.format(self.prefix, self.opened)
+            if room_id not in self.rooms \
+                    and (self.owns is None or self.owns(room_id)):
+                break
+
+        room = self.rooms.get(room_id)
+        self.watch(room)
+        return room
+
+    def watch(self, room):
+        """
+        Start seating players at a room.
+        """
+        if room.room_id in self.handlers:
+            return
+
+        handler = self.handlers[room.room_id] = TableHandler(self, room)
+        for event in SEAT_EVENTS:
+            room.game.bind(event, handler)
+
+        self.update(room)
+
+    def forget(self, room):
+        """
+        Stop seating players at a room, e.g. as it is removed.
+        """
+        handler = self.handlers.pop(room.room_id, None)
+        if handler is None:
+            return
+
+        for event in SEAT_EVENTS:
+            room.game.unbind(event, handler)
+        self._close(room.room_id)
+
+    def update(self, room):
+        """
+        Put a table in the bucket of its number of free seats, or out of
+        every bucket if it is full or its game started.
+        """
+        self._close(room.room_id)
+
+        game = room.game
+        if game.started or game.finished:
+            return
+
+        free_seats = self.max_players - game.get_player_count()
+        if free_seats > 0:
+            self.buckets[free_seats][room.room_id] = room
+            self.free_seats[room.room_id] = free_seats
+
+    def _close(self, room_id):
+        free_seats = self.free_seats.pop(room_id, None)
+        if free_seats is not None:
+            del self.buckets[free_seats][room_id]
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Lightweight metrics, exposed in the Prometheus text format.
+
+Instrumented code checks `metrics.enabled` before measuring anything, so
+that disabled metrics cost a single attribute lookup.
+"""
+import bisect
+
+# Turned on by enable()
+enabled = False
+
+# Default latency buckets, in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class MetricException(Exception):
+    pass
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(
+        '{0}="{1}"'.format(name, _escape(value))
+        for name, value in zip(names, values)) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric(object):
+    """
+    Base of the metric kinds, which render their `samples()` below the
+    metric's help and type lines.
+    """
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+
+    def _check(self, label_values):
+        if len(label_values) != len(self.label_names):
+            raise MetricException('Metric "{0}" takes labels {1}'.format(
+                self.name, self.label_names))
+
+    def render(self):
+        lines = ['# HELP {0} {1}'.format(self.name, self.description),
+                 '# TYPE {0} {1}'.format(self.name, self.kind)]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        super(Counter, self).__init__(name, description, labels)
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        self._check(label_values)
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in sorted(self.values.items()):
+            yield '{0}{1} {2}'.format(
+                self.name, _labels(self.label_names, label_values),
+                _number(value))
+
+
+class Gauge(Metric):
+    """
+    Gauge whose value is read from a callback when metrics are collected,
+    so that keeping it up to date costs nothing. The callback returns a
+    number, or a dict of numbers keyed by tuples of label values.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, description, callback, labels=()):
+        super(Gauge, self).__init__(name, description, labels)
+        self.callback = callback
+
+    def samples(self):
+        value = self.callback()
+        values = value if isinstance(value, dict) else {(): value}
+
+        for label_values, value in sorted(values.items()):
+            yield '{0}{1} {2}'.format(
+                self.name, _labels(self.label_names, label_values),
+                _number(value))
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(),
+                 buckets=LATENCY_BUCKETS):
+        super(Histogram, self).__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per bucket counts (last one is +Inf), sum]
+        self.values = {}
+
+    def observe(self, value, *label_values):
+        entry = self.values.get(label_values, None)
+        if entry is None:
+            self._check(label_values)
+            entry = self.values[label_values] = \
+                [[0] * (len(self.buckets) + 1), 0]
+
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self):
+        names = self.label_names + ('le',)
+
+        for label_values, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                bucket = label_values + (_number(bound),)
+                yield '{0}_bucket{1} {2}'.format(
+                    self.name, _labels(names, bucket), cumulative)
+
+            labels = _labels(self.label_names, label_values)
+            yield '{0}_sum{1} {2}'.format(self.name, labels, repr(total))
+            yield '{0}_count{1} {2}'.format(self.name, labels, cumulative)
+
+
+class MetricsRegistry(object):
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise MetricException(
+                'Metric "{}" already registered'.format(metric.name))
+
+        self.metrics[metric.name] = metric
+        return metric
+
+    def unregister(self, name):
+        self.metrics.pop(name, None)
+
+    def counter(self, name, description, labels=()):
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name, description, callback, labels=()):
+        return self.register(Gauge(name, description, callback, labels))
+
+    def histogram(self, name, description, labels=(),
+                  buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text format.
+        """
+        return ''.join(metric.render() + '\n'
+                       for _, metric in sorted(self.metrics.items()))
+
+
+registry = MetricsRegistry()
+
+request_latency = registry.histogram(
+    'pylinq_request_duration_seconds',
+    'Time spent handling HTTP requests', ('route', 'method'))
+trigger_latency = registry.histogram(
+    'pylinq_event_trigger_seconds',
+    'Time spent in Observable.trigger', ('event',))
+fanout_latency = registry.histogram(
+    'pylinq_event_fanout_seconds',
+    'Time spent encoding events and queueing them for websockets',
+    ('event',))
+
+
+def enable():
+    """
+    Turn instrumentation on.
+    """
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import sys
 
 IS_SPY = 0
 IS_COUNTER_SPY = 1
@@ -10,18 +11,24 @@ class PlayerException(Exception):
 
 
 class Player(object):
+    # Rooms hold a few of these each and live long, so players carry no
+    # per-instance __dict__
+    __slots__ = ('name', 'score', 'role', 'words', 'secret_word')
+
     def __init__(self, name):
-        if name is '':
+        if name == '':
             raise PlayerException('Player name cannot by empty')
         elif len(name) > MAX_PLAYER_NAME_LENGTH:
             raise PlayerException(
                 'Max player name length is {0}, was {1}'.format(
                     MAX_PLAYER_NAME_LENGTH, len(name)))
 
-        self.name = name
+        # Player names come back in every room, share their strings
+        self.name = sys.intern(name)
         self.score = 3
         self.role = None
-        self.words = []
+        # Tuples as players pick at most two words: the empty one is shared
+        self.words = ()
 
         self.secret_word = None
 
@@ -36,7 +43,7 @@ class Player(object):
                 """.format(self.name, self.secret_word)
             )
 
-        if len(self.words) is 2:
+        if len(self.words) == 2:
             raise PlayerException(
                 """
                 Player "{0}" has already picked their two words: "{1}" and "{2}"
@@ -45,10 +52,10 @@ class Player(object):
                 self.words[0],
                 self.words[1]))
 
-        self.words.append(word)
+        self.words += (word,)
 
     def get_words(self):
-        return self.words
+        return list(self.words)
 
     def make_spy(self, secret_word):
         self.role = IS_SPY
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+import logging
+import time
+
+from pylinq.game import GameState
+from pylinq.event import Events
+from pylinq.hub import EventHub
+
+DEFAULT_ROOM = 'default'
+MAX_ROOM_ID_LENGTH = 32
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class RoomException(Exception):
+    pass
+
+
+class Room(object):
+    """
+    A single table: one game state plus the bookkeeping the registry needs
+    to decide when the room can be evicted.
+    """
+
+    def __init__(self, room_id, game, hub=None):
+        self.room_id = room_id
+        self.game = game
+        self.last_active = time.time()
+        self.refs = 0
+        self.finished = False
+        self.hub = hub or EventHub(game)
+
+        self.game.bind(Events.GAME_STARTED, self.on_game_started)
+        self.game.bind(Events.GAME_FINISHED, self.on_game_finished)
+
+    def __repr__(self):
+        return 'Room "{0}"'.format(self.room_id)
+
+    def on_game_started(self):
+        # Players may start another game once one is over
+        self.finished = False
+
+    def on_game_finished(self):
+        self.finished = True
+
+    def is_idle(self):
+        """
+        A room is idle when nobody is connected to it and either nobody is
+        seated or its game is over.
+        """
+        return self.refs == 0 and (
+            self.finished or self.game.get_player_count() == 0)
+
+    def close(self):
+        """
+        Release resources held by the room before it is dropped.
+        """
+        if self.game.started:
+            self.game.abort()
+
+        self.hub.close()
+
+
+class RoomRegistry(object):
+    """
+    Keeps every live room of the process, keyed by room id.
+
+    Rooms are created lazily on first lookup, and removed once idle for a
+    while by a RoomReaper. The registry is kept in least recently used
+    order.
+
+    `on_created`, `on_released` and `on_removed` are called with each room
+    the registry creates, stops being held by a connection, and removes.
+    """
+
+    def __init__(self, game_factory=GameState, max_rooms=None,
+                 hub_factory=EventHub, on_created=None, on_removed=None,
+                 on_released=None):
+        self.rooms = OrderedDict()
+        self.game_factory = game_factory
+        self.hub_factory = hub_factory
+        self.max_rooms = max_rooms
+        self.on_created = on_created
+        self.on_removed = on_removed
+        self.on_released = on_released
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def __contains__(self, room_id):
+        return room_id in self.rooms
+
+    def __iter__(self):
+        return iter(list(self.rooms.values()))
+
+    def get(self, room_id, create=True):
+        """
+        Get a room by its id, creating it if needed. Returns None if the room
+        does not exist and `create` is False.
+        """
+        room = self.rooms.get(room_id, None)
+
+        if room is None:
+            if not create:
+                return None
+            room = self._create(room_id)
+        else:
+            self.rooms.move_to_end(room_id)
+
+        room.last_active = time.time()
+        return room
+
+    def _create(self, room_id):
+        if not room_id or len(room_id) > MAX_ROOM_ID_LENGTH:
+            raise RoomException('Invalid room id "{}"'.format(room_id))
+        if self.max_rooms is not None and len(self.rooms) >= self.max_rooms:
+            raise RoomException('Max room count is %d' % self.max_rooms)
+
+        game = self.game_factory()
+        room = Room(room_id, game, self.hub_factory(game))
+        self.rooms[room_id] = room
+        logger.info('Room created: "{}"'.format(room_id))
+
+        if self.on_created is not None:
+            self.on_created(room)
+
+        return room
+
+    def acquire(self, room_id):
+        """
+        Pin a room so that it is never evicted while a connection holds it.
+        """
+        room = self.get(room_id)
+        room.refs += 1
+        return room
+
+    def release(self, room):
+        """
+        Unpin a room previously pinned with `acquire`.
+        """
+        room.refs -= 1
+        room.last_active = time.time()
+
+        if room.room_id in self.rooms:
+            self.rooms.move_to_end(room.room_id)
+
+        if room.refs == 0 and self.on_released is not None:
+            self.on_released(room)
+
+    def remove(self, room_id):
+        """
+        Drop a room from the registry.
+        """
+        room = self.rooms.pop(room_id, None)
+        if room is not None:
+            room.close()
+            logger.info('Room removed: "{}"'.format(room_id))
+
+            if self.on_removed is not None:
+                self.on_removed(room)
+
+        return room
+
+
+class RoomReaper(object):
+    """
+    Removes the rooms of a registry that stay idle for `max_idle` seconds.
+
+    Each room nobody holds has a timer on a timer wheel, armed when it is
+    created or released, so that reaping never scans the registry. When the
+    timer fires, a room touched in the meantime gets its timer armed again
+    for the rest of its idle time.
+    """
+
+    def __init__(self, rooms, wheel, max_idle):
+        self.rooms = rooms
+        self.wheel = wheel
+        self.max_idle = max_idle
+        # room id -> timer
+        self.timers = {}
+
+    def __len__(self):
+        return len(self.timers)
+
+    def watch(self, room, delay=None):
+        """
+        Reap a room once idle long enough, unless it already is watched.
+        """
+        if room.room_id in self.timers:
+            return
+
+        self.timers[room.room_id] = self.wheel.schedule(
+            self.max_idle if delay is None else delay, self.reap,
+            room.room_id)
+
+    def forget(self, room):
+        timer = self.timers.pop(room.room_id, None)
+        if timer is not None:
+            timer.cancel()
+
+    def reap(self, room_id, now=None):
+        """
+        Remove a room if it has been idle long enough. Returns whether it
+        was removed.
+        """
+        self.timers.pop(room_id, None)
+
+        # Looking the room up through get() would touch it
+        room = self.rooms.rooms.get(room_id, None)
+        if room is None or room.refs > 0:
+            # Rooms are watched again once released
+            return False
+
+        idle_time = (now or time.time()) - room.last_active
+        if idle_time < self.max_idle:
+            delay = self.max_idle - idle_time
+        elif room.is_idle():
+            self.rooms.remove(room_id)
+            return True
+        else:
+            # Players are still seated, until they come back or expire
+            delay = self.max_idle
+
+        self.watch(room, max(delay, self.wheel.tick))
+        return False
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+Headless game simulator, playing games between bots to stress-test the game
+logic and measure what a game costs in CPU.
+
+Run from the repository root, e.g.:
+
+    PYTHONPATH=src python -m pylinq.sim --games 100000 --seed 1
+
+Every game is seeded from the run's seed and its number, so that any game
+breaking an invariant can be played again on its own with --replay. With
+--fuzz, bots also send random, mostly invalid, actions in between.
+"""
+from __future__ import print_function
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+from pylinq.actions import ACTIONS, run_action
+from pylinq.cards import get_deck
+from pylinq.game import GameState, GameException, MIN_PLAYER_COUNT, \
+    MAX_PLAYER_COUNT, SPIES_COUNT, ROUNDS_COUNT
+from pylinq.player import PlayerException, IS_SPY, IS_COUNTER_SPY
+
+# Games each task of the process pool plays
+CHUNK_SIZE = 1000
+# Invariant violations kept in a report, to play them again
+MAX_REPORTED_VIOLATIONS = 20
+# Times bots are asked for their word before a game is given up, as bots
+# may keep picking words turned down
+MAX_TURNS = 10 * ROUNDS_COUNT
+
+
+class InvariantViolation(Exception):
+    pass
+
+
+class RandomBot(object):
+    """
+    Picks any word of the deck, its own secret word included.
+    """
+
+    def __init__(self, name, rng):
+        self.name = name
+        self.rng = rng
+
+    def pick_word(self, game, player):
+        return game.cards.pick_word(self.rng)
+
+
+class CarefulBot(RandomBot):
+    """
+    Picks any word of the deck but its own secret word.
+    """
+
+    def pick_word(self, game, player):
+        while True:
+            word = game.cards.pick_word(self.rng)
+            if word != player.secret_word:
+                return word
+
+
+STRATEGIES = {
+    'random': RandomBot,
+    'careful': CarefulBot,
+}
+
+
+def check_invariants(game):
+    """
+    Check the game state is consistent. Returns the list of what is not.
+    """
+    violations = []
+    players = list(game.players.values())
+
+    if players and game.master_player not in players:
+        violations.append('Master player is not seated')
+    if not players and game.master_player is not None:
+        violations.append('Master player without players')
+    if len(players) > MAX_PLAYER_COUNT:
+        violations.append('{} players seated'.format(len(players)))
+
+    if game.started:
+        if len(players) < MIN_PLAYER_COUNT:
+            violations.append(
+                'Started with {} players'.format(len(players)))
+
+        spies = [p for p in players if p.role == IS_SPY]
+        if len(spies) != min(SPIES_COUNT, len(players)):
+            violations.append('{} spies'.format(len(spies)))
+        if len(set(p.secret_word for p in spies)) > 1 \
+                or any(p.secret_word is None for p in spies):
+            violations.append('Spies do not share a secret word')
+        if any(p.role != IS_COUNTER_SPY or p.secret_word is not None
+               for p in players if p not in spies):
+            violations.append('Counter spy with a role or secret word')
+
+        round_ = game.round
+        if round_ is None or round_.number != game.round_played + 1:
+            violations.append('No round played')
+        elif not round_.pending <= set(game.players):
+            violations.append('Round waiting for players not seated')
+        elif any(len(p.words) != round_.number - (p.name in round_.pending)
+                 for p in players):
+            violations.append('Words picked out of turn')
+    elif game.round is not None:
+        violations.append('Round played outside a game')
+    elif game.finished:
+        if game.round_played != ROUNDS_COUNT:
+            violations.append('Finished after {} rounds'.format(
+                game.round_played))
+    elif any(p.role is not None for p in players):
+        violations.append('Role assigned before the game started')
+
+    for player in players:
+        if len(player.words) > 2:
+            violations.append('{} picked {} words'.format(
+                player.name, len(player.words)))
+        if player.secret_word is not None \
+                and player.secret_word in player.words:
+            violations.append('{} picked their secret word'.format(
+                player.name))
+
+    standings = [p['name'] for p in game.get_standings_snapshot().players]
+    if standings != [p.name for p in players]:
+        violations.append('Standings out of date')
+
+    return violations
+
+
+class Simulation(object):
+    """
+    Plays one game between bots: they join, the master starts the game,
+    then bots pick a word in turn until the game is over.
+    """
+
+    def __init__(self, seed, players=4, strategy='careful', fuzz=False,
+                 deck=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.game = GameState(deck=deck or get_deck(), rng=self.rng)
+        self.bots = [STRATEGIES[strategy]('bot%d' % i, self.rng)
+                     for i in range(0, players)]
+        self.fuzz = fuzz
+
+        self.steps = 0
+        self.rejected = 0
+        self.standings_version = self.game.standings_version
+
+    def step(self, action, *args):
+        """
+        Take a game action, then check the game is still consistent. Game
+        rules turning the action down are fine, anything else is not.
+        """
+        self.steps += 1
+        try:
+            action(*args)
+        except (GameException, PlayerException):
+            self.rejected += 1
+
+        self.check()
+
+    def fuzz_step(self):
+        """
+        Send a random action, before bots look at the game for their next
+        move.
+        """
+        if not self.fuzz:
+            return
+
+        names = [bot.name for bot in self.bots] + ['', 'x' * 20, None]
+        action = {'action': self.rng.choice(list(ACTIONS) + ['fly']),
+                  'word': self.rng.choice(['spam', None])}
+
+        self.steps += 1
+        ack = run_action(self.game, action, self.rng.choice(names))
+        if 'error' in ack:
+            self.rejected += 1
+
+        self.check()
+
+    def check(self):
+        violations = check_invariants(self.game)
+        if self.game.standings_version < self.standings_version:
+            violations.append('Standings version went back')
+        self.standings_version = self.game.standings_version
+
+        if violations:
+            raise InvariantViolation('; '.join(violations))
+
+    def play(self):
+        game = self.game
+        for bot in self.bots:
+            self.fuzz_step()
+            self.step(game.add_player, bot.name)
+
+        self.fuzz_step()
+        if game.master_player is None:
+            return
+        self.step(game.start, game.master_player.name)
+        if not game.started:
+            return
+
+        for i in range(0, MAX_TURNS):
+            for bot in self.bots:
+                self.fuzz_step()
+                if game.round is None:
+                    return
+                if bot.name in game.round.pending:
+                    self.step(game.player_picks_word, bot.name,
+                              bot.pick_word(game, game.players[bot.name]))
+
+
+def play_games(seed, first, count, players=4, strategy='careful',
+               fuzz=False):
+    """
+    Play games number `first` to `first + count` of a run. Returns their
+    totals.
+    """
+    totals = {'games': 0, 'steps': 0, 'rejected': 0, 'violations': [],
+              'cpu_time': 0.0}
+    deck = get_deck()
+    # Games log every move
+    logging.getLogger('pylinq.game').setLevel(logging.WARNING)
+
+    start = time.process_time()
+    for number in range(first, first + count):
+        simulation = Simulation(game_seed(seed, number), players, strategy,
+                                fuzz, deck)
+        try:
+            simulation.play()
+        except InvariantViolation as e:
+            _add_violation(totals, number, str(e))
+        except Exception as e:
+            _add_violation(totals, number, '{0}: {1}'.format(
+                type(e).__name__, e))
+
+        totals['games'] += 1
+        totals['steps'] += simulation.steps
+        totals['rejected'] += simulation.rejected
+
+    totals['cpu_time'] = time.process_time() - start
+    return totals
+
+
+def _add_violation(totals, number, message):
+    totals['violations'].append({'game': number, 'error': message})
+
+
+def game_seed(seed, number):
+    return '{0}:{1}'.format(seed, number)
+
+
+def run(games, seed=0, workers=0, chunk_size=CHUNK_SIZE, **options):
+    """
+    Play games on a pool of `workers` processes, one per CPU if 0, or in
+    process if 1. Returns the report of the run.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [(first, min(chunk_size, games - first))
+              for first in range(0, games, chunk_size)]
+
+    start = time.time()
+    if workers == 1:
+        results = [play_games(seed, first, count, **options)
+                   for first, count in chunks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(play_games, seed, first, count, **options)
+                       for first, count in chunks]
+            results = [future.result() for future in futures]
+    elapsed = time.time() - start
+
+    played = sum(result['games'] for result in results)
+    cpu_time = sum(result['cpu_time'] for result in results)
+    violations = [violation for result in results
+                  for violation in result['violations']]
+
+    return {
+        'games': played,
+        'workers': workers,
+        'seconds': round(elapsed, 3),
+        'games_per_sec': round(played / elapsed, 1) if elapsed else None,
+        'cpu_us_per_game': round(cpu_time / played * 1e6, 1)
+        if played else None,
+        'steps': sum(result['steps'] for result in results),
+        'rejected': sum(result['rejected'] for result in results),
+        'violation_count': len(violations),
+        'violations': violations[:MAX_REPORTED_VIOLATIONS],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--seed', default='0')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Processes playing games, 0 for one per CPU')
+    parser.add_argument('--players', type=int, default=4,
+                        help='Bots joining each game')
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES),
+                        default='careful')
+    parser.add_argument('--fuzz', action='store_true',
+                        help='Have bots send random actions in between')
+    parser.add_argument('--replay', type=int, default=None,
+                        help='Play game number REPLAY of the run only')
+    args = parser.parse_args(argv)
+
+    options = {'players': args.players, 'strategy': args.strategy,
+               'fuzz': args.fuzz}
+    if args.replay is not None:
+        report = play_games(args.seed, args.replay, 1, **options)
+    else:
+        report = run(args.games, args.seed, args.workers, **options)
+
+    print(json.dumps(report, indent=2, sort_keys=True))
+    return 1 if report['violations'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
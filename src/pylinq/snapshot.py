@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Snapshots of every room of a process, so that restarting the server does not
+throw the games being played away.
+
+A snapshot is a file of JSON lines: a header, then one line per room with
+the state of its game. Rooms are restored one line at a time, so restoring
+takes time linear in the number of rooms. Snapshots are written to a
+temporary file first and then moved over the previous one, which is thus
+never left half written.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import time
+
+SNAPSHOT_FORMAT = 'pylinq-snapshot'
+SNAPSHOT_VERSION = 1
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class SnapshotException(Exception):
+    pass
+
+
+def _line(data):
+    return json.dumps(data, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def encode_snapshot(rooms):
+    """
+    Encode the rooms of a registry to the bytes of a snapshot. Rooms nobody
+    is seated in are left out. Returns the bytes and the number of rooms
+    they hold.
+    """
+    lines = []
+    for room in rooms:
+        if room.game.get_player_count() == 0:
+            continue
+
+        lines.append(_line({
+            'room': room.room_id,
+            'finished': room.finished,
+            'game': room.game.dump_state(),
+        }))
+
+    header = _line({
+        'format': SNAPSHOT_FORMAT,
+        'version': SNAPSHOT_VERSION,
+        'time': time.time(),
+        'rooms': len(lines),
+    })
+
+    return header + b''.join(lines), len(lines)
+
+
+def write_file(path, data):
+    """
+    Atomically replace the file at `path` with `data`.
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(temp_path, path)
+
+
+def write_snapshot(rooms, path):
+    """
+    Snapshot the rooms of a registry to `path`. Returns the number of rooms
+    saved.
+    """
+    data, count = encode_snapshot(rooms)
+    write_file(path, data)
+
+    return count
+
+
+def read_snapshot(path):
+    """
+    Iterate over the rooms saved in a snapshot, as dicts holding the room
+    id, whether its game is finished, and its game state.
+    """
+    with open(path, 'rb') as f:
+        try:
+            header = json.loads(f.readline().decode('utf-8'))
+        except ValueError:
+            header = None
+
+        if not isinstance(header, dict) \
+                or header.get('format') != SNAPSHOT_FORMAT:
+            raise SnapshotException('Not a snapshot: "{}"'.format(path))
+        if header.get('version') != SNAPSHOT_VERSION:
+            raise SnapshotException(
+                'Unsupported snapshot version {0}: "{1}"'.format(
+                    header.get('version'), path))
+
+        for line in f:
+            yield json.loads(line.decode('utf-8'))
+
+
+def restore_snapshot(rooms, path, owns=None):
+    """
+    Restore the rooms saved in the snapshot at `path` into a registry, if
+    the snapshot exists. Only the rooms for which `owns(room_id)` is true
+    are restored when given. Returns the number of rooms restored.
+    """
+    if not os.path.exists(path):
+        return 0
+
+    restored = 0
+    for saved in read_snapshot(path):
+        room_id = saved['room']
+        if owns is not None and not owns(room_id):
+            logger.warning(
+                'Skipping room "{}" owned by another worker'.format(room_id))
+            continue
+
+        room = rooms.get(room_id)
+        room.game.load_state(saved['game'])
+        room.finished = saved['finished']
+        restored += 1
+
+    return restored
+
+
+class SnapshotWriter(object):
+    """
+    Writes snapshot files from a thread of its own, one at a time and in the
+    order they were taken: a snapshot written right away, e.g. on shutdown,
+    is written after those still waiting to be written in the background,
+    and never overwritten by them.
+    """
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(1)
+        # Future of the last write in the background
+        self.pending = None
+
+    @property
+    def busy(self):
+        return self.pending is not None and not self.pending.done()
+
+    def write(self, path, data):
+        """
+        Write a snapshot, blocking until it is on disk.
+        """
+        self.executor.submit(write_file, path, data).result()
+
+    def write_in_background(self, path, data):
+        self.pending = self.executor.submit(write_file, path, data)
+        self.pending.add_done_callback(self._written)
+
+    def _written(self, future):
+        if future.exception() is not None:
+            logger.error('Could not write snapshot: {}'.format(
+                future.exception()))
+
+
+class Snapshotter(object):
+    """
+    Saves the rooms of a registry to a snapshot file, either right away or
+    in the background, and restores them from it.
+    """
+
+    def __init__(self, rooms, path, owns=None):
+        self.rooms = rooms
+        self.path = path
+        self.owns = owns
+
+        self.writer = SnapshotWriter()
+
+    def restore(self):
+        start = time.time()
+        count = restore_snapshot(self.rooms, self.path, self.owns)
+        logger.info('Restored {0} rooms in {1:.3f}s'.format(
+            count, time.time() - start))
+
+        return count
+
+    def save(self):
+        """
+        Write a snapshot, blocking until it is on disk.
+        """
+        data, count = encode_snapshot(self.rooms)
+        self.writer.write(self.path, data)
+        logger.info('Saved {} rooms'.format(count))
+
+        return count
+
+    def save_in_background(self):
+        """
+        Take a snapshot and write it from another thread, unless the last
+        one is still being written.
+        """
+        if self.writer.busy:
+            logger.warning('Previous snapshot still being written, skipping')
+            return
+
+        # Games are only ever touched on the IO loop, so that is where they
+        # are encoded
+        data, _ = encode_snapshot(self.rooms)
+        self.writer.write_in_background(self.path, data)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import tornado.ioloop
+
+from pylinq.event import Events
+from pylinq.frame import make_frame
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class SpectatorStream(object):
+    """
+    Stream of the public events of a room, shared by every spectator of the
+    room.
+
+    The stream subscribes to the room's hub as a single subscriber however
+    many spectators watch, so that they cost the hub nothing more than one
+    player. Frames it gets are sent at most every `interval` seconds, each
+    encoded once per wire format for every spectator. Of the frames of
+    `coalesce` events waiting to be sent, only the latest one is.
+
+    Spectators are objects with a `write_frame(frame)` method and a `busy`
+    property, true while their previous frames are still being written.
+    They are written to `batch_size` at a time, handing the IO loop back in
+    between, so that they never keep players waiting. Busy spectators skip
+    frames instead of having them queued, and are told to resync once they
+    catch up.
+    """
+    # Spectators play as nobody, and never get private frames
+    player = None
+
+    def __init__(self, hub, interval=0.25, coalesce=(), batch_size=500,
+                 schedule=None):
+        self.hub = hub
+        self.interval = interval
+        self.coalesce = frozenset(coalesce)
+        self.batch_size = batch_size
+        self.schedule = schedule
+
+        self.spectators = set()
+        self.lagging = set()
+        # Frames waiting to be sent, None for those coalesced away
+        self.frames = []
+        # Event -> index in frames of its latest coalesced frame
+        self.latest = {}
+        self.flush_scheduled = False
+        self.writing = False
+        self.skipped = 0
+
+    def __len__(self):
+        return len(self.spectators)
+
+    def add(self, spectator):
+        if not self.spectators:
+            self.hub.subscribe(self)
+        self.spectators.add(spectator)
+
+    def remove(self, spectator):
+        self.spectators.discard(spectator)
+        self.lagging.discard(spectator)
+        if not self.spectators:
+            self.close()
+
+    def close(self):
+        """
+        Stop streaming: drop the frames waiting to be sent and unsubscribe
+        from the hub.
+        """
+        self.hub.unsubscribe(self)
+        self.frames = []
+        self.latest.clear()
+
+    def send(self, frame):
+        """
+        Queue a frame of the hub for the next flush.
+        """
+        if frame.event in self.coalesce:
+            index = self.latest.get(frame.event, None)
+            if index is not None:
+                self.frames[index] = None
+            self.latest[frame.event] = len(self.frames)
+
+        self.frames.append(frame)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self._call_later(self.interval, self.flush)
+
+    def _call_later(self, delay, callback):
+        if self.schedule is None:
+            tornado.ioloop.IOLoop.current().call_later(delay, callback)
+        else:
+            self.schedule(delay, callback)
+
+    def flush(self):
+        """
+        Send the frames waiting to every spectator.
+        """
+        self.flush_scheduled = False
+        if self.writing:
+            # Spectators are still being written the previous frames
+            self._schedule_flush()
+            return
+
+        frames = [frame for frame in self.frames if frame is not None]
+        self.frames = []
+        self.latest.clear()
+        if not frames or not self.spectators:
+            return
+
+        self.writing = True
+        self.write(frames, list(self.spectators), 0)
+
+    def write(self, frames, spectators, start):
+        """
+        Write frames to a batch of spectators, then schedule the next batch.
+        """
+        resync = None
+        for spectator in spectators[start:start + self.batch_size]:
+            if spectator not in self.spectators:
+                continue
+
+            if spectator.busy:
+                self.lagging.add(spectator)
+                self.skipped += 1
+            elif spectator in self.lagging:
+                # Whatever frames were skipped, the state of the room is to
+                # be reloaded anyway
+                self.lagging.discard(spectator)
+                if resync is None:
+                    resync = make_frame(Events.RESYNC, seq=self.hub.sequence)
+                spectator.write_frame(resync)
+            else:
+                for frame in frames:
+                    spectator.write_frame(frame)
+
+        start += self.batch_size
+        if start < len(spectators):
+            self._call_later(
+                0, lambda: self.write(frames, spectators, start))
+        else:
+            self.writing = False
@@ -0,0 +1,138 @@
+from collections import deque
+import logging
+
+import tornado.ioloop
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+DISCONNECT = 'disconnect'
+
+logger = logging.getLogger(__name__)
+
+
+class UnsupportedPolicyException(Exception):
+    pass
+
+
+class DeliveryQueue(object):
+    """
+    Bounded queue of deferred handler calls, drained on the IO loop.
+
+    When a handler returns a future (e.g. a websocket write), the call is
+    considered in flight until the future resolves, and no more than
+    `window` calls are ever in flight: the queue backs up instead, and once
+    it holds `max_size` calls the overflow `policy` kicks in.
+
+    Calls put with a coalescing key replace a queued call with the same key
+    rather than being queued again.
+    """
+
+    def __init__(self, max_size=None, window=None, policy=DROP_OLDEST,
+                 coalesce=(), on_overflow=None, schedule=None):
+        if policy not in (DROP_OLDEST, DROP_NEWEST, DISCONNECT):
+            raise UnsupportedPolicyException(
+                'Unsupported overflow policy "%s"' % policy)
+
+        self.max_size = max_size
+        self.window = window
+        self.policy = policy
+        self.coalesce = frozenset(coalesce)
+        self.on_overflow = on_overflow
+        self.schedule = schedule
+
+        self.entries = deque()
+        self.keys = {}
+        self.in_flight = 0
+        self.dropped = 0
+        self.scheduled = False
+        self.closed = False
+
+    def __len__(self):
+        return len(self.entries)
+
+    def put(self, handler, args=(), key=None):
+        """
+        Queue a call to `handler(*args)`. Returns False if the call was
+        dropped.
+        """
+        if self.closed:
+            return False
+
+        if key is not None:
+            entry = self.keys.get(key, None)
+            if entry is not None:
+                entry[1] = args
+                return True
+
+        if self.max_size is not None and len(self.entries) >= self.max_size:
+            if self.policy == DISCONNECT:
+                self.close()
+                if self.on_overflow is not None:
+                    self.on_overflow(self)
+                return False
+
+            self.dropped += 1
+            if self.policy == DROP_NEWEST:
+                return False
+
+            _, _, dropped_key = self.entries.popleft()
+            if dropped_key is not None:
+                del self.keys[dropped_key]
+
+        entry = [handler, args, key]
+        self.entries.append(entry)
+        if key is not None:
+            self.keys[key] = entry
+
+        self._schedule()
+        return True
+
+    def _schedule(self):
+        if self.scheduled or not self.entries:
+            return
+        if self.window is not None and self.in_flight >= self.window:
+            return
+
+        self.scheduled = True
+        if self.schedule is None:
+            tornado.ioloop.IOLoop.current().add_callback(self.drain)
+        else:
+            self.schedule(self.drain)
+
+    def drain(self):
+        """
+        Run queued calls until the queue is empty or the window is full.
+        """
+        self.scheduled = False
+
+        while self.entries and (self.window is None
+                                or self.in_flight < self.window):
+            handler, args, key = self.entries.popleft()
+            if key is not None:
+                del self.keys[key]
+
+            try:
+                result = handler(*args)
+            except Exception:
+                logger.exception('Error in queued handler {}'.format(handler))
+                continue
+
+            if result is not None and hasattr(result, 'add_done_callback'):
+                self.in_flight += 1
+                result.add_done_callback(self._on_delivered)
+
+    def _on_delivered(self, future):
+        self.in_flight -= 1
+        if not future.cancelled():
+            # Failures are the handler owner's business, don't log them twice
+            future.exception()
+
+        self._schedule()
+
+    def close(self):
+        """
+        Drop every queued call and refuse new ones.
+        """
+        self.closed = True
+        self.entries.clear()
+        self.keys.clear()
@@ -20,31 +20,56 @@ class Observable(object):
         self.events = dict()
 
     def add_events(self, *events):
-        self.events = dict((event, {}) for event in events)
+        # The listeners of an event are a tuple of (handler, args, queue)
+        # entries, replaced whenever they change: trigger() iterates them
+        # without copying, and events nobody listens to share the empty tuple.
+        self.events = dict.fromkeys(events, ())
 
     def has_event(self, event):
         return event in self.events
 
     def get_events(self):
-        return self.events.keys()
+        return list(self.events.keys())
 
     @must_have_event
-    def bind(self, event_name, event_handler, *args):
+    def bind(self, event_name, event_handler, *args, queue=None):
+        """
+        Bind a handler to an event. Extra arguments are appended to the
+        arguments the event is triggered with.
+
+        If a DeliveryQueue is given, the handler is not called by trigger()
+        but queued, to be called later on the IO loop.
+        """
         if not callable(event_handler):
             raise HandlerMustBeCallableException(
                 'Event handler must be callable')
-        self.events[event_name][event_handler] = args
+
+        entry = (event_handler, args, queue)
+        listeners = self.events[event_name]
+        for index, (handler, _, _) in enumerate(listeners):
+            if handler == event_handler:
+                self.events[event_name] = \
+                    listeners[:index] + (entry,) + listeners[index + 1:]
+                return
+
+        self.events[event_name] = listeners + (entry,)
 
     @must_have_event
     def unbind(self, event_name, event_handler=None):
         if event_handler is None:
-            self.events[event_name].clear()
-        elif event_handler in self.events[event_name].keys():
-            del self.events[event_name][event_handler]
+            self.events[event_name] = ()
+        else:
+            self.events[event_name] = tuple(
+                entry for entry in self.events[event_name]
+                if entry[0] != event_handler)
 
     @must_have_event
     def trigger(self, event_name, *args):
-        listeners = self.events[event_name]
-        for handler, extra_args in listeners.items():
+        for handler, extra_args, queue in self.events[event_name]:
             all_args = args + extra_args
-            handler(*all_args)
+            if queue is None:
+                handler(*all_args)
+            elif event_name in queue.coalesce:
+                queue.put(handler, all_args, (event_name, handler))
+            else:
+                queue.put(handler, all_args)
@@ -0,0 +1,186 @@
+"""
+Encoding and decoding of the MessagePack subset event frames are made of:
+None, booleans, integers, floats, strings, bytes, lists and dicts.
+"""
+import struct
+
+# Most arrays and maps nested in one another a packed value may hold
+MAX_DEPTH = 32
+
+
+class PackingException(Exception):
+    pass
+
+
+def pack(value):
+    """
+    Encode a value to MessagePack bytes.
+    """
+    chunks = []
+    _pack(value, chunks.append)
+    return b''.join(chunks)
+
+
+def _pack(value, write):
+    if value is None:
+        write(b'\xc0')
+    elif value is True:
+        write(b'\xc3')
+    elif value is False:
+        write(b'\xc2')
+    elif isinstance(value, int):
+        _pack_int(value, write)
+    elif isinstance(value, float):
+        write(b'\xcb' + struct.pack('>d', value))
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        _pack_header(len(data), write, 0xa0, 31, b'\xd9', b'\xda', b'\xdb')
+        write(data)
+    elif isinstance(value, (bytes, bytearray)):
+        _pack_header(len(value), write, None, 0, b'\xc4', b'\xc5', b'\xc6')
+        write(bytes(value))
+    elif isinstance(value, (list, tuple)):
+        _pack_header(len(value), write, 0x90, 15, None, b'\xdc', b'\xdd')
+        for item in value:
+            _pack(item, write)
+    elif isinstance(value, dict):
+        _pack_header(len(value), write, 0x80, 15, None, b'\xde', b'\xdf')
+        for key, item in value.items():
+            _pack(key, write)
+            _pack(item, write)
+    else:
+        raise PackingException(
+            'Cannot pack value of type {}'.format(type(value).__name__))
+
+
+def _pack_int(value, write):
+    if 0 <= value < 0x80:
+        write(struct.pack('B', value))
+    elif -32 <= value < 0:
+        write(struct.pack('b', value))
+    elif 0 <= value <= 0xff:
+        write(b'\xcc' + struct.pack('>B', value))
+    elif 0 <= value <= 0xffff:
+        write(b'\xcd' + struct.pack('>H', value))
+    elif 0 <= value <= 0xffffffff:
+        write(b'\xce' + struct.pack('>I', value))
+    elif 0 <= value <= 0xffffffffffffffff:
+        write(b'\xcf' + struct.pack('>Q', value))
+    elif -0x80 <= value < 0:
+        write(b'\xd0' + struct.pack('>b', value))
+    elif -0x8000 <= value < 0:
+        write(b'\xd1' + struct.pack('>h', value))
+    elif -0x80000000 <= value < 0:
+        write(b'\xd2' + struct.pack('>i', value))
+    elif -0x8000000000000000 <= value < 0:
+        write(b'\xd3' + struct.pack('>q', value))
+    else:
+        raise PackingException('Integer out of range: {}'.format(value))
+
+
+def _pack_header(length, write, fix, fix_max, prefix8, prefix16, prefix32):
+    if fix is not None and length <= fix_max:
+        write(struct.pack('B', fix | length))
+    elif prefix8 is not None and length <= 0xff:
+        write(prefix8 + struct.pack('>B', length))
+    elif length <= 0xffff:
+        write(prefix16 + struct.pack('>H', length))
+    else:
+        write(prefix32 + struct.pack('>I', length))
+
+
+def unpack(data):
+    """
+    Decode MessagePack bytes holding a single value.
+    """
+    value, offset = _unpack(data, 0, 0)
+    if offset != len(data):
+        raise PackingException('Extra bytes after packed value')
+
+    return value
+
+
+# Fixed size values: type byte -> (struct format, size)
+_FIXED = {
+    0xca: ('>f', 4), 0xcb: ('>d', 8),
+    0xcc: ('>B', 1), 0xcd: ('>H', 2), 0xce: ('>I', 4), 0xcf: ('>Q', 8),
+    0xd0: ('>b', 1), 0xd1: ('>h', 2), 0xd2: ('>i', 4), 0xd3: ('>q', 8),
+}
+
+# Sized values: type byte -> (kind, size of the length)
+_SIZED = {
+    0xc4: ('bin', 1), 0xc5: ('bin', 2), 0xc6: ('bin', 4),
+    0xd9: ('str', 1), 0xda: ('str', 2), 0xdb: ('str', 4),
+    0xdc: ('array', 2), 0xdd: ('array', 4),
+    0xde: ('map', 2), 0xdf: ('map', 4),
+}
+
+_LENGTHS = {1: '>B', 2: '>H', 4: '>I'}
+
+
+def _unpack(data, offset, depth):
+    try:
+        kind = data[offset]
+    except IndexError:
+        raise PackingException('Truncated packed value')
+    offset += 1
+
+    if kind <= 0x7f:
+        return kind, offset
+    if kind >= 0xe0:
+        return kind - 0x100, offset
+    if kind == 0xc0:
+        return None, offset
+    if kind in (0xc2, 0xc3):
+        return kind == 0xc3, offset
+
+    if kind in _FIXED:
+        fmt, size = _FIXED[kind]
+        return _read(fmt, size, data, offset)
+
+    if 0xa0 <= kind <= 0xbf:
+        return _unpack_sized('str', kind & 0x1f, data, offset, depth)
+    if 0x90 <= kind <= 0x9f:
+        return _unpack_sized('array', kind & 0x0f, data, offset, depth)
+    if 0x80 <= kind <= 0x8f:
+        return _unpack_sized('map', kind & 0x0f, data, offset, depth)
+
+    if kind in _SIZED:
+        name, size = _SIZED[kind]
+        length, offset = _read(_LENGTHS[size], size, data, offset)
+        return _unpack_sized(name, length, data, offset, depth)
+
+    raise PackingException('Unsupported type byte 0x{:02x}'.format(kind))
+
+
+def _read(fmt, size, data, offset):
+    if offset + size > len(data):
+        raise PackingException('Truncated packed value')
+    return struct.unpack_from(fmt, data, offset)[0], offset + size
+
+
+def _unpack_sized(kind, length, data, offset, depth):
+    if kind in ('str', 'bin'):
+        if offset + length > len(data):
+            raise PackingException('Truncated packed value')
+        chunk = bytes(data[offset:offset + length])
+        return (chunk.decode('utf-8') if kind == 'str' else chunk,
+                offset + length)
+
+    if depth >= MAX_DEPTH:
+        raise PackingException('Packed value nested too deep')
+
+    if kind == 'array':
+        items = []
+        for i in range(0, length):
+            item, offset = _unpack(data, offset, depth + 1)
+            items.append(item)
+        return items, offset
+
+    items = {}
+    for i in range(0, length):
+        key, offset = _unpack(data, offset, depth + 1)
+        if isinstance(key, (list, dict)):
+            raise PackingException('Map keys must not be arrays or maps')
+        items[key], offset = _unpack(data, offset, depth + 1)
+    return items, offset
@@ -0,0 +1,151 @@
+import random
+
+# Levels of the skip list, enough for millions of values
+MAX_LEVELS = 24
+
+
+class Node(object):
+    __slots__ = ('value', 'next', 'width')
+
+    def __init__(self, value, levels):
+        self.value = value
+        # Next node on each level, and the number of positions the link
+        # moves forward
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class SkipList(object):
+    """
+    Indexable skip list: a sorted list of unique values, in which inserting
+    or removing a value, finding its index and getting the value at an
+    index all take O(log n) on average.
+
+    Besides the next node on each of its levels, nodes keep the width of
+    each link, how many positions it moves forward, so that indexes add up
+    along the way while looking a value up. Links to the end of the list
+    count one position past the last value.
+    """
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+        self.head = Node(None, MAX_LEVELS)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return self.items()
+
+    def __contains__(self, value):
+        node = self._find(value)[0][0].next[0]
+        return node is not None and node.value == value
+
+    def _find(self, value):
+        """
+        Get the last node before `value` on each level, and the position of
+        each of them, the head being at 0.
+        """
+        chain = [None] * MAX_LEVELS
+        positions = [0] * MAX_LEVELS
+        node = self.head
+        position = 0
+        for level in range(MAX_LEVELS - 1, -1, -1):
+            while node.next[level] is not None \
+                    and node.next[level].value < value:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+
+        return chain, positions
+
+    def _levels(self):
+        levels = 1
+        while levels < MAX_LEVELS and self.rng.random() < 0.5:
+            levels += 1
+        return levels
+
+    def insert(self, value):
+        chain, positions = self._find(value)
+        # Position of the new node
+        position = positions[0] + 1
+
+        node = Node(value, self._levels())
+        for level in range(0, len(node.next)):
+            previous = chain[level]
+            skipped = position - positions[level]
+            node.next[level] = previous.next[level]
+            node.width[level] = previous.width[level] - skipped + 1
+            previous.next[level] = node
+            previous.width[level] = skipped
+
+        for level in range(len(node.next), MAX_LEVELS):
+            chain[level].width[level] += 1
+
+        self.size += 1
+
+    def remove(self, value):
+        """
+        Remove a value. Raises ValueError if it is not in the list.
+        """
+        chain, _ = self._find(value)
+        node = chain[0].next[0]
+        if node is None or node.value != value:
+            raise ValueError('{!r} is not in the list'.format(value))
+
+        for level in range(0, len(node.next)):
+            previous = chain[level]
+            previous.width[level] += node.width[level] - 1
+            previous.next[level] = node.next[level]
+
+        for level in range(len(node.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
+
+        self.size -= 1
+
+    def index(self, value):
+        """
+        Get the index of a value. Raises ValueError if it is not in the
+        list.
+        """
+        chain, positions = self._find(value)
+        node = chain[0].next[0]
+        if node is None or node.value != value:
+            raise ValueError('{!r} is not in the list'.format(value))
+
+        return positions[0]
+
+    def _node_at(self, index):
+        node = self.head
+        position = 0
+        for level in range(MAX_LEVELS - 1, -1, -1):
+            while node.next[level] is not None \
+                    and position + node.width[level] <= index + 1:
+                position += node.width[level]
+                node = node.next[level]
+
+        return node
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('Skip list index out of range')
+
+        return self._node_at(index).value
+
+    def items(self, start=0, stop=None):
+        """
+        Iterate over the values from index `start` to `stop`, in
+        O(log n + stop - start).
+        """
+        stop = self.size if stop is None else min(stop, self.size)
+        if start >= stop:
+            return
+
+        node = self._node_at(start)
+        for i in range(start, stop):
+            yield node.value
+            node = node.next[0]
@@ -0,0 +1,130 @@
+import logging
+import math
+import time
+
+import tornado.ioloop
+
+logger = logging.getLogger(__name__)
+
+
+class Timer(object):
+    """
+    A call scheduled on a timer wheel.
+    """
+    __slots__ = ('wheel', 'slot', 'rounds', 'callback', 'args')
+
+    def __init__(self, wheel, slot, rounds, callback, args):
+        self.wheel = wheel
+        self.slot = slot
+        self.rounds = rounds
+        self.callback = callback
+        self.args = args
+
+    def cancel(self):
+        self.wheel.cancel(self)
+
+    @property
+    def active(self):
+        return self.slot is not None
+
+
+class TimerWheel(object):
+    """
+    Hashed timing wheel, for the many timers of a server that are mostly
+    cancelled or pushed back before they expire: heartbeats, timeouts.
+
+    The wheel has `slots` slots, each of them the set of the timers expiring
+    when the wheel turns to it, every `tick` seconds. Timers further away
+    than a full turn wait a number of rounds in their slot. Scheduling and
+    cancelling a timer is O(1), and a turn only looks at the timers of one
+    slot, rather than at every timer. Timers fire up to one tick late.
+    """
+
+    def __init__(self, tick=1.0, slots=512, clock=time.monotonic):
+        self.tick = tick
+        self.slots = [set() for i in range(0, slots)]
+        self.clock = clock
+
+        self.position = 0
+        self.time = clock()
+        self.count = 0
+        self.callback = None
+
+    def __len__(self):
+        return self.count
+
+    def schedule(self, delay, callback, *args):
+        """
+        Call `callback(*args)` in `delay` seconds. Returns the timer.
+        """
+        # Time already elapsed since the last turn counts towards the delay
+        ticks = max(1, int(math.ceil(
+            (delay + self.clock() - self.time) / self.tick)))
+        slot = (self.position + ticks) % len(self.slots)
+        timer = Timer(self, slot, (ticks - 1) // len(self.slots), callback,
+                      args)
+
+        self.slots[slot].add(timer)
+        self.count += 1
+        return timer
+
+    def cancel(self, timer):
+        """
+        Cancel a timer. Does nothing if it fired or was cancelled already.
+        """
+        if timer.slot is None:
+            return
+
+        self.slots[timer.slot].discard(timer)
+        timer.slot = None
+        self.count -= 1
+
+    def turn(self):
+        """
+        Turn the wheel one slot, firing the timers expiring there.
+        """
+        self.position = (self.position + 1) % len(self.slots)
+        self.time += self.tick
+
+        slot = self.slots[self.position]
+        expired = [timer for timer in slot if timer.rounds == 0]
+        for timer in slot:
+            timer.rounds -= 1
+        for timer in expired:
+            slot.discard(timer)
+            timer.slot = None
+            self.count -= 1
+
+        for timer in expired:
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                logger.exception('Error in timer {}'.format(timer.callback))
+
+        return len(expired)
+
+    def advance(self):
+        """
+        Turn the wheel as many slots as ticks went by since the last turn.
+        Returns the number of timers fired.
+        """
+        fired = 0
+        now = self.clock()
+        while self.time + self.tick <= now:
+            fired += self.turn()
+
+        return fired
+
+    def start(self):
+        """
+        Turn the wheel on the IO loop.
+        """
+        self.time = self.clock()
+        self.callback = tornado.ioloop.PeriodicCallback(
+            self.advance, self.tick * 1000)
+        self.callback.start()
+
+    def stop(self):
+        if self.callback is not None:
+            self.callback.stop()
+            self.callback = None
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+import array
+import errno
+import logging
+import os
+import selectors
+import signal
+import socket
+import time
+import urllib.parse
+import zlib
+
+import tornado.ioloop
+import tornado.iostream
+import tornado.netutil
+
+from pylinq.room import DEFAULT_ROOM
+
+# Longest request line the dispatcher waits for before giving up
+MAX_REQUEST_LINE = 8192
+# Seconds a new connection has to send its request line
+REQUEST_LINE_TIMEOUT = 5
+# Seconds to wait before looking again at an incomplete request line
+REQUEST_LINE_RETRY = 0.01
+# Paths served by whatever worker, rather than by the owner of a room, and
+# the room id requests for them get, which no room ever has
+ROOMLESS_PATHS = ('/lobby', '/leaderboard')
+ANY_ROOM = ''
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+def worker_for_room(room_id, worker_count):
+    """
+    Get the index of the worker owning a room. The mapping is the same in
+    every process.
+    """
+    return zlib.crc32(room_id.encode('utf-8')) % worker_count
+
+
+def room_from_request(data):
+    """
+    Get the room a request is for from the beginning of its raw bytes,
+    ANY_ROOM if it is for no room in particular, or None if they don't hold
+    the whole request line yet.
+    """
+    end = data.find(b'\r\n')
+    if end == -1:
+        return None
+
+    parts = data[:end].split(b' ')
+    if len(parts) != 3:
+        return DEFAULT_ROOM
+
+    url = urllib.parse.urlsplit(parts[1].decode('latin-1'))
+    if url.path in ROOMLESS_PATHS:
+        return ANY_ROOM
+
+    rooms = urllib.parse.parse_qs(url.query).get('room', None)
+
+    return rooms[0] if rooms else DEFAULT_ROOM
+
+
+def send_connection(channel, connection):
+    """
+    Hand an open connection over to the process at the other end of a unix
+    socket.
+    """
+    channel.sendmsg([b'c'], [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                              array.array('i', [connection.fileno()]))])
+
+
+def receive_connections(channel):
+    """
+    Get the connections handed over through a unix socket. Returns None once
+    the other end is closed.
+    """
+    fds = array.array('i')
+    message, ancillary, _, _ = channel.recvmsg(
+        1, socket.CMSG_SPACE(16 * fds.itemsize))
+
+    if not message and not ancillary:
+        return None
+
+    for level, kind, data in ancillary:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[:len(data) - (len(data) % fds.itemsize)])
+
+    return [socket.socket(fileno=fd) for fd in fds]
+
+
+class Worker(object):
+    """
+    Identity of a worker process: which rooms it owns and where the other
+    workers can be reached.
+    """
+
+    def __init__(self, index, count, private_port):
+        self.index = index
+        self.count = count
+        self.private_port = private_port
+
+    def __repr__(self):
+        return 'Worker {0}/{1}'.format(self.index, self.count)
+
+    def owns(self, room_id):
+        return worker_for_room(room_id, self.count) == self.index
+
+    def port_of(self, index):
+        """
+        Get the loopback port a worker serves on.
+        """
+        return self.private_port + index
+
+    def owner_port(self, room_id):
+        return self.port_of(worker_for_room(room_id, self.count))
+
+
+class ConnectionReceiver(object):
+    """
+    Feeds the connections the dispatcher hands over to a worker's HTTP
+    server.
+    """
+
+    def __init__(self, channel, http_server, on_lost=None):
+        self.channel = channel
+        self.http_server = http_server
+        self.on_lost = on_lost
+
+    def start(self):
+        self.channel.setblocking(False)
+        tornado.ioloop.IOLoop.current().add_handler(
+            self.channel.fileno(), self.on_readable,
+            tornado.ioloop.IOLoop.READ)
+
+    def stop(self):
+        tornado.ioloop.IOLoop.current().remove_handler(self.channel.fileno())
+
+    def on_readable(self, fd, events):
+        while True:
+            try:
+                connections = receive_connections(self.channel)
+            except BlockingIOError:
+                return
+
+            if connections is None:
+                logger.warning('Lost the dispatcher')
+                self.stop()
+                if self.on_lost is not None:
+                    self.on_lost()
+                return
+
+            for connection in connections:
+                self.serve(connection)
+
+    def serve(self, connection):
+        connection.setblocking(False)
+        try:
+            address = connection.getpeername()
+        except OSError:
+            connection.close()
+            return
+
+        self.http_server.handle_stream(
+            tornado.iostream.IOStream(connection), address)
+
+
+class Dispatcher(object):
+    """
+    Runs in the master process. Accepts connections on the public port,
+    peeks at their request line to learn which room they are for, and hands
+    them over to the worker owning that room. Connections for no room in
+    particular, e.g. the lobby's, go to every worker in turn, so that
+    workers share the tables the lobby opens.
+
+    Workers which die are forked again.
+    """
+
+    def __init__(self, sockets, worker_count, worker_main):
+        self.sockets = sockets
+        self.worker_count = worker_count
+        self.worker_main = worker_main
+
+        self.channels = [None] * worker_count
+        self.pids = {}
+        self.pending = {}
+        self.stalled = {}
+        self.selector = selectors.DefaultSelector()
+        self.stopping = False
+        # Worker the next connection for no room in particular goes to
+        self.next_worker = 0
+
+    def fork_worker(self, index):
+        """
+        Fork the worker of the given index, along with the channel used to
+        hand connections over to it.
+        """
+        if self.channels[index] is not None:
+            self.channels[index].close()
+
+        master_end, worker_end = socket.socketpair(socket.AF_UNIX,
+                                                   socket.SOCK_SEQPACKET)
+        pid = os.fork()
+
+        if pid == 0:
+            # Worker process: drop everything belonging to the master
+            self.selector.close()
+            for sock in self.sockets:
+                sock.close()
+            for connection in self.pending:
+                connection.close()
+            for channel in self.channels:
+                if channel is not None:
+                    channel.close()
+            master_end.close()
+
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                self.worker_main(index, self.worker_count, worker_end)
+            except Exception:
+                logger.exception('Worker {} crashed'.format(index))
+                os._exit(1)
+            os._exit(0)
+
+        worker_end.close()
+        master_end.setblocking(False)
+        self.channels[index] = master_end
+        self.pids[pid] = index
+        logger.info('Forked worker {0} (pid {1})'.format(index, pid))
+
+    def run(self):
+        for index in range(0, self.worker_count):
+            self.fork_worker(index)
+
+        def on_signal(sig, *args):
+            logger.warning('Caught signal: {}'.format(sig))
+            self.stopping = True
+
+        signal.signal(signal.SIGINT, on_signal)
+        signal.signal(signal.SIGTERM, on_signal)
+
+        for sock in self.sockets:
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ, self.accept)
+
+        while not self.stopping:
+            timeout = 0.5
+            if self.stalled:
+                timeout = max(0, min(self.stalled.values()) - time.time())
+
+            for key, _ in self.selector.select(timeout=timeout):
+                key.data(key.fileobj)
+
+            self.retry_stalled()
+            self.expire_pending()
+            self.reap_workers()
+
+        self.stop()
+
+    def accept(self, sock):
+        try:
+            connection, _ = sock.accept()
+        except (BlockingIOError, InterruptedError, ConnectionAbortedError):
+            return
+
+        connection.setblocking(False)
+        self.pending[connection] = time.time() + REQUEST_LINE_TIMEOUT
+        self.selector.register(connection, selectors.EVENT_READ, self.route)
+
+    def route(self, connection):
+        try:
+            data = connection.recv(MAX_REQUEST_LINE, socket.MSG_PEEK)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+
+        room_id = room_from_request(data)
+        if room_id is None:
+            if data and len(data) < MAX_REQUEST_LINE:
+                # Peeking doesn't consume the data, so the connection stays
+                # readable: look again a bit later rather than right away.
+                self.selector.unregister(connection)
+                self.stalled[connection] = time.time() + REQUEST_LINE_RETRY
+            else:
+                self.drop(connection)
+            return
+
+        self.selector.unregister(connection)
+        del self.pending[connection]
+
+        index = self.worker_for(room_id)
+        try:
+            send_connection(self.channels[index], connection)
+        except OSError as e:
+            logger.warning('Could not hand connection to worker {0}: {1}'
+                           .format(index, e))
+        connection.close()
+
+    def worker_for(self, room_id):
+        if room_id != ANY_ROOM:
+            return worker_for_room(room_id, self.worker_count)
+
+        index = self.next_worker
+        self.next_worker = (index + 1) % self.worker_count
+        return index
+
+    def drop(self, connection):
+        if self.stalled.pop(connection, None) is None:
+            self.selector.unregister(connection)
+        del self.pending[connection]
+        connection.close()
+
+    def retry_stalled(self):
+        now = time.time()
+        for connection, retry_at in list(self.stalled.items()):
+            if retry_at <= now:
+                del self.stalled[connection]
+                self.selector.register(connection, selectors.EVENT_READ,
+                                       self.route)
+
+    def expire_pending(self):
+        now = time.time()
+        for connection, deadline in list(self.pending.items()):
+            if deadline < now:
+                self.drop(connection)
+
+    def reap_workers(self):
+        while self.pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError as e:
+                if e.errno == errno.ECHILD:
+                    return
+                raise
+            if pid == 0:
+                return
+
+            index = self.pids.pop(pid, None)
+            if index is None:
+                continue
+
+            logger.warning('Worker {0} (pid {1}) exited with status {2}'
+                           .format(index, pid, status))
+            if not self.stopping:
+                self.fork_worker(index)
+
+    def stop(self):
+        logger.info('Stopping workers...')
+        for connection in list(self.pending):
+            self.drop(connection)
+        for sock in self.sockets:
+            self.selector.unregister(sock)
+            sock.close()
+
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+        while self.pids:
+            try:
+                pid, _ = os.waitpid(-1, 0)
+            except InterruptedError:
+                continue
+            except OSError:
+                break
+            self.pids.pop(pid, None)
+
+        logger.info('Exit')
+
+
+def run_workers(port, worker_count, worker_main):
+    """
+    Serve on `port` with `worker_count` worker processes, each of them run by
+    `worker_main(index, count, channel)`.
+    """
+    if worker_count <= 0:
+        worker_count = os.cpu_count() or 1
+
+    sockets = tornado.netutil.bind_sockets(port)
+    Dispatcher(sockets, worker_count, worker_main).run()
@@ -9,6 +9,146 @@ TORNADO_SETTINGS = {
 
 ENV = 'dev'
 
+STATIC = {
+    # Serve static files from memory, fingerprinted and compressed once at
+    # startup, with fingerprinted URLs cached for good by browsers. Files
+    # changed on disk are only picked up on restart.
+    'production': False
+}
+
+WORKERS = {
+    # Number of worker processes, 0 for one per CPU. With more than one, a
+    # dispatcher process hands every connection over to the worker owning
+    # the room it is for (the 'room' query argument).
+    'count': 1,
+    # Worker N also serves on 127.0.0.1:private_port + N for the requests
+    # other workers forward to it
+    'private_port': 9800
+}
+
+ROOMS = {
+    # Maximum number of rooms hosted by one process, None for no limit
+    'max_rooms': None,
+    # Seconds a room may stay empty before it is evicted
+    'idle_timeout': 300
+}
+
+SHUTDOWN = {
+    # Seconds games being played may take to finish before the server
+    # stops, when snapshots are disabled
+    'finish_timeout': 0,
+    # Websockets closed at once, then seconds until the next ones are, so
+    # that clients do not all come back at the same time
+    'batch_size': 100,
+    'batch_interval': 0.1,
+    # Seconds websockets may take to close before the server stops anyway
+    'timeout': 10
+}
+
+TIMERS = {
+    # Seconds between two turns of the timer wheel: timers fire up to this
+    # late
+    'tick': 1,
+    # Slots of the timer wheel. Timers further away than slots * tick
+    # seconds are looked at once per turn of the wheel until they fire.
+    'slots': 512
+}
+
+SNAPSHOT = {
+    # File the games of every room are saved to, and restored from when the
+    # server starts, so that restarting does not end them. Worker N uses
+    # path.N. None to not save games.
+    'path': os.path.join(os.path.dirname(__file__), '..', 'snapshot.jsonl'),
+    # Seconds between two snapshots besides the one taken on shutdown, 0 to
+    # only save games on shutdown
+    'interval': 30
+}
+
+JOURNAL = {
+    # Directory the events of every room are journaled to, one file per
+    # room, None to not journal them
+    'path': None,
+    # Milliseconds between two writes of the journaled events
+    'flush_interval': 200,
+    # Whether to fsync journal files on every write
+    'fsync': False
+}
+
+METRICS = {
+    # Instrument request handling and event delivery, and serve the metrics
+    # on http://address:port/metrics (port + N for worker N)
+    'enabled': False,
+    'address': '127.0.0.1',
+    'port': 9700
+}
+
+SOCKET = {
+    # Deliver game events to websockets on the IO loop rather than within
+    # the request that triggered them
+    'async_delivery': True,
+    # Events for which only the latest occurrence is delivered when several
+    # are waiting to be sent, e.g. ('new_master',)
+    'coalesce': (),
+    # Frames queued for a client before the overflow policy kicks in
+    'max_queued_frames': 256,
+    # Frames written to a client but not flushed yet before we stop writing
+    'max_in_flight_frames': 16,
+    # What to do with a client too slow to keep up: 'drop_oldest',
+    # 'drop_newest' or 'disconnect'
+    'overflow_policy': 'disconnect',
+    # permessage-deflate options for the players' clients supporting it,
+    # e.g. {'compression_level': 6, 'mem_level': 5}, None to not compress.
+    # Each compressed connection keeps its own zlib state, about 144KB at
+    # mem_level 5, and deflates every frame on its own, even those encoded
+    # once for a whole room. Spectators and the lobby are never compressed.
+    'compression': None,
+    # Most actions a client may send in a single batch
+    'max_batch_actions': 32,
+    # Frames kept per room for clients resuming after a lost connection
+    'resume_history': 64,
+    # Seconds a player has to reconnect before the others are told they
+    # lost their connection
+    'lost_connection_grace': 10,
+    # Seconds between two pings of a client
+    'ping_interval': 20,
+    # Seconds a client may stay silent, pongs included, before its
+    # connection is closed
+    'ping_timeout': 60,
+    # Seconds a player may stay without a connection before they are
+    # removed from their game
+    'player_timeout': 300
+}
+
+SPECTATORS = {
+    # Seconds between two deliveries of the events of a room to its
+    # spectators, which get every event of the meantime at once
+    'interval': 0.25,
+    # Events of which spectators only get the latest of each delivery, e.g.
+    # ('new_master',)
+    'coalesce': (),
+    # Spectators written to before handing the IO loop back to others
+    'batch_size': 500
+}
+
+LEADERBOARD = {
+    # File the points players won over every game are saved to, and
+    # restored from when the server starts. Worker N, which ranks the
+    # players of its own rooms, uses path.N, and serves the players of
+    # every worker from the path.N files, as of their last snapshot. None to
+    # not save them, in which case each worker only serves its own players.
+    'path': os.path.join(os.path.dirname(__file__), '..', 'leaderboard.jsonl'),
+    # Seconds between two snapshots besides the one taken on shutdown
+    'interval': 60,
+    # Players served by /leaderboard, best first
+    'page_size': 100
+}
+
+MATCHMAKING = {
+    # Prefix of the ids of the rooms opened for players asking the lobby
+    # for a seat, which start playing once they seat min_player_count
+    'room_prefix': 'table-'
+}
+
 
 def get_game_setting(key):
     if ENV in GAME:
@@ -0,0 +1,75 @@
+import unittest
+
+from pylinq.actions import *
+from pylinq.game import GameState
+
+
+class ActionsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.game = GameState()
+
+    def test_run_action(self):
+        ack = run_action(self.game, {'id': 1, 'action': 'join'}, 'spam')
+
+        self.assertEqual(ack, {'id': 1, 'result': {'joined': True}})
+        self.assertIn('spam', self.game.players)
+
+    def test_run_action_named_player(self):
+        run_action(self.game, {'action': 'join', 'player_name': 'eggs'},
+                   'spam')
+
+        self.assertEqual(list(self.game.players), ['eggs'])
+
+    def test_run_action_errors(self):
+        self.assertIn('error', run_action(self.game, {'action': 'fly'},
+                                          'spam'))
+        self.assertIn('error', run_action(self.game, {'action': 'join'}))
+        self.assertIn('error', run_action(self.game, {'action': 'quit'},
+                                          'spam'))
+        self.assertIn('error', run_action(self.game, 'join', 'spam'))
+        self.assertIn('error', run_action(
+            self.game, {'action': 'join', 'player_name': 1}))
+        self.assertIn('error', run_action(
+            self.game, {'action': 'join', 'player_name': ['spam']}))
+
+    def test_run_batch(self):
+        acks = run_batch(self.game, [
+            {'id': 1, 'action': 'join', 'player_name': 'spam'},
+            {'id': 2, 'action': 'start', 'player_name': 'spam'},
+            {'id': 3, 'action': 'join', 'player_name': 'eggs'},
+            {'id': 4, 'action': 'quit', 'player_name': 'eggs'},
+        ])
+
+        self.assertEqual([ack['id'] for ack in acks], [1, 2, 3, 4])
+        self.assertIn('error', acks[1])
+        self.assertEqual(acks[3]['result'], {'quit': True})
+        self.assertEqual(list(self.game.players), ['spam'])
+
+    def test_run_batch_too_large(self):
+        acks = run_batch(self.game, [{'action': 'join'}] * 3, 'spam',
+                         max_actions=2)
+
+        self.assertEqual(len(acks), 1)
+        self.assertIn('error', acks[0])
+        self.assertEqual(self.game.players, {})
+
+    def test_run_batch_not_list(self):
+        self.assertIn('error', run_batch(self.game, {'action': 'join'})[0])
+
+    def test_pick_word(self):
+        for name in ('spam', 'eggs', 'ham', 'bacon'):
+            self.game.add_player(name)
+        self.game.start('spam')
+
+        ack = run_action(self.game, {'action': 'pick_word'}, 'spam')
+        self.assertIn('error', ack)
+
+        ack = run_action(self.game, {'action': 'pick_word', 'word': '#'},
+                         'spam')
+        self.assertEqual(ack['result'], {'picked': True})
+        self.assertEqual(self.game.players['spam'].get_words(), ['#'])
+
+    def test_check_batch(self):
+        self.assertIsNone(check_batch([{'action': 'join'}], 1))
+        self.assertIn('error', check_batch([{'action': 'join'}] * 2, 1))
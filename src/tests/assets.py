@@ -0,0 +1,84 @@
+import unittest
+import tempfile
+import shutil
+import gzip
+import os
+
+from pylinq.assets import *
+
+
+class AssetsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.write('js/app.js', b'var spam = "eggs";\n' * 100)
+        self.write('img/logo.jpg', b'\xff\xd8' * 200)
+        self.write('index.html',
+                   b'<script src="/static/js/app.js"></script>'
+                   b'<img src=\'/static/img/logo.jpg\'>'
+                   b'<link href="/static/css/missing.css">')
+
+        self.assets = AssetBundle(self.tmp_dir).load()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, path, data):
+        full_path = os.path.join(self.tmp_dir, path)
+        if not os.path.isdir(os.path.dirname(full_path)):
+            os.makedirs(os.path.dirname(full_path))
+        with open(full_path, 'wb') as f:
+            f.write(data)
+
+    def test_fingerprinted(self):
+        asset = self.assets.get('js/app.js')
+
+        self.assertEqual(len(self.assets), 3)
+        self.assertRegex(asset.fingerprinted, r'^js/app\.[0-9a-f]{10}\.js$')
+        self.assertIs(self.assets.get(asset.fingerprinted), asset)
+        self.assertTrue(self.assets.is_fingerprinted(asset.fingerprinted))
+        self.assertFalse(self.assets.is_fingerprinted('js/app.js'))
+        self.assertTrue(asset.content_type.endswith('/javascript'))
+
+    def test_rewrite(self):
+        page = self.assets.get('index.html').data
+
+        self.assertIn(self.assets.url('js/app.js').encode(), page)
+        self.assertIn(b"'" + self.assets.url('img/logo.jpg').encode() + b"'",
+                      page)
+        self.assertIn(b'"/static/css/missing.css"', page)
+        self.assertRaises(AssetException, self.assets.url, 'css/missing.css')
+
+    def test_compressed(self):
+        asset = self.assets.get('js/app.js')
+
+        encoding, body = asset.body('gzip, deflate')
+        self.assertEqual(encoding, 'gzip')
+        self.assertEqual(gzip.decompress(body), asset.data)
+
+        self.assertEqual(asset.body('gzip;q=0'), (None, asset.data))
+        self.assertEqual(asset.body(''), (None, asset.data))
+
+    def test_etags(self):
+        asset = self.assets.get('js/app.js')
+        etags = set(asset.etag_of(encoding)
+                    for encoding in [None] + list(asset.encodings))
+
+        self.assertEqual(len(etags), len(asset.encodings) + 1)
+        self.assertEqual(asset.etag_of('gzip'),
+                         asset.etag[:-1] + '-gz"')
+
+    def test_not_compressed(self):
+        # Images are compressed already
+        asset = self.assets.get('img/logo.jpg')
+
+        self.assertEqual(asset.encodings, {})
+        self.assertEqual(asset.body('gzip'), (None, asset.data))
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('gzip, br;q=0.5, identity;q=0'),
+                         {'gzip', 'br'})
+
+    def test_no_static_directory(self):
+        bundle = AssetBundle(os.path.join(self.tmp_dir, 'nope'))
+        self.assertRaises(AssetException, bundle.load)
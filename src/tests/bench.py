@@ -0,0 +1,45 @@
+import unittest
+
+from pylinq.bench import percentile, summarize, compare, measure_memory
+
+
+def result(requests_per_sec, p50, lag_p50=1.0):
+    return {'metrics': {
+        'requests_per_sec': requests_per_sec,
+        'routes': {'/join': {'p50': p50, 'p99': p50}},
+        'event_lag': {'p50': lag_p50, 'p99': lag_p50},
+    }}
+
+
+class BenchTestCase(unittest.TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([3], 0.99), 3)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_summarize(self):
+        summary = summarize([0.001, 0.002, 0.003])
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual(summary['p50'], 2.0)
+        self.assertEqual(summary['max'], 3.0)
+
+    def test_compare(self):
+        self.assertEqual(compare(result(100, 1.0), result(95, 1.05)), [])
+
+        regressions = compare(result(100, 1.0), result(50, 2.0, 2.0))
+        self.assertEqual(len(regressions), 5)
+
+    def test_compare_memory(self):
+        before = {'benchmark': 'memory', 'metrics': {'bytes_per_room': 1000}}
+        after = {'benchmark': 'memory', 'metrics': {'bytes_per_room': 1200}}
+
+        self.assertEqual(compare(before, before), [])
+        self.assertEqual(len(compare(before, after)), 1)
+
+    def test_measure_memory(self):
+        memory = measure_memory(5, 4)
+        self.assertGreater(memory['bytes_per_room'], 0)
+        self.assertGreater(memory['bytes'], memory['bytes_per_player'])
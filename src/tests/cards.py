@@ -0,0 +1,54 @@
+import unittest
+import tempfile
+import shutil
+import os
+
+from pylinq.cards import *
+
+
+class CardDeckTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.deck = CardDeck.from_json(PATH_TO_WORD_CARDS)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_load(self):
+        self.assertEqual(len(self.deck), 3)
+        self.assertIsInstance(self.deck[0], tuple)
+        self.assertEqual(self.deck[1][7], 'Fléau')
+
+    def test_empty_deck(self):
+        self.assertRaises(CardException, CardDeck, [])
+        self.assertRaises(CardException, CardDeck, [['spam'], []])
+
+    def test_pick_word(self):
+        words = set(word for card in self.deck for word in card)
+        for i in range(0, 20):
+            self.assertIn(self.deck.pick_word(), words)
+
+    def test_get_deck_once(self):
+        self.assertIs(get_deck(), get_deck(PATH_TO_WORD_CARDS))
+
+    def test_binary_deck(self):
+        path = os.path.join(self.tmp_dir, 'cards.bin')
+        compile_deck(PATH_TO_WORD_CARDS, path)
+
+        deck = load_deck(path)
+        self.assertIsInstance(deck, MappedCardDeck)
+        self.assertEqual(list(deck), list(self.deck))
+        self.assertEqual(deck[-1], self.deck[-1])
+        self.assertRaises(IndexError, deck.__getitem__, len(self.deck))
+
+        words = set(word for card in self.deck for word in card)
+        for i in range(0, 20):
+            self.assertIn(deck.pick_word(), words)
+
+    def test_bad_binary_deck(self):
+        path = os.path.join(self.tmp_dir, 'cards.bin')
+        with open(path, 'wb') as f:
+            f.write(BINARY_MAGIC + b'\x00' * 16)
+
+        self.assertRaises(CardException, load_deck, path)
@@ -0,0 +1,55 @@
+import unittest
+
+from pylinq.connections import *
+
+
+class ConnectionRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = ConnectionRegistry()
+
+    def test_add_remove(self):
+        foo, bar = object(), object()
+        self.connections.add(foo, 'spam')
+        self.connections.add(bar, 'eggs')
+
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(self.connections.count('spam'), 1)
+        self.assertEqual(self.connections.room_count(), 2)
+        self.assertIn(foo, self.connections)
+
+        self.connections.remove(foo)
+        self.connections.remove(foo)
+        self.assertNotIn(foo, self.connections)
+        self.assertEqual(self.connections.count('spam'), 0)
+        self.assertEqual(self.connections.room_count(), 1)
+        self.assertEqual(list(self.connections), [bar])
+
+    def test_in_room(self):
+        foo, bar = object(), object()
+        self.connections.add(foo, 'spam')
+        self.connections.add(bar, 'spam')
+
+        self.assertEqual(self.connections.in_room('spam'), {foo, bar})
+        self.assertEqual(self.connections.in_room('eggs'), set())
+
+    def test_players(self):
+        foo, bar = object(), object()
+        self.connections.add(foo, 'spam')
+        self.connections.add(bar, 'spam')
+        self.connections.set_player(foo, 'gontran')
+        self.connections.set_player(bar, 'gontran')
+
+        self.assertEqual(self.connections.for_player('spam', 'gontran'),
+                         {foo, bar})
+        self.assertEqual(self.connections.for_player('eggs', 'gontran'),
+                         set())
+
+        self.connections.set_player(bar, 'roger')
+        self.assertEqual(self.connections.for_player('spam', 'gontran'),
+                         {foo})
+
+        self.connections.remove(foo)
+        self.assertEqual(self.connections.for_player('spam', 'gontran'),
+                         set())
+        self.assertNotIn(('spam', 'gontran'), self.connections.by_player)
@@ -0,0 +1,109 @@
+import unittest
+from mock import Mock
+
+from pylinq.drain import *
+
+
+class Socket(object):
+
+    def __init__(self, sockets):
+        self.sockets = sockets
+        self.closed_with = None
+
+    def close(self, code, reason):
+        self.closed_with = (code, reason)
+
+
+class DrainTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.calls = []
+        self.sockets = set()
+        for i in range(5):
+            self.sockets.add(Socket(self.sockets))
+
+        self.on_drained = Mock()
+        self.drain = self.make_drain()
+
+    def make_drain(self, **kwargs):
+        return Drain(lambda: list(self.sockets), lambda: len(self.sockets),
+                     self.on_drained, batch_size=2, timeout=10,
+                     schedule=lambda delay, callback: self.calls.append(
+                         (delay, callback)),
+                     clock=lambda: self.now, **kwargs)
+
+    def run_next(self):
+        delay, callback = self.calls.pop(0)
+        self.now += delay
+        callback()
+
+    def closing(self):
+        return [socket for socket in self.sockets if socket.closed_with]
+
+    def test_paced_batches(self):
+        self.drain.start()
+        self.assertEqual(len(self.closing()), 2)
+
+        # The timeout was scheduled first
+        self.calls.pop(0)
+        self.run_next()
+        self.assertEqual(len(self.closing()), 4)
+        self.run_next()
+        self.assertEqual(len(self.closing()), 5)
+        self.assertEqual(self.calls, [])
+
+        for socket in self.closing():
+            self.assertEqual(socket.closed_with[0], SERVICE_RESTART)
+
+    def test_drained_once_sockets_gone(self):
+        self.drain.start()
+
+        for socket in list(self.sockets):
+            self.assertFalse(self.on_drained.called)
+            self.sockets.discard(socket)
+            self.drain.check()
+
+        self.on_drained.assert_called_once_with()
+
+        # Later batches and the timeout do nothing
+        while self.calls:
+            self.run_next()
+        self.on_drained.assert_called_once_with()
+
+    def test_no_socket(self):
+        self.sockets.clear()
+        self.drain.start()
+
+        self.on_drained.assert_called_once_with()
+
+    def test_gives_up(self):
+        self.drain.start()
+        while self.calls:
+            self.run_next()
+
+        self.on_drained.assert_called_once_with()
+        self.assertEqual(len(self.sockets), 5)
+
+    def test_waits_until_ready(self):
+        ready = Mock(return_value=False)
+        self.drain = self.make_drain(ready=ready, wait=5)
+        self.drain.start()
+
+        self.calls.pop(0)
+        self.assertEqual(self.closing(), [])
+        self.run_next()
+        self.assertEqual(self.closing(), [])
+
+        ready.return_value = True
+        self.run_next()
+        self.assertEqual(len(self.closing()), 2)
+
+    def test_waits_for_a_while_only(self):
+        self.drain = self.make_drain(ready=Mock(return_value=False), wait=5)
+        self.drain.start()
+
+        self.calls.pop(0)
+        while not self.closing():
+            self.run_next()
+        self.assertAlmostEqual(self.now, 5, delta=0.2)
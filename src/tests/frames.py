@@ -0,0 +1,63 @@
+import unittest
+import json
+
+from pylinq.frame import *
+from pylinq.player import Player
+from pylinq.utils.packing import unpack
+
+
+class FrameTestCase(unittest.TestCase):
+
+    def test_encode_event(self):
+        frame = encode_event('spam', eggs=1)
+        self.assertIsInstance(frame, bytes)
+        self.assertEqual(json.loads(frame.decode('utf-8')),
+                         {'event': 'spam', 'eggs': 1})
+
+    def test_event_frame(self):
+        frame = event_frame(Events.NEW_PLAYER, Player('foo'))
+        self.assertEqual(json.loads(frame.encode().decode('utf-8')), {
+            'event': Events.NEW_PLAYER,
+            'player': {'name': 'foo', 'score': 3}
+        })
+
+        frame = event_frame(Events.GAME_STARTED)
+        self.assertEqual(json.loads(frame.encode().decode('utf-8')),
+                         {'event': Events.GAME_STARTED})
+
+        frame = event_frame(Events.GAME_STARTED, seq=3)
+        self.assertEqual(json.loads(frame.encode().decode('utf-8')),
+                         {'event': Events.GAME_STARTED, 'seq': 3})
+
+    def test_binary_frame(self):
+        frame = event_frame(Events.NEW_PLAYER, Player('foo'), seq=4)
+        self.assertEqual(unpack(frame.encode(BINARY)), [
+            EVENT_CODES[Events.NEW_PLAYER], 4, {'name': 'foo', 'score': 3}])
+
+        frame = make_frame(Events.CONNECTED, epoch='spam', last_seq=2,
+                           player_timeout=300, eggs=True)
+        self.assertEqual(unpack(frame.encode(BINARY)), [
+            EVENT_CODES[Events.CONNECTED], None, 'spam', 2, 300,
+            {'eggs': True}])
+
+    def test_round_resolved_frame(self):
+        winner = Player('foo')
+        winner.score = 4
+        frame = event_frame(Events.ROUND_RESOLVED, 2, [winner], seq=7)
+
+        self.assertEqual(json.loads(frame.encode().decode('utf-8')), {
+            'event': Events.ROUND_RESOLVED, 'seq': 7, 'round': 2,
+            'scores': [['foo', 4]]})
+        self.assertEqual(unpack(frame.encode(BINARY)), [
+            EVENT_CODES[Events.ROUND_RESOLVED], 7, 2, [['foo', 4]]])
+
+    def test_encoded_once(self):
+        frame = event_frame(Events.GAME_STARTED)
+        self.assertIs(frame.encode(), frame.encode(JSON))
+        self.assertIs(frame.encode(BINARY), frame.encode(BINARY))
+        self.assertLess(len(frame.encode(BINARY)), len(frame.encode()))
+
+    def test_event_codes(self):
+        codes = list(EVENT_CODES.values())
+        self.assertEqual(len(set(codes)), len(codes))
+
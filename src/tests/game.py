@@ -1,7 +1,8 @@
 import unittest
 from pylinq.game import *
+from pylinq.event import Events
 from pylinq.player import Player, IS_SPY, PlayerException
-from mock import Mock
+from mock import Mock, patch
 from random import Random
 
 
@@ -38,17 +39,106 @@ class GameTest(unittest.TestCase):
         self.assertFalse(self.game.started)
         self.assertEqual(len(self.game.players), 0)
 
+    def start_game(self, player_count=4):
+        for i in range(0, player_count):
+            self.game.add_player('foo-%d' % i)
+        self.game.start('foo-0')
+
+        return ([p for p in self.game.players.values() if p.is_spy()],
+                [p for p in self.game.players.values() if not p.is_spy()])
+
     def test_player_picks_word(self):
-        foo = self.game.add_player('foo')
-        foo.add_word = Mock()
-        self.game.player_picks_word('foo', 'bar')
-        foo.add_word.assert_called_with('bar')
+        self.start_game()
+        with patch.object(Player, 'add_word') as add_word:
+            self.game.player_picks_word('foo-0', 'bar')
+        add_word.assert_called_with('bar')
+
+    def test_player_picks_word_outside_round(self):
+        self.game.add_player('foo')
+        self.assertRaises(GameException,
+                          self.game.player_picks_word, 'foo', 'bar')
 
     def test_player_picks_own_secret_word(self):
-        player = self.game.add_player('player')
-        player.make_spy('secret')
-        self.assertRaises(PlayerException,
-                          self.game.player_picks_word, 'player', 'secret')
+        spies, counter_spies = self.start_game()
+        self.assertRaises(PlayerException, self.game.player_picks_word,
+                          spies[0].name, spies[0].secret_word)
+        self.assertIn(spies[0].name, self.game.round.pending)
+
+    def test_player_picks_twice_in_round(self):
+        self.start_game()
+        self.game.player_picks_word('foo-0', 'bar')
+        self.assertRaises(GameException,
+                          self.game.player_picks_word, 'foo-0', 'baz')
+
+    def test_round_won_by_spies(self):
+        spies, counter_spies = self.start_game()
+        resolved = Mock()
+        self.game.bind(Events.ROUND_RESOLVED, resolved)
+        self.assertEqual(self.game.round.number, 1)
+
+        for player in counter_spies + spies[:1]:
+            self.game.player_picks_word(player.name, 'word')
+        self.assertEqual(self.game.round.pending, set([spies[1].name]))
+        self.assertFalse(resolved.called)
+
+        self.game.player_picks_word(spies[1].name, 'word')
+        resolved.assert_called_once_with(1, spies)
+        self.assertEqual([p.score for p in spies], [4, 4])
+        self.assertEqual([p.score for p in counter_spies], [3, 3])
+        self.assertEqual(self.game.round_played, 1)
+        self.assertEqual(self.game.round.number, 2)
+        self.assertEqual(self.game.round.pending, set(self.game.players))
+
+    def test_round_won_by_counter_spies(self):
+        spies, counter_spies = self.start_game()
+        resolved = Mock()
+        self.game.bind(Events.ROUND_RESOLVED, resolved)
+
+        self.game.player_picks_word(counter_spies[1].name,
+                                    spies[0].secret_word)
+        for player in spies + counter_spies[:1]:
+            self.game.player_picks_word(player.name, 'word')
+
+        resolved.assert_called_once_with(1, [counter_spies[1]])
+        self.assertEqual(counter_spies[1].score, 4)
+        self.assertEqual([p.score for p in spies], [3, 3])
+
+    def test_game_finished(self):
+        self.start_game()
+        finished = Mock()
+        self.game.bind(Events.GAME_FINISHED, finished)
+
+        for i in range(0, ROUNDS_COUNT):
+            for name in list(self.game.players):
+                self.game.player_picks_word(name, 'word-%d' % i)
+
+        finished.assert_called_once_with()
+        self.assertTrue(self.game.finished)
+        self.assertFalse(self.game.started)
+        self.assertIsNone(self.game.round)
+        self.assertRaises(GameException,
+                          self.game.player_picks_word, 'foo-0', 'bar')
+
+        # Another game can be played at the same table
+        self.game.start('foo-0')
+        self.assertFalse(self.game.finished)
+        self.assertEqual(self.game.round.number, 1)
+        self.assertEqual(self.game.players['foo-0'].words, ())
+
+    def test_restore_round(self):
+        spies, counter_spies = self.start_game()
+        for player in spies:
+            self.game.player_picks_word(player.name, 'word')
+        self.game.player_picks_word(counter_spies[0].name,
+                                    spies[0].secret_word)
+
+        game = GameState()
+        game.load_state(self.game.dump_state())
+        self.assertEqual(game.round.number, 1)
+        self.assertEqual(game.round.pending, set([counter_spies[1].name]))
+        self.assertEqual([p.name for p in game.round.finders],
+                         [counter_spies[0].name])
+        self.assertEqual(len(game.spies), SPIES_COUNT)
 
     def test_assign_roles(self):
         for i in range(0, 7):
@@ -128,5 +218,45 @@ class GameTest(unittest.TestCase):
         self.game.remove_player('foo')
         self.assertEqual(self.game.master_player, bar)
 
+    def test_standings_snapshot(self):
+        self.game.add_player('foo')
+        snapshot = self.game.get_standings_snapshot()
+        self.assertIs(self.game.get_standings_snapshot(), snapshot)
+        self.assertEqual(snapshot.players, [{'name': 'foo', 'score': 3}])
+
+        self.game.add_player('bar')
+        self.assertGreater(self.game.get_standings_snapshot().version,
+                           snapshot.version)
+
+        self.game.set_player_score('foo', 12)
+        self.assertEqual(self.game.players['foo'].score, 12)
+        self.assertEqual(self.game.get_standings_snapshot().players[0],
+                         {'name': 'foo', 'score': 12})
+
+    def test_standings_changes(self):
+        version = self.game.standings_version
+        self.game.add_player('foo')
+        self.game.add_player('bar')
+        self.game.remove_player('foo')
+
+        changes = self.game.get_standings_changes(version)
+        self.assertEqual([(c['op'], c['name']) for c in changes],
+                         [('join', 'foo'), ('join', 'bar'), ('quit', 'foo')])
+        self.assertEqual(changes[-1]['version'], self.game.standings_version)
+        self.assertEqual(
+            self.game.get_standings_changes(self.game.standings_version), [])
+        self.assertIsNone(
+            self.game.get_standings_changes(self.game.standings_version + 1))
+
+    def test_standings_changes_forgotten(self):
+        for i in range(0, STANDINGS_HISTORY + 1):
+            self.game.add_player('foo')
+            self.game.remove_player('foo')
+
+        self.assertIsNone(self.game.get_standings_changes(0))
+        self.assertEqual(len(self.game.get_standings_changes(
+            self.game.standings_version - STANDINGS_HISTORY)),
+            STANDINGS_HISTORY)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,229 @@
+import asyncio
+import unittest
+from mock import Mock
+
+import tornado.testing
+import tornado.websocket
+
+from pylinq.http import *
+from pylinq.connections import ConnectionRegistry
+from pylinq.room import RoomRegistry, MAX_ROOM_ID_LENGTH
+from pylinq.frame import EVENT_CODES
+from pylinq.utils.packing import pack
+from pylinq.utils.timerwheel import TimerWheel
+import settings
+
+
+class PlayerExpiryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.app = Mock()
+        self.app.timers = TimerWheel(1, 16, clock=lambda: self.now)
+        self.app.expiries = {}
+        self.app.connections = ConnectionRegistry()
+
+        self.room = RoomRegistry().get('foo')
+        for name in ('spam', 'eggs'):
+            self.room.game.add_player(name)
+        self.room.game.start('spam')
+
+        self.timeout = settings.SOCKET['player_timeout']
+        self.socket = object()
+
+    def advance(self, seconds):
+        self.now += seconds
+        self.app.timers.advance()
+
+    def connect(self):
+        self.app.connections.add(self.socket, 'foo')
+        self.app.connections.set_player(self.socket, 'spam')
+        unwatch_player(self.app, self.room, 'spam')
+
+    def disconnect(self):
+        self.app.connections.remove(self.socket)
+        watch_player(self.app, self.room, 'spam')
+
+    def test_expire(self):
+        watch_player(self.app, self.room, 'spam')
+        self.advance(self.timeout + 1)
+
+        self.assertNotIn('spam', self.room.game.players)
+        self.assertEqual(self.app.expiries, {})
+
+    def test_disconnected_just_before_join_timer(self):
+        watch_player(self.app, self.room, 'spam')
+        self.connect()
+        self.advance(self.timeout - 1)
+
+        self.disconnect()
+        self.advance(2)
+        self.assertIn('spam', self.room.game.players)
+        self.assertTrue(self.room.game.started)
+
+        self.advance(self.timeout)
+        self.assertNotIn('spam', self.room.game.players)
+
+    def test_back_in_time(self):
+        self.disconnect()
+        self.advance(self.timeout - 1)
+        self.connect()
+        self.advance(self.timeout * 2)
+
+        self.assertIn('spam', self.room.game.players)
+        self.assertEqual(len(self.app.timers), 0)
+
+
+class SocketTestCase(tornado.testing.AsyncHTTPTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.sockets = []
+
+    def tearDown(self):
+        for ws in self.sockets:
+            ws.close()
+        super().tearDown()
+
+    def get_app(self):
+        return make_application()
+
+    async def connect(self, path, **kwargs):
+        ws = await tornado.websocket.websocket_connect(
+            self.get_url(path).replace('http', 'ws', 1), **kwargs)
+        self.sockets.append(ws)
+        return ws
+
+    async def read_frame(self, ws):
+        message = await ws.read_message()
+        return None if message is None else json.loads(message)
+
+    @tornado.testing.gen_test
+    async def test_connect(self):
+        ws = await self.connect('/socket?room=foo')
+
+        frame = await self.read_frame(ws)
+        self.assertEqual(frame['event'], Events.CONNECTED)
+        self.assertEqual(frame['last_seq'], 0)
+        self.assertIn('foo', self._app.rooms)
+
+    async def join(self, name):
+        await self.http_client.fetch(self.get_url('/join?room=foo'),
+                                     method='POST',
+                                     body='player_name={}'.format(name))
+
+    async def read_until(self, ws, event):
+        frame = await self.read_frame(ws)
+        while frame['event'] != event:
+            frame = await self.read_frame(ws)
+        return frame
+
+    @tornado.testing.gen_test
+    async def test_resume(self):
+        ws = await self.connect('/socket?room=foo')
+        connected = await self.read_frame(ws)
+        await self.join('spam')
+        seq = (await self.read_until(ws, Events.NEW_PLAYER))['seq']
+        ws.close()
+
+        await self.join('eggs')
+        ws = await self.connect(
+            '/socket?room=foo&player_name=spam&epoch={0}&since={1}'.format(
+                connected['epoch'], seq))
+        self.assertEqual((await self.read_frame(ws))['event'],
+                         Events.CONNECTED)
+        frame = await self.read_until(ws, Events.NEW_PLAYER)
+        self.assertEqual(frame['player']['name'], 'eggs')
+        self.assertGreater(frame['seq'], seq)
+
+        # Frames of another epoch are not known anymore
+        ws = await self.connect('/socket?room=foo&epoch=spam&since=1')
+        await self.read_frame(ws)
+        self.assertEqual((await self.read_frame(ws))['event'], Events.RESYNC)
+
+    @tornado.testing.gen_test
+    async def test_close(self):
+        await self.join('spam')
+        ws = await self.connect('/socket?room=foo&player_name=spam')
+        await self.read_frame(ws)
+        self.assertEqual(self._app.expiries, {})
+        self.assertEqual(self._app.rooms.get('foo').refs, 1)
+
+        ws.close()
+        while self._app.rooms.get('foo').refs:
+            await asyncio.sleep(0.01)
+        self.assertIn(('foo', 'spam'), self._app.expiries)
+        self.assertEqual(self._app.connections.for_player('foo', 'spam'),
+                         set())
+
+    @tornado.testing.gen_test
+    async def test_seated_after_start(self):
+        names = ['p{}'.format(i) for i in range(0, MIN_PLAYER_COUNT)]
+        for name in names:
+            lobby = await self.connect('/lobby')
+            lobby.write_message(json.dumps({'playerName': name}))
+            seat = await self.read_frame(lobby)
+            self.assertEqual(seat['event'], Events.SEAT_ASSIGNED)
+
+        ws = await self.connect('/socket?room={0}&player_name={1}'.format(
+            seat['room'], names[-1]))
+        events = []
+        for i in range(0, 4):
+            events.append((await self.read_frame(ws))['event'])
+
+        self.assertEqual(events, [Events.CONNECTED, Events.GAME_STARTED,
+                                  Events.PLAYER_ROLE_ASSIGNED,
+                                  Events.NEW_ROUND])
+
+    @tornado.testing.gen_test
+    async def test_no_table_free(self):
+        self._app.rooms.max_rooms = 0
+        lobby = await self.connect('/lobby')
+        lobby.write_message(json.dumps({'id': 1, 'playerName': 'spam'}))
+
+        frame = await self.read_frame(lobby)
+        self.assertEqual(frame['event'], Events.ACK)
+        self.assertIn('error', frame['acks'][0])
+
+    @tornado.testing.gen_test
+    async def test_malformed_binary_message(self):
+        ws = await self.connect('/socket?room=foo',
+                                subprotocols=[BINARY_SUBPROTOCOL])
+        self.assertEqual(unpack(await ws.read_message())[0],
+                         EVENT_CODES[Events.CONNECTED])
+
+        for message in (b'\x81\x91\x01\x02', b'\x91' * 100000, b'\xc1'):
+            await ws.write_message(message, binary=True)
+        await ws.write_message(pack({'id': 1, 'action': 'join',
+                                     'player_name': 'spam'}), binary=True)
+
+        # Still open: the join goes through
+        frame = unpack(await ws.read_message())
+        while frame[0] != EVENT_CODES[Events.ACK]:
+            frame = unpack(await ws.read_message())
+        self.assertEqual(frame[2], [{'id': 1, 'result': {'joined': True}}])
+
+    @tornado.testing.gen_test
+    async def test_room_of_another_worker(self):
+        self._app.worker = Worker(0, 2, 9800)
+        room_id = next('room-{}'.format(i) for i in range(0, 100)
+                       if not self._app.worker.owns('room-{}'.format(i)))
+
+        for path in ('/socket', '/spectate'):
+            ws = await self.connect('{0}?room={1}'.format(path, room_id))
+            self.assertIsNone(await ws.read_message())
+            self.assertEqual(ws.close_code, ROOM_REFUSED)
+
+        self.assertNotIn(room_id, self._app.rooms)
+
+    @tornado.testing.gen_test
+    async def test_invalid_room(self):
+        for path in ('/socket', '/spectate'):
+            ws = await self.connect('{0}?room={1}'.format(
+                path, 'x' * (MAX_ROOM_ID_LENGTH + 8)))
+
+            self.assertIsNone(await ws.read_message())
+            self.assertEqual(ws.close_code, ROOM_REFUSED)
+            self.assertIn('Invalid room id', ws.close_reason)
+
+        self.assertEqual(len(self._app.rooms), 0)
@@ -0,0 +1,147 @@
+import unittest
+import json
+
+from pylinq.hub import *
+from pylinq.frame import event_frame
+from pylinq.game import GameState
+from pylinq.event import Events
+
+
+class Subscriber(object):
+    def __init__(self, player=None):
+        self.player = player
+        self.frames = []
+
+    def send(self, frame):
+        self.frames.append(json.loads(frame.encode().decode('utf-8')))
+
+
+class EventHubTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.game = GameState()
+        self.hub = EventHub(self.game)
+
+    def test_one_handler_per_event(self):
+        for i in range(0, 5):
+            self.hub.subscribe(Subscriber())
+
+        for handlers in self.game.events.values():
+            self.assertLessEqual(len(handlers), 1)
+
+    def test_broadcast(self):
+        foo, bar = Subscriber(), Subscriber()
+        self.hub.subscribe(foo)
+        self.hub.subscribe(bar)
+
+        self.game.add_player('spam')
+        self.assertEqual([f['event'] for f in foo.frames],
+                         [Events.NEW_MASTER, Events.NEW_PLAYER])
+        self.assertEqual(foo.frames, bar.frames)
+
+    def test_unsubscribe(self):
+        foo = Subscriber()
+        self.hub.subscribe(foo)
+        self.hub.unsubscribe(foo)
+        self.hub.unsubscribe(foo)
+
+        self.game.add_player('spam')
+        self.assertEqual(foo.frames, [])
+        self.assertEqual(len(self.hub), 0)
+
+    def test_private_event(self):
+        foo = Subscriber(self.game.add_player('foo'))
+        bar = Subscriber(self.game.add_player('bar'))
+        self.hub.subscribe(foo)
+        self.hub.subscribe(bar)
+
+        self.game.assign_player_roles()
+        self.assertEqual([f['event'] for f in foo.frames],
+                         [Events.PLAYER_ROLE_ASSIGNED])
+        self.assertEqual(len(bar.frames), 1)
+
+    def test_private_event_set_player(self):
+        foo = Subscriber()
+        self.hub.subscribe(foo)
+        self.hub.set_player(foo, self.game.add_player('foo'))
+        self.game.add_player('bar')
+        foo.frames = []
+
+        self.game.assign_player_roles()
+        self.assertEqual(len(foo.frames), 1)
+
+        self.hub.set_player(foo, None)
+        self.assertEqual(self.hub.by_player, {})
+        self.game.assign_player_roles()
+        self.assertEqual(len(foo.frames), 1)
+
+    def test_send_to(self):
+        spam = self.game.add_player('spam')
+        foo, bar, spectator = Subscriber(spam), Subscriber(spam), Subscriber()
+        for subscriber in (foo, bar, spectator):
+            self.hub.subscribe(subscriber)
+
+        self.hub.send_to(spam, event_frame(Events.PLAYER_ROLE_ASSIGNED, spam))
+        self.assertEqual(len(foo.frames), 1)
+        self.assertEqual(len(bar.frames), 1)
+        self.assertEqual(spectator.frames, [])
+
+        self.hub.unsubscribe(foo)
+        self.hub.unsubscribe(bar)
+        self.assertEqual(self.hub.by_player, {})
+
+    def test_send_to_same_name(self):
+        # Whoever played as a player who quit does not get the frames of the
+        # next player of the same name
+        foo = Subscriber(self.game.add_player('spam'))
+        self.hub.subscribe(foo)
+        self.game.remove_player('spam')
+        spam = self.game.add_player('spam')
+
+        self.hub.send_to(spam, event_frame(Events.PLAYER_ROLE_ASSIGNED, spam))
+        self.assertNotIn(Events.PLAYER_ROLE_ASSIGNED,
+                         [f['event'] for f in foo.frames])
+
+    def test_close(self):
+        foo = Subscriber()
+        self.hub.subscribe(foo)
+        self.hub.close()
+
+        self.game.add_player('spam')
+        self.assertEqual(foo.frames, [])
+        for handlers in self.game.events.values():
+            self.assertEqual(len(handlers), 0)
+
+    def test_sequence_numbers(self):
+        foo = Subscriber()
+        self.hub.subscribe(foo)
+
+        self.game.add_player('spam')
+        self.game.add_player('eggs')
+        self.assertEqual([f['seq'] for f in foo.frames], [1, 2, 3])
+        self.assertEqual(self.hub.sequence, 3)
+
+    def test_missed(self):
+        spam = self.game.add_player('spam')
+        self.game.add_player('eggs')
+        self.game.assign_player_roles()
+        epoch = self.hub.epoch
+
+        missed = [json.loads(f.encode().decode('utf-8'))
+                  for f in self.hub.missed(epoch, 2, spam)]
+        self.assertEqual([f['event'] for f in missed],
+                         [Events.NEW_PLAYER, Events.PLAYER_ROLE_ASSIGNED])
+        self.assertEqual(missed[0]['seq'], 3)
+
+        self.assertEqual(self.hub.missed(epoch, self.hub.sequence), [])
+        self.assertIsNone(self.hub.missed('bogus', 2))
+        self.assertIsNone(self.hub.missed(epoch, self.hub.sequence + 1))
+
+    def test_missed_too_old(self):
+        hub = EventHub(self.game, history=2)
+        for i in range(0, 3):
+            self.game.add_player('spam-%d' % i)
+
+        self.assertEqual(len(hub.missed(hub.epoch, hub.sequence - 2)), 2)
+        self.assertIsNone(hub.missed(hub.epoch, hub.sequence - 3))
+
@@ -0,0 +1,139 @@
+import unittest
+import tempfile
+import shutil
+import os
+
+from pylinq.journal import *
+from pylinq.room import RoomRegistry
+
+
+class JournalTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.journal = Journal(os.path.join(self.tmp_dir, 'journal'))
+        self.rooms = RoomRegistry(on_created=self.journal.attach,
+                                  on_removed=self.journal.detach)
+
+        self.room = self.rooms.get('foo/bar')
+        self.game = self.room.game
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def play(self):
+        for name in ('spam', 'eggs', 'ham'):
+            self.game.add_player(name)
+        self.game.remove_player('ham')
+        self.game.start('spam')
+        self.game.player_picks_word('eggs', 'bacon')
+        self.game.set_player_score('spam', 7)
+
+    def test_buffered(self):
+        self.game.add_player('spam')
+        path = self.journal.path_of('foo/bar')
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.journal.flush(), 2)
+        self.assertEqual(self.journal.flush(), 0)
+        self.assertEqual(len(list(read_journal(path))), 2)
+
+    def test_replay(self):
+        self.play()
+        self.journal.flush()
+
+        game = self.journal.replay('foo/bar')
+        self.assertEqual(game.dump_state()['players'],
+                         self.game.dump_state()['players'])
+        self.assertTrue(game.started)
+        self.assertIs(game.master_player, game.players['spam'])
+        self.assertEqual(game.get_standings_snapshot().players,
+                         self.game.get_standings_snapshot().players)
+
+    def test_replay_rounds(self):
+        self.play()
+        self.game.player_picks_word('spam', 'ham')
+        self.game.player_picks_word('eggs', 'ham')
+
+        game = self.journal.replay('foo/bar')
+        self.assertEqual(game.dump_state()['players'],
+                         self.game.dump_state()['players'])
+        self.assertEqual(game.round_played, 1)
+        self.assertEqual(game.round.pending, set(['spam']))
+
+        self.game.player_picks_word('spam', 'eggs')
+        game = self.journal.replay('foo/bar')
+        self.assertTrue(game.finished)
+        self.assertFalse(game.started)
+        self.assertIsNone(game.round)
+
+    def test_replay_last_quit(self):
+        self.game.add_player('spam')
+        self.game.add_player('eggs')
+        self.game.remove_player('spam')
+
+        game = self.journal.replay('foo/bar')
+        self.assertIs(game.master_player, game.players['eggs'])
+
+        self.game.remove_player('eggs')
+        game = self.journal.replay('foo/bar')
+        self.assertIsNone(self.game.master_player)
+        self.assertIsNone(game.master_player)
+        self.assertEqual(game.players, {})
+
+    def test_replay_abort(self):
+        self.play()
+        self.game.abort()
+
+        game = self.journal.replay('foo/bar')
+        self.assertEqual(game.players, {})
+        self.assertFalse(game.started)
+
+    def test_read_since(self):
+        self.play()
+        sequence = self.journal.sequence('foo/bar')
+
+        self.game.set_player_score('eggs', 1)
+        records = self.journal.read('foo/bar', sequence)
+        self.assertEqual([r[2:] for r in records],
+                         [[Events.PLAYER_SCORED, ['eggs', 1]]])
+        self.assertEqual(records[0][0], sequence + 1)
+
+    def test_sequence_survives_restart(self):
+        self.play()
+        self.journal.flush()
+        sequence = self.journal.sequence('foo/bar')
+
+        journal = Journal(self.journal.directory)
+        rooms = RoomRegistry(on_created=journal.attach)
+        rooms.get('foo/bar').game.add_player('spam')
+        self.assertEqual(journal.sequence('foo/bar'), sequence + 2)
+
+    def test_torn_write(self):
+        self.play()
+        self.journal.flush()
+        with open(self.journal.path_of('foo/bar'), 'ab') as f:
+            f.write(b'[99,')
+
+        self.assertEqual(len(self.journal.read('foo/bar')),
+                         self.journal.sequence('foo/bar'))
+
+    def test_detach(self):
+        self.play()
+        sequence = self.journal.sequence('foo/bar')
+        self.rooms.remove('foo/bar')
+
+        # Kept, buffered records included
+        records = self.journal.read('foo/bar')
+        self.assertGreaterEqual(len(records), sequence)
+        sequence = records[-1][0]
+        self.assertEqual(len(records), sequence)
+        self.game.add_player('spam')
+        self.assertEqual(self.journal.flush(), 0)
+
+        self.rooms.get('foo/bar')
+        self.assertEqual(self.journal.sequence('foo/bar'), sequence)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import tempfile
+import shutil
+import json
+import os
+
+from pylinq.leaderboard import *
+from pylinq.player import Player
+
+
+class LeaderboardTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.leaderboard = Leaderboard(page_size=2)
+        for name, points in (('spam', 3), ('eggs', 5), ('ham', 1)):
+            self.leaderboard.add(name, points)
+
+    def test_top(self):
+        self.assertEqual(self.leaderboard.top(2),
+                         [['eggs', 5], ['spam', 3]])
+        self.assertEqual(self.leaderboard.top(5, start=1),
+                         [['spam', 3], ['ham', 1]])
+
+    def test_rank(self):
+        self.assertEqual(self.leaderboard.rank('eggs'), 1)
+        self.assertEqual(self.leaderboard.rank('ham'), 3)
+        self.assertIsNone(self.leaderboard.rank('bacon'))
+
+        self.leaderboard.add('ham', 3)
+        self.assertEqual(self.leaderboard.rank('ham'), 2)
+        self.assertEqual(self.leaderboard.rank('spam'), 3)
+        self.assertEqual(len(self.leaderboard), 3)
+
+    def test_ties_ranked_by_name(self):
+        self.leaderboard.add('bacon', 3)
+        self.assertEqual(self.leaderboard.top(3, start=1),
+                         [['bacon', 3], ['spam', 3], ['ham', 1]])
+
+    def test_round_resolved(self):
+        self.leaderboard.on_round_resolved(1, [Player('ham'),
+                                               Player('bacon')])
+        self.assertEqual(self.leaderboard.points['ham'], 2)
+        self.assertEqual(self.leaderboard.points['bacon'], 1)
+
+    def test_page(self):
+        page = self.leaderboard.get_page()
+        self.assertIs(self.leaderboard.get_page(), page)
+        self.assertEqual(json.loads(page.body.decode('utf-8')), [
+            {'name': 'eggs', 'points': 5}, {'name': 'spam', 'points': 3}])
+
+        self.leaderboard.add('ham', 10)
+        self.assertGreater(self.leaderboard.get_page().version, page.version)
+        self.assertEqual(self.leaderboard.get_page().players[0],
+                         {'name': 'ham', 'points': 11})
+
+    def test_save_restore(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, 'leaderboard.jsonl')
+            self.leaderboard.save_in_background(path)
+            self.leaderboard.add('spam', 5)
+            self.leaderboard.save(path)
+
+            leaderboard = Leaderboard()
+            self.assertEqual(leaderboard.restore(path), 3)
+            self.assertEqual(leaderboard.points, self.leaderboard.points)
+            self.assertEqual(leaderboard.top(3), self.leaderboard.top(3))
+            self.assertEqual(Leaderboard().restore(path + '.missing'), 0)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_compact(self):
+        lines = self.leaderboard.encode().split(b'\n')
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[1].decode('utf-8')),
+                         [['eggs', 5], ['spam', 3], ['ham', 1]])
+
+    def test_load_several(self):
+        other = Leaderboard()
+        other.add('spam', 4)
+        other.add('bacon', 2)
+
+        merged = Leaderboard()
+        merged.load(self.leaderboard.encode(), other.encode())
+        self.assertEqual(len(merged), 4)
+        self.assertEqual(merged.top(2), [['spam', 7], ['eggs', 5]])
+        self.assertEqual(merged.rank('bacon'), 3)
+
+    def test_load_bad_snapshot(self):
+        self.assertRaises(LeaderboardException, self.leaderboard.load,
+                          b'spam')
+        self.assertRaises(
+            LeaderboardException, self.leaderboard.load,
+            b'{"format": "pylinq-leaderboard", "version": 0}\n[]')
@@ -0,0 +1,96 @@
+import unittest
+
+from pylinq.matchmaking import *
+from pylinq.room import RoomRegistry
+
+
+class MatchmakerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.rooms = RoomRegistry()
+        self.matchmaker = Matchmaker(self.rooms, min_players=4,
+                                     max_players=8)
+
+    def test_seat(self):
+        room = self.matchmaker.seat('spam')
+        self.assertEqual(room.room_id, 'table-1')
+        self.assertIn('spam', room.game.players)
+        self.assertEqual(self.matchmaker.free_seats, {'table-1': 7})
+
+        self.assertIs(self.matchmaker.seat('eggs'), room)
+        self.assertEqual(self.matchmaker.free_seats, {'table-1': 6})
+
+    def test_same_name_seated_elsewhere(self):
+        room = self.matchmaker.seat('spam')
+        other = self.matchmaker.seat('spam')
+
+        self.assertIsNot(other, room)
+        self.assertEqual(len(self.matchmaker), 2)
+
+    def test_fullest_table_first(self):
+        fuller = self.matchmaker.seat('spam')
+        self.matchmaker.seat('eggs')
+        emptier = self.matchmaker.seat('spam')
+
+        self.assertIs(self.matchmaker.seat('ham'), fuller)
+        self.assertEqual(self.matchmaker.free_seats,
+                         {fuller.room_id: 5, emptier.room_id: 7})
+
+    def test_start(self):
+        for name in ('spam', 'eggs', 'ham'):
+            room = self.matchmaker.seat(name)
+        self.assertFalse(room.game.started)
+
+        self.assertIs(self.matchmaker.seat('bacon'), room)
+        self.assertTrue(room.game.started)
+        self.assertEqual(len(self.matchmaker), 0)
+
+        # Started tables take nobody
+        self.assertIsNot(self.matchmaker.seat('spam'), room)
+
+    def test_quit(self):
+        room = self.matchmaker.seat('spam')
+        self.matchmaker.seat('eggs')
+
+        room.game.remove_player('eggs')
+        self.assertEqual(self.matchmaker.free_seats, {room.room_id: 7})
+
+    def test_abort(self):
+        for name in ('spam', 'eggs', 'ham', 'bacon'):
+            room = self.matchmaker.seat(name)
+
+        room.game.abort()
+        self.assertEqual(self.matchmaker.free_seats, {room.room_id: 8})
+        self.assertIs(self.matchmaker.seat('spam'), room)
+
+    def test_finished(self):
+        for name in ('spam', 'eggs', 'ham', 'bacon'):
+            room = self.matchmaker.seat(name)
+
+        room.game.finish()
+        self.assertEqual(len(self.matchmaker), 0)
+
+    def test_forget(self):
+        room = self.matchmaker.seat('spam')
+        self.rooms.remove(room.room_id)
+        self.matchmaker.forget(room)
+
+        self.assertEqual(len(self.matchmaker), 0)
+        self.assertEqual(self.matchmaker.handlers, {})
+        room.game.add_player('eggs')
+        self.assertEqual(len(self.matchmaker), 0)
+
+    def test_owned_tables_only(self):
+        self.rooms.get('table-1')
+        matchmaker = Matchmaker(self.rooms,
+                                owns=lambda room_id: room_id != 'table-2')
+
+        self.assertEqual(matchmaker.seat('spam').room_id, 'table-3')
+
+    def test_watch(self):
+        room = self.rooms.get('restored')
+        room.game.add_player('spam')
+
+        self.matchmaker.watch(room)
+        self.assertEqual(self.matchmaker.free_seats, {'restored': 7})
+        self.assertIs(self.matchmaker.seat('eggs'), room)
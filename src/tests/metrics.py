@@ -0,0 +1,75 @@
+import unittest
+
+from pylinq.metrics import *
+
+
+class MetricsRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter(self):
+        counter = self.registry.counter('spam_total', 'Spam', ('kind',))
+        counter.inc('eggs')
+        counter.inc('eggs', amount=2)
+        counter.inc('ham')
+
+        self.assertEqual(self.registry.render(),
+                         '# HELP spam_total Spam\n'
+                         '# TYPE spam_total counter\n'
+                         'spam_total{kind="eggs"} 3\n'
+                         'spam_total{kind="ham"} 1\n')
+
+        with self.assertRaises(MetricException):
+            counter.inc()
+
+    def test_gauge(self):
+        values = [1]
+        self.registry.gauge('spam', 'Spam', lambda: values[0])
+        self.registry.gauge('eggs', 'Eggs', lambda: {('a',): 2, ('b',): 0.5},
+                            ('name',))
+        values[0] = 4
+
+        self.assertEqual(self.registry.render(),
+                         '# HELP eggs Eggs\n'
+                         '# TYPE eggs gauge\n'
+                         'eggs{name="a"} 2\n'
+                         'eggs{name="b"} 0.5\n'
+                         '# HELP spam Spam\n'
+                         '# TYPE spam gauge\n'
+                         'spam 4\n')
+
+    def test_histogram(self):
+        histogram = self.registry.histogram('spam_seconds', 'Spam',
+                                            ('route',), buckets=(0.1, 1))
+        histogram.observe(0.05, '/')
+        histogram.observe(0.1, '/')
+        histogram.observe(5, '/')
+
+        self.assertEqual(self.registry.render(),
+                         '# HELP spam_seconds Spam\n'
+                         '# TYPE spam_seconds histogram\n'
+                         'spam_seconds_bucket{route="/",le="0.1"} 2\n'
+                         'spam_seconds_bucket{route="/",le="1"} 2\n'
+                         'spam_seconds_bucket{route="/",le="+Inf"} 3\n'
+                         'spam_seconds_sum{route="/"} 5.15\n'
+                         'spam_seconds_count{route="/"} 3\n')
+
+    def test_label_escaping(self):
+        counter = self.registry.counter('spam_total', 'Spam', ('kind',))
+        counter.inc('"eggs"\n')
+
+        self.assertIn('spam_total{kind="\\"eggs\\"\\n"} 1',
+                      self.registry.render())
+
+    def test_register_twice(self):
+        self.registry.counter('spam_total', 'Spam')
+        with self.assertRaises(MetricException):
+            self.registry.counter('spam_total', 'Spam')
+
+        self.registry.unregister('spam_total')
+        self.registry.counter('spam_total', 'Spam')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,6 +18,10 @@ class PlayerTestCase(unittest.TestCase):
         self.assertEqual(self.player.get_words(), ['spam', 'bogus'])
         self.assertRaises(PlayerException, self.player.add_word, 'eggs')
 
+    def test_no_instance_dict(self):
+        self.assertFalse(hasattr(self.player, '__dict__'))
+        self.assertRaises(AttributeError, setattr, self.player, 'spam', 1)
+
     def test_roles(self):
         self.player.make_spy('spamspamspam')
         self.assertTrue(self.player.is_spy())
@@ -0,0 +1,118 @@
+import unittest
+import time
+from mock import Mock
+from pylinq.room import *
+from pylinq.event import Events
+
+
+class RoomRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rooms = RoomRegistry()
+
+    def test_lazy_creation(self):
+        self.assertIsNone(self.rooms.get('foo', create=False))
+
+        room = self.rooms.get('foo')
+        self.assertIsInstance(room, Room)
+        self.assertIs(self.rooms.get('foo'), room)
+        self.assertEqual(len(self.rooms), 1)
+
+    def test_rooms_are_independent(self):
+        self.rooms.get('foo').game.add_player('spam')
+        self.rooms.get('bar').game.add_player('spam')
+
+        self.assertEqual(self.rooms.get('foo').game.get_player_count(), 1)
+        self.assertEqual(self.rooms.get('bar').game.get_player_count(), 1)
+
+    def test_invalid_room_id(self):
+        self.assertRaises(RoomException, self.rooms.get, '')
+        self.assertRaises(RoomException, self.rooms.get,
+                          '?' * (MAX_ROOM_ID_LENGTH + 1))
+
+    def test_max_rooms(self):
+        rooms = RoomRegistry(max_rooms=1)
+        rooms.get('foo')
+        self.assertRaises(RoomException, rooms.get, 'bar')
+
+    def test_idle(self):
+        self.assertTrue(self.rooms.get('empty').is_idle())
+        self.assertFalse(self.rooms.acquire('pinned').is_idle())
+
+        room = self.rooms.get('seated')
+        room.game.add_player('spam')
+        self.assertFalse(room.is_idle())
+
+    def test_release(self):
+        room = self.rooms.acquire('foo')
+        self.rooms.release(room)
+
+        self.assertTrue(room.is_idle())
+
+    def test_idle_finished(self):
+        room = self.rooms.get('foo')
+        room.game.add_player('spam')
+        room.game.trigger(Events.GAME_FINISHED)
+
+        self.assertTrue(room.is_idle())
+
+
+class RoomReaperTest(unittest.TestCase):
+
+    def setUp(self):
+        self.wheel = Mock()
+        self.wheel.tick = 1
+        watch = lambda room: self.reaper.watch(room)
+        self.rooms = RoomRegistry(on_created=watch, on_released=watch)
+        self.reaper = RoomReaper(self.rooms, self.wheel, 60)
+
+    def test_watched_once(self):
+        room = self.rooms.get('foo')
+        self.reaper.watch(room)
+
+        self.assertEqual(self.wheel.schedule.call_count, 1)
+        self.wheel.schedule.assert_called_with(60, self.reaper.reap, 'foo')
+
+    def test_reap_idle(self):
+        self.rooms.get('foo')
+
+        self.assertTrue(self.reaper.reap('foo', now=time.time() + 61))
+        self.assertNotIn('foo', self.rooms)
+        self.assertEqual(len(self.reaper), 0)
+
+    def test_reap_touched(self):
+        self.rooms.get('foo')
+        self.wheel.schedule.reset_mock()
+
+        self.assertFalse(self.reaper.reap('foo', now=time.time() + 30))
+        self.assertIn('foo', self.rooms)
+        delay = self.wheel.schedule.call_args[0][0]
+        self.assertTrue(29 <= delay <= 31)
+
+    def test_reap_seated(self):
+        self.rooms.get('foo').game.add_player('spam')
+        self.wheel.schedule.reset_mock()
+
+        self.assertFalse(self.reaper.reap('foo', now=time.time() + 61))
+        self.assertIn('foo', self.rooms)
+        self.wheel.schedule.assert_called_with(60, self.reaper.reap, 'foo')
+
+    def test_reap_held(self):
+        room = self.rooms.acquire('foo')
+        self.wheel.schedule.reset_mock()
+
+        self.assertFalse(self.reaper.reap('foo', now=time.time() + 61))
+        self.assertIn('foo', self.rooms)
+        self.assertFalse(self.wheel.schedule.called)
+
+        self.rooms.release(room)
+        self.assertTrue(self.wheel.schedule.called)
+
+    def test_reap_gone(self):
+        self.rooms.get('foo')
+        self.rooms.remove('foo')
+
+        self.assertFalse(self.reaper.reap('foo'))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+from pylinq.cards import get_deck
+from pylinq.sim import *
+
+
+class SimulationTestCase(unittest.TestCase):
+
+    def test_same_seed_same_game(self):
+        games = []
+        for i in range(0, 2):
+            simulation = Simulation('spam:1', players=5)
+            simulation.play()
+            games.append([(p.name, p.role, p.secret_word, p.words)
+                          for p in simulation.game.players.values()])
+
+        self.assertEqual(games[0], games[1])
+        other = Simulation('spam:2', players=5)
+        other.play()
+        self.assertNotEqual(
+            games[0], [(p.name, p.role, p.secret_word, p.words)
+                       for p in other.game.players.values()])
+
+    def test_play(self):
+        simulation = Simulation(1, players=4)
+        simulation.play()
+
+        game = simulation.game
+        self.assertTrue(game.finished)
+        self.assertEqual(
+            sorted(len(p.words) for p in game.players.values()), [2] * 4)
+        self.assertEqual(simulation.rejected, 0)
+        # 4 joins, start and 8 picks
+        self.assertEqual(simulation.steps, 13)
+
+    def test_random_bots_get_turned_down(self):
+        rejected = 0
+        for seed in range(0, 50):
+            simulation = Simulation(seed, players=2,
+                                    strategy='random', deck=get_deck())
+            simulation.play()
+            rejected += simulation.rejected
+
+        # Both players are spies, and may pick their secret word
+        self.assertGreater(rejected, 0)
+
+    def test_not_enough_players(self):
+        simulation = Simulation(1, players=1)
+        simulation.play()
+
+        self.assertFalse(simulation.game.started)
+        self.assertEqual(simulation.rejected, 1)
+        self.assertEqual(simulation.steps, 2)
+
+    def test_check_invariants(self):
+        simulation = Simulation(1, players=4)
+        simulation.play()
+        game = simulation.game
+        self.assertEqual(check_invariants(game), [])
+
+        game.started = True
+        for player in game.players.values():
+            player.make_counter_spy()
+        del game.players['bot3']
+        self.assertEqual(check_invariants(game), [
+            '0 spies',
+            'No round played',
+            'Standings out of date',
+        ])
+
+    def test_check_standings_version(self):
+        simulation = Simulation(1)
+        simulation.standings_version = 10
+        self.assertRaises(InvariantViolation, simulation.check)
+
+    def test_play_games(self):
+        totals = play_games('spam', 0, 20, fuzz=True)
+
+        self.assertEqual(totals['games'], 20)
+        self.assertGreater(totals['steps'], 20 * 13)
+        self.assertGreater(totals['rejected'], 0)
+
+        again = play_games('spam', 0, 20, fuzz=True)
+        del totals['cpu_time'], again['cpu_time']
+        self.assertEqual(totals, again)
+
+    def test_run(self):
+        report = run(30, seed='spam', workers=1, chunk_size=7)
+
+        self.assertEqual(report['games'], 30)
+        self.assertEqual(report['steps'], 30 * 13)
+        self.assertEqual(report['violation_count'], 0)
+        self.assertGreater(report['cpu_us_per_game'], 0)
@@ -0,0 +1,89 @@
+import unittest
+import tempfile
+import shutil
+import os
+
+from pylinq.snapshot import *
+from pylinq.room import RoomRegistry
+
+
+class SnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'snapshot.jsonl')
+
+        self.rooms = RoomRegistry()
+        game = self.rooms.get('foo').game
+        for name in ('spam', 'eggs', 'ham'):
+            game.add_player(name)
+        game.start('spam')
+        game.player_picks_word('eggs', 'bacon')
+        game.set_player_score('ham', 5)
+
+        self.rooms.get('bar').game.add_player('spam')
+        self.rooms.get('empty')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        self.assertEqual(write_snapshot(self.rooms, self.path), 2)
+        self.assertEqual(os.listdir(self.tmp_dir), ['snapshot.jsonl'])
+
+        rooms = RoomRegistry()
+        self.assertEqual(restore_snapshot(rooms, self.path), 2)
+        self.assertNotIn('empty', rooms)
+
+        for room_id in ('foo', 'bar'):
+            self.assertEqual(rooms.get(room_id).game.dump_state(),
+                             self.rooms.get(room_id).game.dump_state())
+
+        game = rooms.get('foo').game
+        self.assertTrue(game.started)
+        self.assertIs(game.master_player, game.players['spam'])
+        self.assertEqual(game.players['eggs'].get_words(), ['bacon'])
+        self.assertEqual(
+            sorted(p.secret_word for p in game.players.values()
+                   if p.is_spy()),
+            sorted(p.secret_word for p in
+                   self.rooms.get('foo').game.players.values()
+                   if p.is_spy()))
+
+    def test_restore_owned_rooms(self):
+        write_snapshot(self.rooms, self.path)
+
+        rooms = RoomRegistry()
+        owns = lambda room_id: room_id == 'bar'
+        self.assertEqual(restore_snapshot(rooms, self.path, owns), 1)
+        self.assertEqual(list(room.room_id for room in rooms), ['bar'])
+
+    def test_missing_snapshot(self):
+        self.assertEqual(restore_snapshot(RoomRegistry(), self.path), 0)
+
+    def test_bad_snapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'{"format": "spam"}\n')
+        self.assertRaises(SnapshotException, restore_snapshot,
+                          RoomRegistry(), self.path)
+
+    def test_snapshotter(self):
+        snapshotter = Snapshotter(self.rooms, self.path)
+        self.assertEqual(snapshotter.save(), 2)
+
+        snapshotter = Snapshotter(RoomRegistry(), self.path)
+        self.assertEqual(snapshotter.restore(), 2)
+
+    def test_writer_order(self):
+        writer = SnapshotWriter()
+        for i in range(0, 5):
+            writer.write_in_background(self.path, b'old')
+        writer.write(self.path, b'new')
+
+        self.assertFalse(writer.busy)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), b'new')
+
+
+if __name__ == '__main__':
+    unittest.main()
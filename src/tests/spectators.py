@@ -0,0 +1,129 @@
+import unittest
+from mock import Mock
+
+from pylinq.spectators import *
+from pylinq.frame import make_frame
+from pylinq.event import Events
+
+
+class Spectator(object):
+
+    def __init__(self):
+        self.busy = False
+        self.frames = []
+
+    def write_frame(self, frame):
+        self.frames.append(frame)
+
+    def events(self):
+        return [frame.event for frame in self.frames]
+
+
+class SpectatorStreamTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.hub = Mock()
+        self.hub.sequence = 7
+        self.calls = []
+        self.stream = SpectatorStream(
+            self.hub, interval=1, batch_size=2,
+            schedule=lambda delay, callback: self.calls.append(callback))
+
+    def run_calls(self):
+        while self.calls:
+            self.calls.pop(0)()
+
+    def test_subscribed_once(self):
+        spectators = [Spectator() for i in range(3)]
+        for spectator in spectators:
+            self.stream.add(spectator)
+
+        self.hub.subscribe.assert_called_once_with(self.stream)
+        self.assertEqual(len(self.stream), 3)
+
+        for spectator in spectators:
+            self.stream.remove(spectator)
+        self.hub.unsubscribe.assert_called_once_with(self.stream)
+
+    def test_throttled(self):
+        spectator = Spectator()
+        self.stream.add(spectator)
+
+        self.stream.send(make_frame(Events.GAME_STARTED))
+        self.stream.send(make_frame(Events.GAME_ABORTED))
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(spectator.frames, [])
+
+        self.run_calls()
+        self.assertEqual(spectator.events(),
+                         [Events.GAME_STARTED, Events.GAME_ABORTED])
+
+    def test_shared_frames(self):
+        spectators = [Spectator() for i in range(5)]
+        for spectator in spectators:
+            self.stream.add(spectator)
+
+        frame = make_frame(Events.GAME_STARTED)
+        self.stream.send(frame)
+        self.run_calls()
+
+        for spectator in spectators:
+            self.assertEqual(len(spectator.frames), 1)
+            self.assertIs(spectator.frames[0], frame)
+
+    def test_batches(self):
+        spectators = [Spectator() for i in range(5)]
+        for spectator in spectators:
+            self.stream.add(spectator)
+
+        self.stream.send(make_frame(Events.GAME_STARTED))
+        self.calls.pop(0)()
+
+        written = sum(len(spectator.frames) for spectator in spectators)
+        self.assertEqual(written, 2)
+        self.assertTrue(self.stream.writing)
+
+        self.run_calls()
+        self.assertFalse(self.stream.writing)
+        for spectator in spectators:
+            self.assertEqual(len(spectator.frames), 1)
+
+    def test_coalesced(self):
+        self.stream.coalesce = frozenset([Events.NEW_MASTER])
+        spectator = Spectator()
+        self.stream.add(spectator)
+
+        self.stream.send(make_frame(Events.NEW_MASTER, player_name='spam'))
+        self.stream.send(make_frame(Events.GAME_STARTED))
+        self.stream.send(make_frame(Events.NEW_MASTER, player_name='eggs'))
+        self.run_calls()
+
+        self.assertEqual(spectator.events(),
+                         [Events.GAME_STARTED, Events.NEW_MASTER])
+        self.assertEqual(spectator.frames[1].fields['player_name'], 'eggs')
+
+    def test_busy_spectator_resyncs(self):
+        slow, fast = Spectator(), Spectator()
+        self.stream.add(slow)
+        self.stream.add(fast)
+
+        slow.busy = True
+        self.stream.send(make_frame(Events.GAME_STARTED))
+        self.run_calls()
+
+        self.assertEqual(slow.frames, [])
+        self.assertEqual(fast.events(), [Events.GAME_STARTED])
+        self.assertEqual(self.stream.skipped, 1)
+
+        slow.busy = False
+        self.stream.send(make_frame(Events.GAME_ABORTED))
+        self.run_calls()
+
+        self.assertEqual(slow.events(), [Events.RESYNC])
+        self.assertEqual(slow.frames[0].fields['seq'], 7)
+        self.assertEqual(fast.events(),
+                         [Events.GAME_STARTED, Events.GAME_ABORTED])
+
+    def test_private_frames(self):
+        self.assertIsNone(self.stream.player)
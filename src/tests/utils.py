@@ -1,7 +1,12 @@
 import unittest
 
 from pylinq.utils.observable import *
+from pylinq.utils.delivery import *
+from pylinq.utils.packing import *
+from pylinq.utils.timerwheel import *
+from pylinq.utils.skiplist import SkipList
 from mock import Mock
+from random import Random
 
 class ObservableTestCase(unittest.TestCase):
     def setUp(self):
@@ -95,4 +100,332 @@ class ObservableTestCase(unittest.TestCase):
         self.observable.trigger('spam')
         
         self.assertEqual(foo.bar.call_count, 1)
-        self.assertEqual(foo.baz.call_count, 1)
\ No newline at end of file
+        self.assertEqual(foo.baz.call_count, 1)
+
+    def test_bind_twice(self):
+        self.observable.add_events('spam')
+        handler = Mock()
+
+        self.observable.bind('spam', handler, 'eggs')
+        self.observable.bind('spam', handler, 'ham')
+        self.observable.trigger('spam')
+
+        handler.assert_called_once_with('ham')
+
+    def test_queued_event_handler(self):
+        self.observable.add_events('spam')
+        callbacks = []
+        queue = DeliveryQueue(schedule=callbacks.append)
+        handler = Mock()
+
+        self.observable.bind('spam', handler, 'eggs', queue=queue)
+        self.observable.trigger('spam', 'bacon')
+        self.assertFalse(handler.called)
+        self.assertEqual(len(queue), 1)
+
+        callbacks.pop()()
+        handler.assert_called_once_with('bacon', 'eggs')
+
+    def test_coalesced_event_handler(self):
+        self.observable.add_events('spam', 'eggs')
+        callbacks = []
+        queue = DeliveryQueue(schedule=callbacks.append, coalesce=['spam'])
+        handler = Mock()
+
+        self.observable.bind('spam', handler, queue=queue)
+        self.observable.bind('eggs', handler, queue=queue)
+        for i in range(0, 3):
+            self.observable.trigger('spam', i)
+            self.observable.trigger('eggs', i)
+
+        self.assertEqual(len(callbacks), 1)
+        callbacks.pop()()
+        self.assertEqual([c[0][0] for c in handler.call_args_list],
+                         [2, 0, 1, 2])
+
+
+class Delivery(object):
+    def __init__(self):
+        self.callbacks = []
+
+    def add_done_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def done(self):
+        for callback in self.callbacks:
+            callback(self)
+
+    def cancelled(self):
+        return False
+
+    def exception(self):
+        return None
+
+
+class DeliveryQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.callbacks = []
+
+    def run_callbacks(self):
+        while self.callbacks:
+            self.callbacks.pop(0)()
+
+    def test_drain_once(self):
+        queue = DeliveryQueue(schedule=self.callbacks.append)
+        handler = Mock()
+
+        queue.put(handler, ('spam',))
+        queue.put(handler, ('eggs',))
+        self.assertEqual(len(self.callbacks), 1)
+
+        self.run_callbacks()
+        self.assertEqual(handler.call_count, 2)
+        self.assertEqual(len(queue), 0)
+
+    def test_window(self):
+        deliveries = []
+
+        def handler():
+            deliveries.append(Delivery())
+            return deliveries[-1]
+
+        queue = DeliveryQueue(window=2, schedule=self.callbacks.append)
+        for i in range(0, 5):
+            queue.put(handler)
+
+        self.run_callbacks()
+        self.assertEqual(len(deliveries), 2)
+        self.assertEqual(queue.in_flight, 2)
+
+        deliveries[0].done()
+        self.run_callbacks()
+        self.assertEqual(len(deliveries), 3)
+        self.assertEqual(len(queue), 2)
+
+    def test_drop_oldest(self):
+        queue = DeliveryQueue(max_size=2, schedule=self.callbacks.append)
+        handler = Mock()
+        for i in range(0, 4):
+            self.assertTrue(queue.put(handler, (i,)))
+
+        self.run_callbacks()
+        self.assertEqual([c[0][0] for c in handler.call_args_list], [2, 3])
+        self.assertEqual(queue.dropped, 2)
+
+    def test_drop_newest(self):
+        queue = DeliveryQueue(max_size=2, policy=DROP_NEWEST,
+                              schedule=self.callbacks.append)
+        handler = Mock()
+        results = [queue.put(handler, (i,)) for i in range(0, 4)]
+
+        self.run_callbacks()
+        self.assertEqual(results, [True, True, False, False])
+        self.assertEqual([c[0][0] for c in handler.call_args_list], [0, 1])
+
+    def test_disconnect(self):
+        on_overflow = Mock()
+        queue = DeliveryQueue(max_size=1, policy=DISCONNECT,
+                              on_overflow=on_overflow,
+                              schedule=self.callbacks.append)
+        handler = Mock()
+
+        queue.put(handler)
+        self.assertFalse(queue.put(handler))
+        on_overflow.assert_called_once_with(queue)
+        self.assertTrue(queue.closed)
+
+        self.run_callbacks()
+        self.assertFalse(handler.called)
+
+    def test_unsupported_policy(self):
+        self.assertRaises(UnsupportedPolicyException,
+                          DeliveryQueue, policy='spam')
+
+    def test_failing_handler(self):
+        queue = DeliveryQueue(schedule=self.callbacks.append)
+        handler = Mock()
+
+        queue.put(Mock(side_effect=ValueError))
+        queue.put(handler)
+        self.run_callbacks()
+        self.assertTrue(handler.called)
+
+
+class PackingTestCase(unittest.TestCase):
+
+    def test_pack(self):
+        self.assertEqual(pack(1), b'\x01')
+        self.assertEqual(pack(-1), b'\xff')
+        self.assertEqual(pack(200), b'\xcc\xc8')
+        self.assertEqual(pack(-100), b'\xd0\x9c')
+        self.assertEqual(pack(None), b'\xc0')
+        self.assertEqual(pack('a'), b'\xa1a')
+        self.assertEqual(pack([1, True]), b'\x92\x01\xc3')
+        self.assertEqual(pack({'a': 1}), b'\x81\xa1a\x01')
+
+    def test_round_trip(self):
+        values = [
+            0, 127, 128, 255, 256, 65535, 65536, 2 ** 32, 2 ** 64 - 1,
+            -32, -33, -128, -129, -32768, -32769, -2 ** 31 - 1, -2 ** 63,
+            0.5, '', 'Fléau', 'x' * 40, 'x' * 300, 'x' * 70000, b'\x00\x01',
+            [], list(range(0, 20)), {}, dict((str(i), i) for i in range(20)),
+            [None, True, False, {'spam': ['eggs', {'ham': 1.5}]}],
+        ]
+        for value in values:
+            self.assertEqual(unpack(pack(value)), value)
+
+    def test_errors(self):
+        self.assertRaises(PackingException, pack, object())
+        self.assertRaises(PackingException, pack, 2 ** 64)
+        self.assertRaises(PackingException, unpack, b'\x92\x01')
+        self.assertRaises(PackingException, unpack, b'\x01\x02')
+        self.assertRaises(PackingException, unpack, b'\xc1')
+
+    def test_unhashable_key(self):
+        self.assertRaises(PackingException, unpack, b'\x81\x91\x01\x02')
+        self.assertRaises(PackingException, unpack, b'\x81\x80\x01')
+
+    def test_nested_too_deep(self):
+        value = []
+        for i in range(1, MAX_DEPTH):
+            value = [value]
+        self.assertEqual(unpack(pack(value)), value)
+
+        self.assertRaises(PackingException, unpack,
+                          b'\x91' * MAX_DEPTH + b'\x90')
+        self.assertRaises(PackingException, unpack, b'\x91' * 100000)
+
+
+class TimerWheelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.wheel = TimerWheel(tick=1, slots=8, clock=lambda: self.now)
+        self.fired = []
+
+    def advance(self, seconds):
+        self.now += seconds
+        return self.wheel.advance()
+
+    def test_fires_once_due(self):
+        self.wheel.schedule(3, self.fired.append, 'spam')
+
+        self.assertEqual(self.advance(2), 0)
+        self.assertEqual(self.advance(1), 1)
+        self.assertEqual(self.fired, ['spam'])
+        self.assertEqual(len(self.wheel), 0)
+
+        self.advance(20)
+        self.assertEqual(self.fired, ['spam'])
+
+    def test_longer_than_a_turn(self):
+        self.wheel.schedule(20, self.fired.append, 'spam')
+        self.wheel.schedule(4, self.fired.append, 'eggs')
+
+        self.advance(19)
+        self.assertEqual(self.fired, ['eggs'])
+        self.advance(1)
+        self.assertEqual(self.fired, ['eggs', 'spam'])
+
+    def test_cancel(self):
+        timer = self.wheel.schedule(2, self.fired.append, 'spam')
+        self.assertTrue(timer.active)
+
+        timer.cancel()
+        timer.cancel()
+        self.assertFalse(timer.active)
+        self.assertEqual(len(self.wheel), 0)
+
+        self.advance(10)
+        self.assertEqual(self.fired, [])
+
+    def test_schedule_from_callback(self):
+        def again(count):
+            self.fired.append(count)
+            if count < 3:
+                self.wheel.schedule(8, again, count + 1)
+
+        self.wheel.schedule(1, again, 1)
+        self.advance(1)
+        self.advance(8)
+        self.advance(8)
+        self.assertEqual(self.fired, [1, 2, 3])
+
+    def test_failing_callback(self):
+        self.wheel.schedule(1, Mock(side_effect=ValueError))
+        self.wheel.schedule(1, self.fired.append, 'spam')
+
+        self.advance(1)
+        self.assertEqual(self.fired, ['spam'])
+
+    def test_elapsed_time_counts(self):
+        # Half a tick after the last turn, 2 seconds are 3 ticks away at most
+        self.now = 0.5
+        self.wheel.schedule(2, self.fired.append, 'spam')
+        self.advance(1.5)
+        self.assertEqual(self.fired, [])
+        self.advance(1)
+        self.assertEqual(self.fired, ['spam'])
+
+
+class SkipListTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.skiplist = SkipList(Random(1))
+
+    def test_insert(self):
+        for value in (5, 1, 3, 4, 2):
+            self.skiplist.insert(value)
+
+        self.assertEqual(len(self.skiplist), 5)
+        self.assertEqual(list(self.skiplist), [1, 2, 3, 4, 5])
+        self.assertIn(3, self.skiplist)
+        self.assertNotIn(6, self.skiplist)
+
+    def test_index(self):
+        for value in range(0, 100, 2):
+            self.skiplist.insert(value)
+
+        self.assertEqual(self.skiplist.index(0), 0)
+        self.assertEqual(self.skiplist.index(42), 21)
+        self.assertEqual(self.skiplist[21], 42)
+        self.assertEqual(self.skiplist[-1], 98)
+        self.assertRaises(ValueError, self.skiplist.index, 43)
+        self.assertRaises(IndexError, self.skiplist.__getitem__, 50)
+
+    def test_remove(self):
+        for value in range(0, 10):
+            self.skiplist.insert(value)
+
+        self.skiplist.remove(0)
+        self.skiplist.remove(5)
+        self.assertEqual(list(self.skiplist), [1, 2, 3, 4, 6, 7, 8, 9])
+        self.assertEqual(self.skiplist.index(6), 4)
+        self.assertRaises(ValueError, self.skiplist.remove, 5)
+
+    def test_items(self):
+        for value in range(0, 10):
+            self.skiplist.insert(value)
+
+        self.assertEqual(list(self.skiplist.items(3, 6)), [3, 4, 5])
+        self.assertEqual(list(self.skiplist.items(8, 20)), [8, 9])
+        self.assertEqual(list(self.skiplist.items(10)), [])
+
+    def test_matches_sorted_list(self):
+        rng = Random(2)
+        values = []
+        for i in range(0, 2000):
+            if values and rng.random() < 0.4:
+                value = rng.choice(values)
+                values.remove(value)
+                self.skiplist.remove(value)
+            else:
+                value = rng.random()
+                values.append(value)
+                self.skiplist.insert(value)
+
+        values.sort()
+        self.assertEqual(list(self.skiplist), values)
+        for index in range(0, len(values), 7):
+            self.assertEqual(self.skiplist[index], values[index])
+            self.assertEqual(self.skiplist.index(values[index]), index)
@@ -0,0 +1,69 @@
+import unittest
+import socket
+
+from pylinq.workers import *
+
+
+class WorkersTestCase(unittest.TestCase):
+
+    def test_worker_for_room(self):
+        for count in range(1, 9):
+            owners = [worker_for_room('room-%d' % i, count)
+                      for i in range(0, 50)]
+            self.assertTrue(all(0 <= owner < count for owner in owners))
+            self.assertEqual(owners, [worker_for_room('room-%d' % i, count)
+                                      for i in range(0, 50)])
+
+        # Must not depend on the process, unlike hash()
+        self.assertEqual(worker_for_room('spam', 7), 2)
+
+    def test_room_from_request(self):
+        self.assertEqual(
+            room_from_request(b'GET /players?room=spam HTTP/1.1\r\nHost'),
+            'spam')
+        self.assertEqual(
+            room_from_request(b'POST /join?a=1&room=eggs%20bacon HTTP/1.1\r\n'),
+            'eggs bacon')
+        self.assertEqual(room_from_request(b'GET /socket HTTP/1.1\r\n'),
+                         DEFAULT_ROOM)
+        self.assertEqual(room_from_request(b'bogus\r\n'), DEFAULT_ROOM)
+        self.assertEqual(room_from_request(b'GET /lobby HTTP/1.1\r\n'),
+                         ANY_ROOM)
+        self.assertIsNone(room_from_request(b'GET /players?ro'))
+
+    def test_worker_for(self):
+        dispatcher = Dispatcher([], 3, None)
+        self.addCleanup(dispatcher.selector.close)
+
+        self.assertEqual([dispatcher.worker_for(ANY_ROOM)
+                          for i in range(0, 4)], [0, 1, 2, 0])
+        self.assertEqual(dispatcher.worker_for('spam'),
+                         worker_for_room('spam', 3))
+
+    def test_owner(self):
+        worker = Worker(1, 3, 9000)
+        self.assertEqual(worker.owns('spam'),
+                         worker_for_room('spam', 3) == 1)
+        self.assertEqual(worker.owner_port('spam'),
+                         9000 + worker_for_room('spam', 3))
+
+    def test_send_connection(self):
+        master_end, worker_end = socket.socketpair(socket.AF_UNIX,
+                                                   socket.SOCK_SEQPACKET)
+        client, server = socket.socketpair()
+        try:
+            send_connection(master_end, server)
+            server.close()
+
+            received = receive_connections(worker_end)
+            self.assertEqual(len(received), 1)
+
+            client.sendall(b'spam')
+            self.assertEqual(received[0].recv(4), b'spam')
+            received[0].close()
+
+            master_end.close()
+            self.assertIsNone(receive_connections(worker_end))
+        finally:
+            client.close()
+            worker_end.close()
@@ -14,9 +14,24 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
         PLAYER_ROLE_ASSIGNED: 'player_role_assigned',
         GAME_STARTED: 'game_started',
         GAME_ABORTED: 'game_aborted',
-        LOST_CONNECTION: 'lost_connection'
+        GAME_FINISHED: 'game_finished',
+        NEW_ROUND: 'new_round',
+        ROUND_RESOLVED: 'round_resolved',
+        LOST_CONNECTION: 'lost_connection',
+        CONNECTED: 'connected',
+        RESYNC: 'resync'
     };
 
+    // Longest wait between two attempts to reconnect, in ms
+    var MAX_RECONNECT_DELAY = 30000;
+    // Close code of a server restarting, and the time over which its
+    // clients spread coming back to the next one, in ms
+    var SERVICE_RESTART = 1012;
+    var RESTART_RECONNECT_SPREAD = 5000;
+
+    // Room to play in, taken from the page URL (e.g. /static/index.html?room=foo)
+    var ROOM = (/[?&]room=([^&]*)/.exec(window.location.search) || [null, 'default'])[1];
+
     // Using jQuery 1.9.1
     $('body').css('visibility', 'visible');
     $(document).ajaxError(function(event, jqxhr) {
@@ -28,10 +43,26 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
 
     var game, playerList, wsController;
 
-    function WebSocketController() {}
+    function WebSocketController() {
+        // Last frame received, to only be sent the missed ones on reconnection
+        this.epoch      = null;
+        this.lastSeq    = null;
+        this.playerName = null;
+        this.retries    = 0;
+        // Seconds players have to come back before they are removed
+        this.playerTimeout = null;
+    }
     WebSocketController.prototype = {
         connect: function() {
-            this.ws = new WebSocket('ws://localhost:8888/socket');
+            var url = 'ws://localhost:8888/socket?room=' + ROOM;
+            if(this.epoch !== null) {
+                url += '&epoch=' + this.epoch + '&since=' + this.lastSeq;
+            }
+            if(this.playerName) {
+                url += '&player_name=' + encodeURIComponent(this.playerName);
+            }
+
+            this.ws = new WebSocket(url);
 
             this.ws.onopen      = this.onOpen.bind(this);
             this.ws.onmessage   = this.onMessage.bind(this);
@@ -40,10 +71,14 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
         },
 
         send: function(message) {
+            if(message.playerName) {
+                this.playerName = message.playerName;
+            }
             this.ws.send(JSON.stringify(message));
         },
 
         onOpen: function() {
+            this.retries = 0;
             $(this).trigger('open');
         },
 
@@ -51,15 +86,38 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
             var data  = JSON.parse(message.data),
                 event = data.event;
 
+            if(event === Events.CONNECTED) {
+                this.serverEpoch = data.epoch;
+                this.playerTimeout = data.player_timeout;
+                if(this.epoch === null) {
+                    this.epoch = data.epoch;
+                    this.lastSeq = data.last_seq;
+                }
+            } else if(event === Events.RESYNC) {
+                this.epoch = this.serverEpoch;
+            }
+            if(data.seq !== undefined) {
+                this.lastSeq = data.seq;
+            }
+
             $(this).trigger(event, [data]);
         },
-        onClose: function() {
-            alert('Connection with server closed');
-            document.reload();
+        onClose: function(e) {
+            // Back off, with some jitter so that clients dropped at the same
+            // time don't all come back at the same time
+            var delay = Math.min(MAX_RECONNECT_DELAY, 500 * Math.pow(2, this.retries++));
+            delay = delay * (0.5 + Math.random() / 2);
+            if(e && e.code === SERVICE_RESTART) {
+                // Every client of the server is being told the same
+                delay = Math.random() * RESTART_RECONNECT_SPREAD;
+                this.retries = 0;
+            }
+            setTimeout(this.connect.bind(this), delay);
+
+            $(this).trigger('close');
         },
         onError: function() {
-            alert('Error in server connection');
-            document.reload();
+            // Closing follows, and reconnects
         }
     };
 
@@ -90,6 +148,8 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
         $ws.bind(Events.NEW_PLAYER,   this.onNewPlayer.bind(this));
         $ws.bind(Events.PLAYER_QUIT,  this.onPlayerQuit.bind(this));
         $ws.bind(Events.GAME_ABORTED, this.onGameAborted.bind(this));
+        $ws.bind(Events.ROUND_RESOLVED, this.onRoundResolved.bind(this));
+        $ws.bind(Events.RESYNC,       this.onResync.bind(this));
 
         self.loadPlayers();
     }
@@ -109,7 +169,7 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
         loadPlayers: function() {
             var self = this;
 
-            $.getJSON('/players', function(allData) {
+            $.getJSON('/players?room=' + ROOM, function(allData) {
                 $.each(allData, function(idx, playerData) {
                     self.addPlayer(playerData);
                 });
@@ -134,6 +194,25 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
 
         onGameAborted: function() {
             this.players([]);
+        },
+
+        onRoundResolved: function(event, data) {
+            // Only the scores the round changed are sent
+            var scores = {};
+            $.each(data.scores, function(idx, score) {
+                scores[score[0]] = score[1];
+            });
+            $.each(this.players(), function(idx, player) {
+                if(scores.hasOwnProperty(player.name())) {
+                    player.score(scores[player.name()]);
+                }
+            });
+        },
+
+        onResync: function() {
+            // Missed too much while disconnected: start over
+            this.players([]);
+            this.loadPlayers();
         }
     };
 
@@ -155,9 +234,11 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
 
         $(webSocketController)
             .bind('open', this.onConnect.bind(this))
+            .bind('close', this.onDisconnect.bind(this))
             .bind(Events.NEW_MASTER, this.onNewMaster.bind(this))
             .bind(Events.GAME_STARTED, this.onGameStarted.bind(this))
             .bind(Events.GAME_ABORTED, this.onGameAborted.bind(this))
+            .bind(Events.GAME_FINISHED, this.onGameFinished.bind(this))
             .bind(Events.LOST_CONNECTION, this.onLostConnection.bind(this))
             .bind(Events.PLAYER_ROLE_ASSIGNED, this.onRoleAssigned.bind(this));
     }
@@ -180,6 +261,10 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
             this.isConnected(true);
         },
 
+        onDisconnect: function() {
+            this.isConnected(false);
+        },
+
         onNewMaster: function(event, data) {
             this.isMaster(this.playerName() && data.player_name === this.playerName());
             if(this.isMaster()) {
@@ -192,6 +277,13 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
             alert('The game has started');
         },
 
+        onGameFinished: function() {
+            this.isGameStarted(false);
+            this.playerRole(false);
+            this.playerSecretWord(false);
+            alert('The game is over');
+        },
+
         onGameAborted: function() {
             this.isGameStarted(false);
             this.hasJoined(false);
@@ -202,15 +294,16 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
             alert('The game has been aborted');
         },
 
-        onLostConnection: function() {
-            alert('A player connection was lost.\
-            Game will be aborted if connection is not resumed in 30s.');
+        onLostConnection: function(event, data) {
+            alert('Player "' + data.player_name + '" lost their connection.\
+            Game will be aborted if connection is not resumed within ' +
+                  this.wsController.playerTimeout + 's of losing it.');
         },
 
         join: function() {
             var self = this;
 
-            $.post('/join', { player_name: this.playerName })
+            $.post('/join?room=' + ROOM, { player_name: this.playerName })
             .done(function(response) {
                 if(!response.joined) {
                     return alert('Could not join game: ' + response.error || 'error unknown');
@@ -234,7 +327,7 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
         },
 
         startGame: function() {
-            $.post('/start', { player_name: this.playerName })
+            $.post('/start?room=' + ROOM, { player_name: this.playerName })
             .done(function(response) {
                 if(!response.started) {
                     return alert('Could not start game: ' + response.error || 'error unknown');
@@ -256,7 +349,7 @@ require(['jquery', 'lib/knockout-3.1.0'], function($, ko) {
 
         onQuitGame: function() {
             $.ajax({
-                url: '/quit',
+                url: '/quit?room=' + ROOM,
                 method: 'post',
                 async: false,
                 data: { player_name: this.playerName }